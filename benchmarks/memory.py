@@ -0,0 +1,128 @@
+"""
+Benchmarks the memory held by the content registered for large synthetic sites,
+for each kind of metadata store
+
+    python -m benchmarks.memory --pages 200000
+"""
+
+import dataclasses
+import gc
+import os
+import pathlib
+import resource
+import tempfile
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any
+
+import click
+from benchmarks.run import run_in_child
+from benchmarks.sitegen import generate_site
+from benchmarks.sitegen import SiteSpec
+from stencil.impl.build import construct_builders
+from stencil.impl.build import create_context
+from stencil.impl.build import register_content
+from stencil.models.registry import STORES
+from stencil.util.cache import CACHE_DIRECTORY_ENV
+from stencil.util.config import parse_and_validate
+
+
+@dataclass(frozen=True)
+class RegistryMeasurement:
+    """
+    Cost of registering a site's content with one kind of metadata store
+    """
+
+    store: str
+    pages: int
+    register_seconds: float
+    query_seconds: float
+    registered_mb: float
+
+    @property
+    def bytes_per_page(self) -> float:
+        """
+        Memory held per registered page
+        """
+        return self.registered_mb * 1024 * 1024 / self.pages if self.pages else 0.0
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _register(
+    raw_config: dict[str, Any], store: str, output: pathlib.Path, connection: Connection
+) -> None:
+    """
+    Registers a site's content in a forked child, so that memory is measured per store
+    """
+    config = dataclasses.replace(parse_and_validate(raw_config), metadata_store=store)
+    gc.collect()
+    before = _peak_mb()
+
+    start = time.perf_counter()
+    ctx = create_context(config, output)
+    builders = construct_builders(config)
+    register_content(config, builders, ctx)
+    registered = time.perf_counter() - start
+
+    # Ordering every page reads the metadata of all of them
+    start = time.perf_counter()
+    ctx.query(order_by="-date", limit=10)
+    queried = time.perf_counter() - start
+
+    gc.collect()
+    connection.send(
+        (len(ctx.content), registered, queried, _peak_mb() - before),
+    )
+
+
+def measure(
+    store: str, raw_config: dict[str, Any], output: pathlib.Path
+) -> RegistryMeasurement:
+    """
+    Registers the content of @raw_config with @store in a child process,
+    raising if registering fails
+    """
+    result = run_in_child(
+        f"Registering with {store}", _register, raw_config, store, output
+    )
+    return RegistryMeasurement(store, *result)
+
+
+@click.command()
+@click.option("--pages", default=50000, help="Number of markdown pages")
+@click.option(
+    "--front-matter-keys",
+    default=SiteSpec.front_matter_keys,
+    help="Extra front matter keys per page",
+)
+def main(pages: int, front_matter_keys: int) -> None:
+    """
+    Benchmarks the memory held by registering the content of a synthetic site
+    """
+    spec = SiteSpec(
+        pages=pages, front_matter_keys=front_matter_keys, paragraphs=1, assets=0
+    )
+    click.echo(
+        f"{'store':<8} {'pages':>8} {'register s':>11} {'query s':>8} "
+        f"{'MB':>8} {'B/page':>8}"
+    )
+    with tempfile.TemporaryDirectory(prefix="stencil-bench-") as directory:
+        root = pathlib.Path(directory)
+        raw_config = generate_site(root / "site", spec)
+        os.environ[CACHE_DIRECTORY_ENV] = str(root / "cache")
+        for store in STORES:
+            measurement = measure(store, raw_config, root / "output")
+            click.echo(
+                f"{measurement.store:<8} {measurement.pages:>8} "
+                f"{measurement.register_seconds:>11.3f} "
+                f"{measurement.query_seconds:>8.3f} "
+                f"{measurement.registered_mb:>8.1f} {measurement.bytes_per_page:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,281 @@
+"""
+Benchmarks cli startup, and cold, warm and incremental builds of synthetic sites
+
+    python -m benchmarks.run --pages 5000 --jobs 4 --json results.json
+"""
+
+import builtins
+import json
+import multiprocessing
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import TextIO
+from unittest.mock import patch
+
+import click
+from benchmarks.sitegen import generate_site
+from benchmarks.sitegen import SiteSpec
+from stencil.impl.build import construct_builders
+from stencil.impl.build import create_context
+from stencil.impl.build import load_manifest
+from stencil.impl.build import register_content
+from stencil.impl.build import run_builders
+from stencil.util.cache import CACHE_DIRECTORY_ENV
+from stencil.util.config import parse_and_validate
+from stencil.util.exceptions import StencilException
+
+SCENARIOS = ("cold", "warm", "incremental")
+
+
+@dataclass(frozen=True)
+class Measurement:
+    """
+    Cost of a single build scenario
+    """
+
+    scenario: str
+    wall_seconds: float
+    peak_rss_mb: float
+    written: int
+    skipped: int
+    opens: int
+
+    @property
+    def files_per_second(self) -> float:
+        """
+        Outputs written per second of wall time
+        """
+        return self.written / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def _build(
+    raw_config: dict[str, Any], output: pathlib.Path, jobs: int, connection: Connection
+) -> None:
+    """
+    Builds a site in a forked child, so that peak memory is measured per scenario
+    """
+    real_open = builtins.open
+    opens = 0
+
+    def _counting_open(*args: Any, **kwargs: Any) -> Any:
+        nonlocal opens
+        opens += 1
+        return real_open(*args, **kwargs)
+
+    with patch("builtins.open", _counting_open):
+        start = time.perf_counter()
+        config = parse_and_validate(raw_config)
+        manifest = load_manifest(config, output)
+        ctx = create_context(config, output)
+        builders = construct_builders(config)
+        register_content(config, builders, ctx)
+        run_builders(builders, ctx, manifest, jobs)
+        wall = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    connection.send((wall, peak, len(manifest.written), len(manifest.skipped), opens))
+
+
+def run_in_child(
+    description: str, target: Callable[..., None], *args: Any
+) -> tuple[Any, ...]:
+    """
+    Runs @target in a forked child with @args and a connection to send its
+    result through, raising if the child fails before sending one
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=(*args, sender))
+    process.start()
+    # Only the child holds the sending end, so its exit ends the pipe
+    sender.close()
+    try:
+        result: tuple[Any, ...] = receiver.recv()
+    except EOFError:
+        result = ()
+    process.join()
+    if not result or process.exitcode:
+        raise StencilException(
+            f"{description} failed with exit code {process.exitcode}"
+        )
+    return result
+
+
+def measure(
+    scenario: str, raw_config: dict[str, Any], output: pathlib.Path, jobs: int
+) -> Measurement:
+    """
+    Runs a build of @raw_config into @output in a child process,
+    raising if the build fails
+    """
+    result = run_in_child(f"{scenario} build", _build, raw_config, output, jobs)
+    return Measurement(scenario, *result)
+
+
+def measure_startup(runs: int = 5) -> Measurement:
+    """
+    Measures the fastest of @runs invocations of the cli in a fresh interpreter
+    """
+    command = [sys.executable, "-c", "from stencil.cli import cli; cli(['--help'])"]
+    wall = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        wall = min(wall, time.perf_counter() - start)
+
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return Measurement("startup", wall, peak, 0, 0, 0)
+
+
+def _edit_page(root: pathlib.Path) -> None:
+    page = root / "pages" / "page-0.md"
+    with open(page, "a", encoding="utf-8") as f:
+        f.write(f"\nEdited at {time.time()}\n")
+
+
+def run_benchmarks(
+    root: pathlib.Path,
+    spec: SiteSpec,
+    jobs: int = 1,
+    report: Callable[[Measurement], None] = lambda _: None,
+) -> list[Measurement]:
+    """
+    Generates a site described by @spec beneath @root and measures
+    a cold build, a warm rebuild, and a rebuild after editing one page
+    """
+    raw_config = generate_site(root / "site", spec)
+    output = root / "output"
+    os.environ[CACHE_DIRECTORY_ENV] = str(root / "cache")
+
+    results = []
+    for scenario in SCENARIOS:
+        if scenario == "incremental":
+            _edit_page(root / "site")
+        results.append(measure(scenario, raw_config, output, jobs))
+        report(results[-1])
+    return results
+
+
+def find_regressions(
+    results: list[Measurement], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    Returns descriptions of scenarios whose wall time exceeds @baseline by
+    more than the fraction @threshold
+    """
+    previous = {
+        measurement["scenario"]: measurement for measurement in baseline["results"]
+    }
+    regressions = []
+    for measurement in results:
+        before = previous.get(measurement.scenario)
+        if not before:
+            continue
+        limit = before["wall_seconds"] * (1 + threshold)
+        if measurement.wall_seconds > limit:
+            regressions.append(
+                f"{measurement.scenario}: {measurement.wall_seconds:.3f}s "
+                f"exceeds baseline {before['wall_seconds']:.3f}s"
+            )
+    return regressions
+
+
+def _report(measurement: Measurement) -> None:
+    click.echo(
+        f"{measurement.scenario:<12} {measurement.wall_seconds:>10.3f} "
+        f"{measurement.peak_rss_mb:>10.1f} {measurement.written:>8} "
+        f"{measurement.skipped:>8} {measurement.files_per_second:>10.1f} "
+        f"{measurement.opens:>8}"
+    )
+
+
+@click.command()
+@click.option("--pages", default=SiteSpec.pages, help="Number of markdown pages")
+@click.option(
+    "--front-matter-keys",
+    default=SiteSpec.front_matter_keys,
+    help="Extra front matter keys per page",
+)
+@click.option(
+    "--paragraphs", default=SiteSpec.paragraphs, help="Paragraphs of body per page"
+)
+@click.option(
+    "--inheritance-depth",
+    default=SiteSpec.inheritance_depth,
+    help="Depth of the template inheritance chain",
+)
+@click.option("--assets", default=SiteSpec.assets, help="Number of static assets")
+@click.option(
+    "--asset-size", default=SiteSpec.asset_size, help="Size of each asset in bytes"
+)
+@click.option("--jobs", "-j", default=1, help="Workers to build with")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="Write results to this file",
+)
+@click.option(
+    "--baseline",
+    type=click.File("r", encoding="utf-8"),
+    help="Results of a previous run to compare against",
+)
+@click.option(
+    "--threshold",
+    default=0.2,
+    help="Fractional slowdown against the baseline that fails the run",
+)
+def main(
+    jobs: int,
+    json_path: Optional[pathlib.Path],
+    baseline: Optional[TextIO],
+    threshold: float,
+    **site: int,
+) -> None:
+    """
+    Benchmarks builds of a synthetic stencil site
+    """
+    spec = SiteSpec(**site)
+    click.echo(
+        f"{'scenario':<12} {'wall s':>10} {'peak MB':>10} {'written':>8} "
+        f"{'skipped':>8} {'files/s':>10} {'opens':>8}"
+    )
+    # Measured first, as peak memory is the largest of any child process so far
+    results = [measure_startup()]
+    _report(results[0])
+    with tempfile.TemporaryDirectory(prefix="stencil-bench-") as root:
+        results += run_benchmarks(pathlib.Path(root), spec, jobs, _report)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "spec": asdict(spec),
+                    "jobs": jobs,
+                    "results": [asdict(measurement) for measurement in results],
+                },
+                f,
+                indent=4,
+            )
+
+    if baseline:
+        regressions = find_regressions(results, json.load(baseline), threshold)
+        for regression in regressions:
+            click.echo(f"REGRESSION {regression}", err=True)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,131 @@
+"""
+Generates synthetic stencil sites of configurable size for benchmarking
+"""
+
+import json
+import pathlib
+import random
+from dataclasses import dataclass
+from typing import Any
+
+WORDS = (
+    "stencil static site generator template markdown content artefact build "
+    "render context metadata layout page asset output directory python jinja"
+).split()
+
+
+@dataclass(frozen=True)
+class SiteSpec:
+    """
+    Describes the shape of a synthetic site
+    """
+
+    pages: int = 1000
+    front_matter_keys: int = 5
+    paragraphs: int = 10
+    inheritance_depth: int = 3
+    assets: int = 100
+    asset_size: int = 4096
+    seed: int = 0
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _write_templates(directory: pathlib.Path, depth: int) -> str:
+    """
+    Writes a chain of @depth templates each extending the last,
+    returning the name of the most derived template
+    """
+    directory.mkdir(parents=True)
+    (directory / "layout-0.html").write_text(
+        "<!doctype html><html><head><title>{{ metadata.title }}</title></head>"
+        "<body>{% block body %}{% endblock %}"
+        "<footer>{{ ctx.variables.site_name }}</footer></body></html>\n",
+        encoding="utf-8",
+    )
+    for level in range(1, depth + 1):
+        (directory / f"layout-{level}.html").write_text(
+            f'{{% extends "layout-{level - 1}.html" %}}'
+            f'{{% block body %}}<div class="level-{level}">'
+            "{{ super() }}{% endblock %}</div>\n",
+            encoding="utf-8",
+        )
+    (directory / "page.html").write_text(
+        f'{{% extends "layout-{depth}.html" %}}'
+        "{% block body %}<main>{{ content }}</main>{% endblock %}\n",
+        encoding="utf-8",
+    )
+    return "page.html"
+
+
+def _write_page(
+    path: pathlib.Path, spec: SiteSpec, rng: random.Random, index: int
+) -> None:
+    metadata: dict[str, Any] = {
+        "template": "page.html",
+        "title": f"Page {index}",
+        "date": f"2024-{index % 12 + 1:02}-{index % 28 + 1:02}",
+        "tags": rng.sample(WORDS, 3),
+    }
+    for key in range(spec.front_matter_keys):
+        metadata[f"key_{key}"] = _sentence(rng, 8)
+
+    paragraphs = [f"# Page {index}"]
+    for paragraph in range(spec.paragraphs):
+        if paragraph % 4 == 3:
+            paragraphs.append(f"```\n{_sentence(rng, 12)}\n```")
+        else:
+            paragraphs.append(_sentence(rng, 60))
+
+    path.write_text(
+        f"---\n{json.dumps(metadata)}\n---\n" + "\n\n".join(paragraphs) + "\n",
+        encoding="utf-8",
+    )
+
+
+def generate_site(root: pathlib.Path, spec: SiteSpec) -> dict[str, Any]:
+    """
+    Writes a site described by @spec beneath @root, returning its stencil config
+    """
+    rng = random.Random(spec.seed)
+    pages = root / "pages"
+    static = root / "static"
+    pages.mkdir(parents=True)
+    static.mkdir(parents=True)
+
+    _write_templates(root / "templates", spec.inheritance_depth)
+    for index in range(spec.pages):
+        _write_page(pages / f"page-{index}.md", spec, rng, index)
+    for index in range(spec.assets):
+        (static / f"asset-{index}.bin").write_bytes(rng.randbytes(spec.asset_size))
+
+    config = {
+        "content": [
+            {
+                "builder": "static",
+                "source_directory": str(static),
+                "output_directory": "static",
+            },
+            {
+                "builder": "pages",
+                "source_directory": str(pages),
+                "output_directory": "",
+            },
+        ],
+        "builders": {
+            "static": {"flavor": "StaticBuilder", "config": {}},
+            "pages": {
+                "flavor": "MarkdownBuilder",
+                "config": {
+                    "template_directory": str(root / "templates"),
+                    "markdown_extensions": ["fenced_code"],
+                },
+            },
+        },
+        "variables": {"site_name": "benchmark.example"},
+    }
+    with open(root / "stencil.json", "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+    return config
@@ -6,10 +6,10 @@ import io
 import json
 import logging
 import pathlib
+from typing import Optional
 
 import click
-from stencil.impl.build import build_from_config
-from stencil.impl.serve import serve_directory
+from stencil.util import profile
 from stencil.util.config import parse_and_validate
 from stencil.util.config import StencilConfig
 from stencil.util.logging import configure_logging
@@ -18,13 +18,15 @@ logger = logging.getLogger(__name__)
 
 
 def _get_config(
-    ctx: click.Context, param: click.Option, value: io.TextIOWrapper
-) -> StencilConfig:
+    ctx: click.Context, param: click.Option, value: Optional[io.TextIOWrapper]
+) -> Optional[StencilConfig]:
     """
     Helper to take a file object and yield a stencil config
     """
     del ctx, param
 
+    if value is None:
+        return None
     return parse_and_validate(json.load(value))
 
 
@@ -71,11 +73,139 @@ def build() -> None:
     required=True,
     help="Location for the build outputs of stencil",
 )
-def build_project(config: StencilConfig, output_directory: pathlib.Path) -> None:
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of workers to render artefacts across",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Rebuild all outputs, even those that are unchanged since the last build",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running, rebuilding outputs as content and templates change",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="Record time spent building each artefact, printing a summary "
+    "and writing a chrome trace to the given file",
+)
+def build_project(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    config: StencilConfig,
+    output_directory: pathlib.Path,
+    jobs: int,
+    force: bool,
+    watch: bool,
+    profile_path: Optional[pathlib.Path],
+) -> None:
     """
     Builds a stencil project
     """
-    build_from_config(config, output_directory)
+    # Implementations are imported when their command runs, so that starting
+    # the cli only pays for the dependencies of the command being run
+    # pylint: disable=import-outside-toplevel
+    from stencil.impl.build import build_from_config
+    from stencil.impl.watch import watch_config
+
+    profiler = profile.enable() if profile_path else None
+    try:
+        if watch:
+            watch_config(config, output_directory, jobs, force=force)
+        else:
+            result = build_from_config(config, output_directory, jobs, force)
+            click.echo(result.summary(), err=True)
+    finally:
+        if profiler and profile_path:
+            profiler.write_trace(profile_path)
+            click.echo(profiler.summary(), err=True)
+
+
+@build.command("many")
+@click.option(
+    "--config",
+    "-c",
+    "configs",
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    multiple=True,
+    help="Location of a stencil config file, may be given many times. "
+    "Each project is built into a directory named after its config",
+)
+@click.option(
+    "--sites",
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="Location of a json file listing the config and output directory "
+    "of each project to build",
+)
+@click.option(
+    "--output-directory",
+    "-o",
+    type=click.Path(
+        exists=False,
+        file_okay=False,
+        dir_okay=True,
+        resolve_path=True,
+        path_type=pathlib.Path,
+    ),
+    default=None,
+    help="Directory to build each of the --config projects beneath",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of workers to build projects across",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Rebuild all outputs, even those that are unchanged since the last build",
+)
+def build_many(
+    configs: tuple[pathlib.Path, ...],
+    sites: Optional[pathlib.Path],
+    output_directory: Optional[pathlib.Path],
+    jobs: int,
+    force: bool,
+) -> None:
+    """
+    Builds many stencil projects in one go, sharing caches between them
+    """
+    # pylint: disable=import-outside-toplevel
+    from stencil.impl import many
+    from stencil.util.exceptions import StencilException
+
+    if bool(configs) == bool(sites):
+        raise click.UsageError("Give either --config or --sites")
+    if configs and output_directory is None:
+        raise click.UsageError("--config requires --output-directory")
+
+    try:
+        if sites:
+            projects = many.sites_from_file(sites)
+        else:
+            assert output_directory is not None
+            projects = many.sites_from_configs(configs, output_directory)
+    except StencilException as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    builds = many.build_many(projects, jobs, force)
+    click.echo(many.summary(builds))
+    failed = [elt.site for elt in builds if elt.error is not None]
+    if failed:
+        raise click.ClickException(f"Failed to build {', '.join(failed)}")
 
 
 @cli.command()
@@ -91,12 +221,45 @@ def build_project(config: StencilConfig, output_directory: pathlib.Path) -> None
     required=True,
     help="Directory to serve content from",
 )
-def serve(host: str, port: int, directory: pathlib.Path) -> None:
+@click.option(
+    "--live",
+    is_flag=True,
+    default=False,
+    help="Rebuild the project into the directory as it changes, "
+    "reloading browsers that view changed pages",
+)
+@click.option(
+    "--config",
+    "-c",
+    type=click.File(mode="r", encoding="utf-8"),
+    default=None,
+    callback=_get_config,
+    help="Location of stencil config file to rebuild from, required with --live",
+)
+def serve(
+    host: str,
+    port: int,
+    directory: pathlib.Path,
+    live: bool,
+    config: Optional[StencilConfig],
+) -> None:
     """
     Serves a stencil project
     """
-    serve_directory(
-        host,
-        port,
-        directory,
-    )
+    # pylint: disable=import-outside-toplevel
+    from stencil.impl.serve import serve_directory
+
+    if not live:
+        serve_directory(
+            host,
+            port,
+            directory,
+        )
+        return
+
+    if config is None:
+        raise click.UsageError("--live requires --config")
+
+    from stencil.impl.live import serve_live  # pylint: disable=import-outside-toplevel
+
+    serve_live(host, port, config, directory)
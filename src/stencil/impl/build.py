@@ -2,53 +2,397 @@
 Utilities for building a stencil project
 """
 
+import dataclasses
+import fnmatch
 import logging
+import os
 import pathlib
-from typing import List
+import re
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Union
 
 from stencil.models import builder
+from stencil.models import processor
+from stencil.models import registry
 from stencil.models.content import Artefact
 from stencil.models.context import BuildContext
+from stencil.util import counters
+from stencil.util import profile
 from stencil.util.config import StencilConfig
 from stencil.util.config import StencilContent
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import BuildManifest
+from stencil.util.manifest import digest_json
 
 
 logger = logging.getLogger(__name__)
 
 
-def enumerate_content(content: StencilContent) -> List[Artefact]:
+def _compile_globs(patterns: tuple[str, ...]) -> Optional[re.Pattern[str]]:
+    """
+    Returns a single expression matching any of the glob @patterns,
+    or None when there are no patterns
+    """
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(elt) for elt in patterns))
+
+
+def _scan(
+    directory: str,
+    prefix: str,
+    recursive: bool,
+    include: Optional[re.Pattern[str]],
+    exclude: Optional[re.Pattern[str]],
+) -> Iterator[str]:
+    """
+    Yields the paths of files beneath @directory relative to the content root,
+    @prefix is the relative path of @directory itself
+    """
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    for entry in entries:
+        relative = prefix + entry.name
+        if exclude and exclude.match(relative):
+            continue
+        # Symlinked directories aren't followed, so that cycles can't recurse forever
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                yield from _scan(entry.path, relative + "/", True, include, exclude)
+        elif entry.is_file() and (include is None or include.match(relative)):
+            yield relative
+
+
+def enumerate_content(content: StencilContent) -> Iterator[Artefact]:
     """
     Given a config item with source and output directory
-    return the artefacts in the directory
+    yield the artefacts beneath the directory, with destinations
+    mirroring the source tree
+
+    Paths relative to the source directory are matched against the
+    block's include and exclude globs, an excluded directory is not descended
     """
-    return [
-        Artefact(source, content.output_directory / source.name)
-        for source in content.source_directory.iterdir()
-        if source.is_file()
-    ]
+    for relative in _scan(
+        str(content.source_directory),
+        "",
+        content.recursive,
+        _compile_globs(content.include),
+        _compile_globs(content.exclude),
+    ):
+        yield Artefact(
+            content.source_directory / relative,
+            content.output_directory / relative,
+        )
 
 
-def build_from_config(config: StencilConfig, output_directory: pathlib.Path) -> None:
+def load_manifest(
+    config: StencilConfig, output_directory: pathlib.Path, force: bool = False
+) -> BuildManifest:
     """
-    Given a config file describing a stencil project
-    build projects outputs
+    Returns the manifest of the previous build of @config into @output_directory,
+    or an empty manifest if @force is set
+    """
+    config_digest = digest_json(dataclasses.asdict(config))
+    if force:
+        return BuildManifest(output_directory, config_digest)
+    return BuildManifest.load(output_directory, config_digest)
+
+
+def order_builders(
+    config: StencilConfig, builders: dict[str, builder.Builder]
+) -> list[str]:
+    """
+    Returns the names of @builders ordered so that each follows those it depends on,
+    otherwise keeping the order of @config
+    """
+    dependencies = {
+        name: set(config.builders[name].after) | elt.dependencies(builders)
+        for name, elt in builders.items()
+    }
+    for name, names in dependencies.items():
+        if unknown := names - builders.keys():
+            raise StencilException(
+                f"{name}: depends on unknown builders {', '.join(sorted(unknown))}"
+            )
+
+    ordered: list[str] = []
+    while dependencies:
+        ready = next(
+            (name for name, names in dependencies.items() if names <= set(ordered)),
+            None,
+        )
+        if ready is None:
+            raise StencilException(
+                f"Builders depend on each other: {', '.join(dependencies)}"
+            )
+        ordered.append(ready)
+        del dependencies[ready]
+    return ordered
+
+
+def construct_builders(config: StencilConfig) -> dict[str, builder.Builder]:
+    """
+    Constructs the builders described by @config, in dependency order
     """
-    ctx = BuildContext(output_directory=output_directory, variables=config.variables)
     builders = {
         name: builder.construct(name, elt) for name, elt in config.builders.items()
     }
+    return {name: builders[name] for name in order_builders(config, builders)}
 
-    for content_block in config.content:
-        for artefact in enumerate_content(content_block):
-            builders[content_block.builder].add_content(ctx, artefact)
 
-    logger.debug("Constructed builders: %s", builders)
-    logger.debug("Constructed build context: %s", ctx)
+def create_context(
+    config: StencilConfig, output_directory: pathlib.Path
+) -> BuildContext:
+    """
+    Returns an empty build context for @config, building into @output_directory
+    """
+    return BuildContext(
+        output_directory=output_directory,
+        variables=config.variables,
+        store=registry.create_store(config.metadata_store),
+    )
+
+
+def construct_processors(config: StencilConfig) -> list[processor.Processor]:
+    """
+    Constructs the post-processing steps described by @config, in the order given
+    """
+    return [processor.construct(elt) for elt in config.postprocess]
+
+
+def register_content(
+    config: StencilConfig, builders: dict[str, builder.Builder], ctx: BuildContext
+) -> None:
+    """
+    Registers the content described by @config with @builders and @ctx,
+    replacing anything registered previously
+    """
+    ctx.clear()
+    for elt in builders.values():
+        elt.clear()
 
     for content_block in config.content:
         for artefact in enumerate_content(content_block):
             logger.debug("Adding %s to builder: %s", artefact, content_block.builder)
             builders[content_block.builder].add_content(ctx, artefact)
 
+    # Builders are in dependency order, so plans see the outputs of earlier plans
     for elt in builders.values():
-        elt.build(ctx)
+        elt.plan(ctx)
+    ctx.store.flush()
+
+    logger.debug("Constructed builders: %s", builders)
+    logger.debug("Constructed build context: %s", ctx)
+
+
+def run_builders(
+    builders: dict[str, builder.Builder],
+    ctx: BuildContext,
+    manifest: BuildManifest,
+    jobs: int = 1,
+    processors: Sequence[processor.Processor] = (),
+) -> dict[str, float]:
+    """
+    Builds the content registered with @builders, recording outputs in @manifest,
+    then applies @processors to outputs that have not been processed already
+
+    Returns the seconds spent in each builder, in post-processing
+    and in saving the manifest
+    """
+    timings = {}
+    for name, elt in builders.items():
+        start = time.perf_counter()
+        with profile.span("build", name):
+            elt.build(ctx, manifest, jobs)
+        timings[name] = time.perf_counter() - start
+
+    if processors:
+        start = time.perf_counter()
+        with profile.span("build", "postprocess"):
+            processor.process_outputs(processors, manifest, jobs)
+        timings["postprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manifest.remove_stale()
+    manifest.save()
+    timings["manifest"] = time.perf_counter() - start
+    logger.info(
+        "Wrote %d outputs, %d unchanged",
+        len(manifest.written),
+        len(manifest.skipped),
+    )
+    return timings
+
+
+@dataclass(frozen=True)
+class BuildResult:
+    """
+    Outcome of building a stencil project
+    """
+
+    written: list[pathlib.Path]
+    skipped: list[pathlib.Path]
+    # Seconds spent in each phase of the build, keyed by phase or builder name
+    timings: dict[str, float]
+    # Whether content was registered again, rather than reloaded in place
+    registered: bool
+    # Events counted while building, such as cache hits and misses
+    counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        """
+        Total seconds spent building
+        """
+        return sum(self.timings.values())
+
+    def summary(self) -> str:
+        """
+        Returns a line describing the outputs written, and the hits and misses
+        of each cache used by the build
+        """
+        parts = [
+            f"Wrote {len(self.written)} outputs, {len(self.skipped)} unchanged "
+            f"in {self.seconds:.2f}s"
+        ]
+        caches = sorted({key.rsplit(".", 1)[0] for key in self.counts})
+        parts.extend(
+            f"{name} cache {self.counts.get(f'{name}.hits', 0)} hits, "
+            f"{self.counts.get(f'{name}.misses', 0)} misses"
+            for name in caches
+        )
+        return "; ".join(parts)
+
+
+class BuildSession:  # pylint: disable=too-many-instance-attributes
+    """
+    Builds a stencil project repeatedly, keeping builders, their templates
+    and parsed sources, and the build context warm between builds
+    """
+
+    def __init__(
+        self,
+        config: StencilConfig,
+        output_directory: pathlib.Path,
+        jobs: int = 1,
+        force: bool = False,
+    ) -> None:
+        self._config = config
+        self._jobs = jobs
+        self.manifest = load_manifest(config, output_directory, force)
+        self.ctx = create_context(config, output_directory)
+        self.builders = construct_builders(config)
+        self._processors = construct_processors(config)
+        # Changes are reported for resolved paths, content is registered unresolved
+        self._content_directories = [
+            (
+                os.path.join(os.path.realpath(elt.source_directory), ""),
+                os.path.join(os.path.abspath(elt.source_directory), ""),
+            )
+            for elt in config.content
+        ]
+        self._registered = False
+        self._built = False
+
+    def _register(self) -> None:
+        # A failed registration leaves content half registered, so it is redone
+        self._registered = False
+        register_content(self._config, self.builders, self.ctx)
+        self._registered = True
+
+    def _run(self, register: bool, timings: dict[str, float]) -> BuildResult:
+        # Counts are reported per build
+        counters.drain()
+        if register or not self._registered:
+            start = time.perf_counter()
+            self._register()
+            timings["register"] = time.perf_counter() - start
+            register = True
+
+        # The manifest of the previous build in this session is in memory
+        if self._built:
+            self.manifest.reset()
+        self._built = True
+        timings.update(
+            run_builders(
+                self.builders, self.ctx, self.manifest, self._jobs, self._processors
+            )
+        )
+        return BuildResult(
+            list(self.manifest.written),
+            list(self.manifest.skipped),
+            timings,
+            register,
+            counters.drain(),
+        )
+
+    def build(self) -> BuildResult:
+        """
+        Registers all content again and builds the outputs that changed
+        """
+        return self._run(True, {})
+
+    def rebuild(self, paths: Iterable[Union[str, os.PathLike[str]]]) -> BuildResult:
+        """
+        Builds the outputs affected by changes to @paths, content is only
+        registered again if files were added or removed or their metadata changed
+        """
+        changed = {
+            directory + path[len(resolved) :]
+            for path in (os.path.realpath(elt) for elt in paths)
+            for resolved, directory in self._content_directories
+            if path.startswith(resolved)
+        }
+        start = time.perf_counter()
+        register = False
+        if changed and self._registered:
+            # Content is registered again after a failed reload
+            self._registered = False
+            reloaded: set[str] = set()
+            for elt in self.builders.values():
+                paths_reloaded = elt.reload(self.ctx, changed)
+                if paths_reloaded is None:
+                    register = True
+                    break
+                reloaded |= paths_reloaded
+            # Files that weren't registered may be new content
+            register = register or reloaded != changed
+            self._registered = True
+        timings = {"reload": time.perf_counter() - start}
+        return self._run(register, timings)
+
+    def render_one(self, artefact: Artefact) -> bytes:
+        """
+        Returns the output built for registered @artefact without writing it
+        """
+        if not self._registered:
+            self._register()
+
+        for elt in self.builders.values():
+            rendered = elt.render(self.ctx, artefact)
+            if rendered is not None:
+                return rendered
+        raise StencilException(f"No builder builds {artefact.destination}")
+
+
+def build_from_config(
+    config: StencilConfig,
+    output_directory: pathlib.Path,
+    jobs: int = 1,
+    force: bool = False,
+) -> BuildResult:
+    """
+    Given a config file describing a stencil project
+    build projects outputs, rendering artefacts across @jobs workers
+
+    Outputs whose inputs are unchanged since the previous build are skipped
+    unless @force is set
+    """
+    return BuildSession(config, output_directory, jobs, force).build()
@@ -0,0 +1,41 @@
+"""
+Utilities for previewing a stencil project as it is edited
+"""
+
+import logging
+import pathlib
+import threading
+
+from stencil.impl.serve import create_server
+from stencil.impl.serve import LiveReload
+from stencil.impl.watch import watch_config
+from stencil.util.config import StencilConfig
+
+logger = logging.getLogger(__name__)
+
+# Seconds without a change before rebuilding, short enough that edits show promptly
+LIVE_DEBOUNCE = 0.03
+
+
+def serve_live(
+    hostname: str,
+    port: int,
+    config: StencilConfig,
+    output_directory: pathlib.Path,
+    jobs: int = 1,
+) -> None:
+    """
+    Serves @output_directory on @hostname:@port while rebuilding it from @config
+    as sources change, reloading browsers that view a changed output
+    """
+    live = LiveReload(output_directory)
+    httpd = create_server(hostname, port, output_directory, live)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Serving on http://%s:%s", hostname, port)
+    try:
+        watch_config(config, output_directory, jobs, LIVE_DEBOUNCE, live.notify)
+    finally:
+        live.close()
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,176 @@
+"""
+Utilities for building many stencil projects in a single process
+"""
+
+import json
+import logging
+import pathlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any
+from typing import Optional
+from typing import Sequence
+
+from stencil.impl.build import build_from_config
+from stencil.impl.build import BuildResult
+from stencil.util.config import parse_and_validate
+from stencil.util.config import StencilConfig
+from stencil.util.exceptions import StencilException
+from stencil.util.pool import parallel_map
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Site:
+    """
+    A stencil project to build, and where to build it
+    """
+
+    name: str
+    config: StencilConfig
+    output_directory: pathlib.Path
+
+
+@dataclass(frozen=True)
+class SiteBuild:
+    """
+    Outcome of building a single site, the result of a successful build
+    or the error that ended it
+    """
+
+    site: str
+    result: Optional[BuildResult] = None
+    error: Optional[str] = None
+
+
+def _load_config(path: pathlib.Path) -> StencilConfig:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return parse_and_validate(json.load(f))
+    except (OSError, ValueError) as exc:
+        raise StencilException(f"Could not load config {path}: {exc}") from exc
+    except StencilException as exc:
+        raise StencilException(f"{path}: {exc}") from exc
+
+
+def _check_names(sites: list[Site]) -> list[Site]:
+    duplicates = [
+        name for name, count in Counter(elt.name for elt in sites).items() if count > 1
+    ]
+    if duplicates:
+        raise StencilException(f"Sites share names: {', '.join(sorted(duplicates))}")
+    return sites
+
+
+def sites_from_configs(
+    configs: Sequence[pathlib.Path], output_directory: pathlib.Path
+) -> list[Site]:
+    """
+    Returns a site for each of @configs, named after the config file
+    and built into a directory of that name beneath @output_directory
+    """
+    return _check_names(
+        [
+            Site(path.stem, _load_config(path), output_directory / path.stem)
+            for path in configs
+        ]
+    )
+
+
+def sites_from_file(path: pathlib.Path) -> list[Site]:
+    """
+    Returns the sites listed in the json file at @path, as
+    {"sites": [{"name": ..., "config": ..., "output_directory": ...}]}
+    where names default to the stem of the config file
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw: dict[str, Any] = json.load(f)
+        entries = raw["sites"]
+        return _check_names(
+            [
+                Site(
+                    elt.get("name") or pathlib.Path(elt["config"]).stem,
+                    _load_config(pathlib.Path(elt["config"])),
+                    pathlib.Path(elt["output_directory"]),
+                )
+                for elt in entries
+            ]
+        )
+    except (OSError, ValueError) as exc:
+        raise StencilException(f"Could not load sites from {path}: {exc}") from exc
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise StencilException(
+            f"{path}: sites need a config and an output_directory"
+        ) from exc
+
+
+def _build_site(jobs: int, force: bool, site: Site) -> SiteBuild:
+    """
+    Builds @site, returning the error rather than raising it
+    so that the remaining sites are still built
+    """
+    logger.info("Building %s into %s", site.name, site.output_directory)
+    try:
+        result = build_from_config(site.config, site.output_directory, jobs, force)
+    # pylint: disable-next=broad-exception-caught
+    except (Exception, StencilException) as exc:
+        logger.error("%s: build failed: %s", site.name, exc)
+        return SiteBuild(site.name, error=str(exc))
+    return SiteBuild(site.name, result)
+
+
+def build_many(
+    sites: Sequence[Site], jobs: int = 1, force: bool = False
+) -> list[SiteBuild]:
+    """
+    Builds @sites across @jobs workers, returning the outcome of each in order
+
+    Sites are spread across the workers, sites with more workers than sites
+    are rendered across the rest. Compiled templates and converted markdown
+    are cached on disk for every site, and sites built in the same worker
+    share templates loaded from the same directory
+    """
+    workers = max(1, min(jobs, len(sites)))
+    site_jobs = max(1, jobs // workers)
+    return list(
+        parallel_map(
+            lambda site: _build_site(site_jobs, force, site), list(sites), workers
+        )
+    )
+
+
+def summary(builds: Sequence[SiteBuild]) -> str:
+    """
+    Returns a table of the outputs written and skipped and the time taken
+    by each site, followed by the totals across sites
+    """
+    lines = [
+        f"{'site':<24} {'written':>8} {'skipped':>8} {'seconds':>8} "
+        f"{'md hits':>8} {'md misses':>9}"
+    ]
+    totals = [0, 0, 0.0, 0, 0]
+    for build in builds:
+        if build.result is None:
+            lines.append(f"{build.site:<24} failed: {build.error}")
+            continue
+        row = [
+            len(build.result.written),
+            len(build.result.skipped),
+            build.result.seconds,
+            build.result.counts.get("markdown.hits", 0),
+            build.result.counts.get("markdown.misses", 0),
+        ]
+        totals = [total + elt for total, elt in zip(totals, row)]
+        lines.append(_row(build.site, row))
+    lines.append(_row("total", totals))
+    return "\n".join(lines)
+
+
+def _row(name: str, values: Sequence[float]) -> str:
+    written, skipped, seconds, hits, misses = values
+    return (
+        f"{name:<24} {written:>8} {skipped:>8} {seconds:>8.2f} "
+        f"{hits:>8} {misses:>9}"
+    )
@@ -2,25 +2,324 @@
 Utilities for serving build website content
 """
 
+import email.utils
+import functools
 import http.server
+import io
+import json
 import logging
 import os
 import pathlib
-import socketserver
+import queue
+import threading
+import urllib.parse
+from typing import Any
+from typing import BinaryIO
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Precompressed variants in order of preference, by content coding
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+INDEX_PAGES = ("index.html", "index.htm")
+
+LIVE_PATH = "/__stencil/live"
+
+# Seconds between comments sent to keep idle event streams open
+LIVE_KEEPALIVE = 15.0
+
+# Reloads the page when it, or a resource it loaded, is among the changed outputs
+LIVE_SNIPPET = b"""<script>
+new EventSource("/__stencil/live").addEventListener("reload", (event) => {
+  const page = location.pathname.replace(/\\/$/, "/index.html");
+  const loaded = performance.getEntriesByType("resource").map(
+    (entry) => new URL(entry.name).pathname
+  );
+  if (JSON.parse(event.data).some((url) => url === page || loaded.includes(url))) {
+    location.reload();
+  }
+});
+</script>
+"""
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """
+    Returns the content codings that an Accept-Encoding @header allows
+    """
+    accepted = set()
+    for elt in header.split(","):
+        coding, _, params = elt.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def inject_snippet(document: bytes) -> bytes:
+    """
+    Returns @document with the live reload snippet inserted before its closing body tag
+    """
+    index = document.lower().rfind(b"</body>")
+    if index < 0:
+        return document + LIVE_SNIPPET
+    return document[:index] + LIVE_SNIPPET + document[index:]
+
+
+class LiveReload:
+    """
+    Broadcasts the URLs of changed outputs to connected browsers
+    """
+
+    def __init__(self, output_directory: pathlib.Path) -> None:
+        self._output_directory = output_directory
+        self._subscribers: set[queue.Queue[Optional[str]]] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> "queue.Queue[Optional[str]]":
+        """
+        Returns a queue that receives each reload event, or None once closed
+        """
+        subscriber: queue.Queue[Optional[str]] = queue.Queue()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: "queue.Queue[Optional[str]]") -> None:
+        """
+        Stops sending events to @subscriber
+        """
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _broadcast(self, message: Optional[str]) -> None:
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(message)
+
+    def notify(self, outputs: list[pathlib.Path]) -> None:
+        """
+        Sends the URLs of @outputs to connected browsers
+        """
+        urls = sorted(
+            "/" + urllib.parse.quote(os.path.relpath(elt, self._output_directory))
+            for elt in outputs
+        )
+        logger.debug("Sending reload for %s", urls)
+        self._broadcast(json.dumps(urls))
+
+    def close(self) -> None:
+        """
+        Ends the event streams of connected browsers
+        """
+        self._broadcast(None)
+
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Request handler that serves files with sendfile, answers conditional
+    requests and prefers precompressed variants of files where they exist
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def _live(self) -> Optional[LiveReload]:
+        return getattr(self.server, "live", None)
+
+    def _resolve(self) -> Optional[str]:
+        """
+        Returns the file a request is for, or None if the request
+        should be answered by the default handler
+        """
+        path = self.translate_path(self.path)
+        trailing_slash = urllib.parse.urlsplit(self.path).path.endswith("/")
+        if os.path.isdir(path):
+            if not trailing_slash:
+                return None
+            path = next(
+                (
+                    os.path.join(path, index)
+                    for index in INDEX_PAGES
+                    if os.path.isfile(os.path.join(path, index))
+                ),
+                "",
+            )
+        if not path or not os.path.isfile(path):
+            return None
+        return path
+
+    def _select_variant(self, path: str) -> tuple[str, Optional[str]]:
+        """
+        Returns the variant of @path to serve and its content coding
+        """
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+        mtime_ns = os.stat(path).st_mtime_ns
+        for coding, suffix in ENCODINGS:
+            if coding not in accepted:
+                continue
+            try:
+                variant = os.stat(path + suffix)
+            except OSError:
+                continue
+            # Variants older than the file they compress are stale
+            if variant.st_mtime_ns >= mtime_ns:
+                return path + suffix, coding
+        return path, None
+
+    def _not_modified(self, etag: str, mtime: float) -> bool:
+        """
+        Returns true if the request's preconditions show the client
+        already holds the current representation
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or etag in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+
+    def send_head(self) -> Optional[BinaryIO]:
+        path = self._resolve()
+        if path is None:
+            return super().send_head()
+
+        content_type = self.guess_type(path)
+        inject = self._live is not None and content_type == "text/html"
+        served, coding = (path, None) if inject else self._select_variant(path)
+        try:
+            f: BinaryIO = open(served, "rb")  # pylint: disable=consider-using-with
+        except OSError:
+            self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        stat = os.fstat(f.fileno())
+        variant = f"-{coding}" if coding else "-live" if inject else ""
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}{variant}"'
+        not_modified = self._not_modified(etag, stat.st_mtime)
+        self.send_response(
+            http.HTTPStatus.NOT_MODIFIED if not_modified else http.HTTPStatus.OK
+        )
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if not_modified:
+            f.close()
+            self.end_headers()
+            return None
+
+        length = stat.st_size
+        if inject:
+            with f:
+                document = inject_snippet(f.read())
+            f, length = io.BytesIO(document), len(document)
+
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        self.end_headers()
+        return f
+
+    def _stream_events(self, live: LiveReload) -> None:
+        """
+        Holds the connection open, sending reload events as they are broadcast
+        """
+        # Subscribe first, so no event sent after the response starts is missed
+        subscriber = live.subscribe()
+        # Event streams have no length, so the connection can't be reused after
+        self.close_connection = True  # pylint: disable=attribute-defined-outside-init
+        try:
+            self.send_response(http.HTTPStatus.OK)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            while True:
+                try:
+                    message = subscriber.get(timeout=LIVE_KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    continue
+                if message is None:
+                    return
+                self.wfile.write(f"event: reload\ndata: {message}\n\n".encode())
+        except OSError:
+            logger.debug("Live reload client %s disconnected", self.address_string())
+        finally:
+            live.unsubscribe(subscriber)
+
+    def do_GET(self) -> None:
+        live = self._live
+        if live is not None and urllib.parse.urlsplit(self.path).path == LIVE_PATH:
+            self._stream_events(live)
+            return
+        super().do_GET()
+
+    # pylint: disable-next=redefined-builtin
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def copyfile(self, source, outputfile) -> None:  # type: ignore[no-untyped-def]
+        """
+        Sends @source to the client, without copying through userspace
+        where the platform allows
+        """
+        del outputfile
+        self.connection.sendfile(source)
+
+
+class PreviewServer(http.server.ThreadingHTTPServer):
+    """
+    HTTP server that handles each connection on its own thread
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+    # Set to push reload events to browsers and inject the snippet that receives them
+    live: Optional[LiveReload] = None
+
+
+def create_server(
+    hostname: str,
+    port: int,
+    directory: pathlib.Path,
+    live: Optional[LiveReload] = None,
+) -> PreviewServer:
+    """
+    Returns a server bound to @hostname:@port for content in @directory,
+    that pushes reloads from @live to browsers if given
+    """
+    handler = functools.partial(PreviewRequestHandler, directory=str(directory))
+    httpd = PreviewServer((hostname, port), handler)
+    httpd.live = live
+    return httpd
+
 
 def serve_directory(hostname: str, port: int, directory: pathlib.Path) -> None:
     """
     Serves file content from @directory on @hostname:@port
     """
-    os.chdir(directory)
-    handler = http.server.SimpleHTTPRequestHandler
-    httpd = socketserver.TCPServer((hostname, port), handler)
+    httpd = create_server(hostname, port, directory)
     try:
         logger.info("Serving on http://%s:%s", hostname, port)
         httpd.serve_forever()
     except KeyboardInterrupt:
         logger.warning("Caught keyboard interrupt")
+    finally:
         httpd.server_close()
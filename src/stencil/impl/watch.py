@@ -0,0 +1,99 @@
+"""
+Utilities for rebuilding a stencil project as its inputs change
+"""
+
+import logging
+import pathlib
+import time
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+
+import inotify.adapters  # type: ignore[import-untyped]
+import inotify.constants  # type: ignore[import-untyped]
+from stencil.impl.build import BuildSession
+from stencil.util.config import StencilConfig
+from stencil.util.exceptions import StencilException
+
+logger = logging.getLogger(__name__)
+
+_WATCH_MASK = (
+    inotify.constants.IN_CLOSE_WRITE
+    | inotify.constants.IN_CREATE
+    | inotify.constants.IN_DELETE
+    | inotify.constants.IN_MOVED_FROM
+    | inotify.constants.IN_MOVED_TO
+)
+
+
+def watch_changes(
+    directories: list[pathlib.Path],
+    ignore: pathlib.Path,
+    debounce: float,
+) -> Iterator[set[pathlib.Path]]:
+    """
+    Yields the set of paths changed beneath @directories, once no further
+    change has arrived for @debounce seconds. Changes beneath @ignore are dropped
+    """
+    tree = inotify.adapters.InotifyTrees(
+        [str(directory) for directory in directories],
+        mask=_WATCH_MASK,
+        block_duration_s=debounce,
+    )
+
+    changed: set[pathlib.Path] = set()
+    last_change = 0.0
+    for event in tree.event_gen(yield_nones=True):
+        if event is not None:
+            _, _, path, filename = event
+            changed_path = pathlib.Path(path, filename)
+            if not changed_path.is_relative_to(ignore):
+                changed.add(changed_path)
+                last_change = time.monotonic()
+            continue
+
+        if changed and time.monotonic() - last_change >= debounce:
+            yield changed
+            changed = set()
+
+
+def watch_config(  # pylint: disable=too-many-arguments
+    config: StencilConfig,
+    output_directory: pathlib.Path,
+    jobs: int = 1,
+    debounce: float = 0.2,
+    on_rebuild: Optional[Callable[[list[pathlib.Path]], None]] = None,
+    *,
+    force: bool = False,
+) -> None:
+    """
+    Builds the project described by @config, then rebuilds the affected
+    outputs each time its content or templates change
+
+    @on_rebuild is called after each rebuild with the outputs whose content changed,
+    the first build rebuilds all outputs if @force is set
+    """
+    session = BuildSession(config, output_directory, jobs, force)
+    session.build()
+
+    directories = {content.source_directory.resolve() for content in config.content}
+    for elt in session.builders.values():
+        directories.update(path.resolve() for path in elt.input_directories())
+
+    logger.info("Watching %s for changes", ", ".join(map(str, sorted(directories))))
+    try:
+        for changed in watch_changes(
+            sorted(directories), output_directory.resolve(), debounce
+        ):
+            logger.info("Rebuilding after changes to %d files", len(changed))
+            logger.debug("Changed files: %s", changed)
+            # A failed rebuild shouldn't end the watch, the next edit may fix it
+            try:
+                result = session.rebuild(changed)
+                if on_rebuild and result.written:
+                    on_rebuild(result.written)
+            # pylint: disable-next=broad-exception-caught
+            except (Exception, StencilException) as exc:
+                logger.error("Rebuild failed: %s", exc)
+    except KeyboardInterrupt:
+        logger.warning("Caught keyboard interrupt")
@@ -5,23 +5,112 @@ objects that are responsible for recieving input files and 'building' them
 to outputs with some particular strategy
 """
 
+# Builders are found by subclassing Builder, so all builtin flavors live here
+# pylint: disable=too-many-lines
+
+import collections
+import contextlib
+import datetime
+import fnmatch
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
 import pathlib
-import shutil
+import re
+import threading
+import urllib.parse
 from abc import ABC
 from abc import abstractmethod
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Sequence
 from typing import Type
+from typing import TYPE_CHECKING
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
 
-import markdown
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
-from jinja2 import Template
 from stencil.models.content import Artefact
 from stencil.models.context import BuildContext
+from stencil.models.context import TrackedContext
+from stencil.models.registry import Metadata
+from stencil.util import profile
 from stencil.util.config import StencilBuilder
 from stencil.util.exceptions import StencilException
-from stencil.util.metadata import get_file_content
+from stencil.util.fragments import DEFAULT_MAX_FRAGMENT_BYTES
+from stencil.util.fragments import FragmentCache
+from stencil.util.manifest import BuildManifest
+from stencil.util.manifest import digest_bytes
+from stencil.util.manifest import digest_json
+from stencil.util.manifest import file_stamp
+from stencil.util.manifest import replace_file
+from stencil.util.manifest import write_chunks
+from stencil.util.pipeline import PipelineStats
+from stencil.util.pipeline import run_pipeline
+from stencil.util.pipeline import Stage
+from stencil.util.pool import parallel_map
+from stencil.util.publish import is_published
+from stencil.util.publish import MODES
+from stencil.util.publish import publish
+from stencil.util.source import SourceCache
+from stencil.util.templates import is_fixed_point
+from stencil.util.templates import template_environment
+
+if TYPE_CHECKING:
+    import markdown
+
+logger = logging.getLogger(__name__)
+
+
+COPY_THREADS_PER_JOB = 4
+
+# Items queued between the stages of pipelined builds, per pipeline thread
+PIPELINE_DEPTH_PER_THREAD = 16
+
+# Bumped when converting markdown changes its output, to invalidate cached fragments
+FRAGMENT_VERSION = 1
+
+_CONVERTERS = threading.local()
+
+
+@functools.cache
+def _markdown_versions() -> tuple[str, ...]:
+    """
+    Returns the versions of the packages that converted markdown depends on
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from importlib import metadata
+
+    versions = []
+    for package in ("markdown", "pygments"):
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            pass
+    return tuple(versions)
+
+
+def _markdown_converter(extensions: tuple[str, ...]) -> "markdown.Markdown":
+    """
+    Returns a markdown converter with @extensions loaded, converters are
+    reused across documents but not shared between threads
+    """
+    # Imported on first use, so that builds without markdown content don't pay for it
+    import markdown  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    converters: dict[tuple[str, ...], "markdown.Markdown"] = getattr(
+        _CONVERTERS, "converters", {}
+    )
+    _CONVERTERS.converters = converters
+    if extensions not in converters:
+        converters[extensions] = markdown.Markdown(extensions=list(extensions))
+    return converters[extensions]
 
 
 class Builder(ABC):
@@ -34,9 +123,10 @@ class Builder(ABC):
         self._content: List[Artefact] = []
 
     @abstractmethod
-    def build(self, ctx: BuildContext) -> None:
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
         """
         Given the content stored inside the builder, process the content to build outputs
+        across @jobs workers, skipping outputs that @manifest shows are up to date
         """
 
     def add_content(self, ctx: BuildContext, content: Artefact) -> None:
@@ -46,130 +136,486 @@ class Builder(ABC):
         del ctx
         self._content.append(content)
 
+    def clear(self) -> None:
+        """
+        Removes all content registered to the builder
+        """
+        self._content.clear()
+
+    def plan(self, ctx: BuildContext) -> None:
+        """
+        Registers outputs derived from the content in @ctx,
+        called once all content has been registered
+        """
+
+    def dependencies(self, builders: dict[str, "Builder"]) -> set[str]:
+        """
+        Returns the names of those of @builders whose content this builder
+        reads while planning, they are planned and built before it
+        """
+        del builders
+        return set()
+
+    def input_directories(self) -> List[pathlib.Path]:
+        """
+        Returns directories other than content sources that outputs are built from
+        """
+        return []
+
+    def _reload(self, ctx: BuildContext, artefact: Artefact) -> bool:
+        """
+        Reloads the changed source of @artefact, returns false if
+        what was registered for it no longer holds
+        """
+        del ctx, artefact
+        return True
+
+    def reload(self, ctx: BuildContext, changed: set[str]) -> Optional[set[str]]:
+        """
+        Reloads registered content whose absolute source path is in @changed,
+        returns the paths reloaded, or None if content must be registered again
+        """
+        reloaded = set()
+        for artefact in self._content:
+            path = os.path.abspath(artefact.source)
+            if path not in changed:
+                continue
+            if not os.path.isfile(path) or not self._reload(ctx, artefact):
+                return None
+            reloaded.add(path)
+        return reloaded
+
+    def render(self, ctx: BuildContext, artefact: Artefact) -> Optional[bytes]:
+        """
+        Returns the output built for @artefact without writing it,
+        or None if @artefact is not built by this builder
+        """
+        del ctx
+        if artefact not in self._content:
+            return None
+        raise StencilException(f"{self._name}: can't render {artefact.source}")
+
     def __repr__(self) -> str:
         attrs = ", ".join([f"{key}={value}" for key, value in vars(self).items()])
         return f"{self.__class__.__name__}({attrs})"
 
 
-class MarkdownBuilder(Builder):
+class TemplateBuilder(Builder):
     """
-    Build strategy that takes markdown documents as an input
+    Abstract build strategy for content that is rendered through jinja2 templates
     """
 
+    # Name under which converting source bodies is profiled
+    _body_phase = "body"
+
     def __init__(
         self,
         name: str,
         template_directory: pathlib.Path,
-        markdown_extensions: Optional[list[str]] = None,
         recursive: bool = False,
+        pipeline: int = 0,
     ) -> None:
         super().__init__(name)
-        self._template_env = Environment(loader=FileSystemLoader([template_directory]))
+        if pipeline < 0:
+            raise StencilException(f"{name}: pipeline must be at least 0")
+        self._template_directory = pathlib.Path(template_directory)
+        self._template_loader, self._template_env = template_environment(
+            template_directory
+        )
         self._recursive = recursive
-        self._markdown_extensions = markdown_extensions or []
+        self._sources = SourceCache(name)
+        self._pipeline = pipeline
+        self.pipeline_stats: Optional[PipelineStats] = None
+
+    @abstractmethod
+    def _render_body(self, body: str) -> str:
+        """
+        Converts the body of a source file to the content passed to its template
+        """
 
-    def _build_artefact(self, ctx: BuildContext, artefact: Artefact) -> str:
-        metadata, content = get_file_content(artefact.source)
+    def _build_artefact(self, ctx: TrackedContext, artefact: Artefact) -> Iterator[str]:
+        """
+        Returns the rendered chunks of @artefact, rendering is streamed
+        unless the builder is recursive
+        """
+        metadata, content = self._sources.get(artefact.source)
 
         template_name = metadata.get("template")
         if not template_name:
             raise StencilException("No template provided")
 
-        body = markdown.markdown(content, extensions=self._markdown_extensions)
+        source = str(artefact.source)
+        with profile.span(self._body_phase, self._name, source):
+            body = self._render_body(content)
 
         template = self._template_env.get_template(template_name)
-        current = template.render(content=body, metadata=metadata, ctx=ctx)
-        previous = None
-
         if not self._recursive:
-            return current
+            # Rendering is streamed, so callers time it as they consume the chunks
+            return template.generate(content=body, metadata=metadata, ctx=ctx)
+
+        with profile.span("render", self._name, source):
+            current = template.render(content=body, metadata=metadata, ctx=ctx)
+
+        with profile.span("recursive", self._name, source):
+            previous = None
+            while current != previous and not is_fixed_point(current):
+                previous = current
+                current = self._template_env.from_string(current).render(
+                    metadata=metadata, ctx=ctx
+                )
+
+        return iter((current,))
+
+    def _write_artefact(
+        self,
+        ctx: BuildContext,
+        manifest: BuildManifest,
+        artefact: Artefact,
+    ) -> tuple[str, bool, dict[str, str]]:
+        """
+        Renders an artefact to its destination, reporting which artefact failed on error
+
+        Returns the content hash of the output, whether it was replaced
+        and the reads of @ctx made while rendering it
+        """
+        destination = ctx.output_directory / artefact.destination
+        tracked = TrackedContext(ctx)
+        with self._reporting(artefact):
+            chunks = profile.TimedIterator(self._build_artefact(tracked, artefact))
+            start = profile.now()
+            digest, written = write_chunks(
+                destination,
+                (chunk.encode("utf-8") for chunk in chunks),
+                manifest.existing_digest(destination),
+            )
+            # Streamed rendering is interleaved with writing, so split the time
+            elapsed = profile.now() - start
+            source = str(artefact.source)
+            if not self._recursive:
+                profile.record("render", self._name, source, start, chunks.elapsed)
+            profile.record(
+                "write",
+                self._name,
+                source,
+                start + chunks.elapsed,
+                elapsed - chunks.elapsed,
+            )
+            return digest, written, tracked.reads
+
+    @contextlib.contextmanager
+    def _reporting(self, artefact: Artefact) -> Iterator[None]:
+        """
+        Reports which artefact failed on errors raised within the block
+        """
+        try:
+            yield
+        # pylint: disable-next=broad-exception-caught
+        except (Exception, StencilException) as exc:
+            raise StencilException(
+                f"{self._name}: failed to build {artefact.source}: {exc}"
+            ) from exc
+
+    def _prefetch(
+        self, ctx: BuildContext, manifest: BuildManifest, artefact: Artefact
+    ) -> tuple[Artefact, Optional[str]]:
+        """
+        Reads the source of @artefact and the hash of its existing output
+        """
+        with self._reporting(artefact):
+            self._sources.get(artefact.source)
+            destination = ctx.output_directory / artefact.destination
+            return artefact, manifest.existing_digest(destination)
+
+    def _render(
+        self, ctx: BuildContext, prefetched: tuple[Artefact, Optional[str]]
+    ) -> tuple[Artefact, Optional[str], bytes, dict[str, str]]:
+        """
+        Renders a prefetched artefact in memory, along with the reads of @ctx
+        made while rendering it
+        """
+        artefact, existing = prefetched
+        tracked = TrackedContext(ctx)
+        with self._reporting(artefact):
+            chunks = self._build_artefact(tracked, artefact)
+            with (
+                contextlib.nullcontext()
+                if self._recursive
+                else profile.span("render", self._name, str(artefact.source))
+            ):
+                data = "".join(chunks).encode("utf-8")
+            return artefact, existing, data, tracked.reads
+
+    def _store(
+        self,
+        ctx: BuildContext,
+        rendered: tuple[Artefact, Optional[str], bytes, dict[str, str]],
+    ) -> tuple[str, bool, dict[str, str]]:
+        """
+        Writes a rendered artefact unless its output already holds the same content
+        """
+        artefact, existing, data, reads = rendered
+        digest = digest_bytes(data)
+        if digest == existing:
+            return digest, False, reads
+        with self._reporting(artefact):
+            with profile.span("write", self._name, str(artefact.source)):
+                replace_file(ctx.output_directory / artefact.destination, data)
+        return digest, True, reads
 
-        while current != previous:
-            previous = current
-            current = Template(current).render(metadata=metadata, ctx=ctx)
+    def _run_pipeline(
+        self, ctx: BuildContext, manifest: BuildManifest, artefacts: list[Artefact]
+    ) -> tuple[list[tuple[str, bool, dict[str, str]]], PipelineStats]:
+        """
+        Builds @artefacts with sources read and outputs written on
+        pipeline threads, while rendering on another
+        """
+        # Outputs are written one at a time, as batching them on a thread would
+        # serialise the round trips that the write threads otherwise overlap
+        return run_pipeline(
+            [
+                Stage(
+                    "read",
+                    functools.partial(self._prefetch, ctx, manifest),
+                    self._pipeline,
+                ),
+                Stage("render", functools.partial(self._render, ctx)),
+                Stage("write", functools.partial(self._store, ctx), self._pipeline),
+            ],
+            artefacts,
+            self._pipeline * PIPELINE_DEPTH_PER_THREAD,
+        )
+
+    def _build_pipelined(
+        self,
+        ctx: BuildContext,
+        manifest: BuildManifest,
+        artefacts: list[Artefact],
+        jobs: int,
+    ) -> list[tuple[str, bool, dict[str, str]]]:
+        """
+        Builds @artefacts through a pipeline in each of @jobs workers,
+        each taking a contiguous share of them
+        """
+        # Directories are made once up front, rather than for every output
+        directories = {
+            (ctx.output_directory / artefact.destination).parent
+            for artefact in artefacts
+        }
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
 
-        return current
+        share = max(1, -(-len(artefacts) // jobs))
+        shares = [
+            artefacts[start : start + share]
+            for start in range(0, len(artefacts), share)
+        ]
+        results: list[tuple[str, bool, dict[str, str]]] = []
+        stats: Optional[PipelineStats] = None
+        for written, share_stats in parallel_map(
+            functools.partial(self._run_pipeline, ctx, manifest), shares, jobs
+        ):
+            results.extend(written)
+            if stats is None:
+                stats = share_stats
+            else:
+                stats.merge(share_stats)
+
+        self.pipeline_stats = stats
+        if stats is not None:
+            logger.info("%s: pipeline stages\n%s", self._name, stats.summary())
+        return results
 
     def add_content(self, ctx: BuildContext, content: Artefact) -> None:
         """
         Registers content to the builder
         """
         super().add_content(ctx, content)
-        metadata, _ = get_file_content(content.source)
-        name = metadata.get("name") or content.source.name
-        ctx.register_content(name, content, metadata)
+        path = content.source
+        source = self._sources.load(path)
+        name = source.metadata.get("name") or path.name
+        # Keep the context's compact copy rather than the parsed dict
+        source.metadata = ctx.register_content(name, content, source.metadata)
+
+    def input_directories(self) -> List[pathlib.Path]:
+        return [self._template_directory]
 
-    def build(self, ctx: BuildContext) -> None:
+    def _reload(self, ctx: BuildContext, artefact: Artefact) -> bool:
+        registered = self._sources.cached(artefact.source)
+        source = self._sources.load(artefact.source)
+        if source is registered:
+            return True
+        # Other content may query the metadata, so only body edits are reloaded
+        if source.metadata != registered.metadata:
+            return False
+        source.metadata = registered.metadata
+        return True
+
+    def render(self, ctx: BuildContext, artefact: Artefact) -> Optional[bytes]:
+        if artefact not in self._content:
+            return None
+        self._template_loader.clear()
+        chunks = self._build_artefact(TrackedContext(ctx), artefact)
+        return "".join(chunks).encode("utf-8")
+
+    def _inputs(self, artefact: Artefact, manifest: BuildManifest) -> dict[str, str]:
+        """
+        Returns the content hashes of the files @artefact is built from
+        """
+        source = self._sources.cached(artefact.source)
+        digest = source.digest or manifest.file_digest(artefact.source)
+        inputs = {f"source:{artefact.source}": digest}
+        template_name = source.metadata.get("template")
+        if template_name:
+            for filename in self._template_loader.dependencies(
+                self._template_env, template_name
+            ):
+                inputs[f"template:{filename}"] = manifest.file_digest(filename)
+        return inputs
+
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
+        self._template_loader.clear()
+
+        pending = []
         for artefact in self._content:
             destination = ctx.output_directory / artefact.destination
-            destination.parent.mkdir(exist_ok=True, parents=True)
-            content = self._build_artefact(ctx, artefact)
-            with open(destination, "w", encoding="utf-8") as f:
-                f.write(content)
+            inputs = self._inputs(artefact, manifest)
+            # Outputs depend on the content read while last rendering them
+            reads = ctx.replay(manifest.previous_inputs(destination))
+            if not manifest.is_current(destination, inputs | reads):
+                pending.append((artefact, destination, inputs))
+
+        logger.debug(
+            "%s: rendering %d of %d artefacts",
+            self._name,
+            len(pending),
+            len(self._content),
+        )
+        artefacts = [artefact for artefact, _, _ in pending]
+        written = (
+            self._build_pipelined(ctx, manifest, artefacts, jobs)
+            if self._pipeline
+            else parallel_map(
+                functools.partial(self._write_artefact, ctx, manifest),
+                artefacts,
+                jobs,
+            )
+        )
+        for (_, destination, inputs), (digest, replaced, reads) in zip(
+            pending, written
+        ):
+            manifest.record(destination, inputs | reads, digest, replaced)
 
 
-class HTMLBuilder(Builder):
+class MarkdownBuilder(TemplateBuilder):
     """
-    Build strategy for building templated HTML with jinja2
+    Build strategy that takes markdown documents as an input
     """
 
-    def __init__(
-        self, name: str, template_directory: pathlib.Path, recursive: bool = False
+    _body_phase = "markdown"
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        name: str,
+        template_directory: pathlib.Path,
+        markdown_extensions: Optional[list[str]] = None,
+        recursive: bool = False,
+        pipeline: int = 0,
+        fragment_cache: int = DEFAULT_MAX_FRAGMENT_BYTES,
     ) -> None:
-        super().__init__(name)
-        self._template_env = Environment(loader=FileSystemLoader([template_directory]))
-        self._recursive = recursive
+        super().__init__(name, template_directory, recursive, pipeline)
+        self._markdown_extensions = markdown_extensions or []
+        self._fragments = (
+            FragmentCache("markdown", fragment_cache) if fragment_cache else None
+        )
 
-    def _build_artefact(self, ctx: BuildContext, artefact: Artefact) -> str:
-        metadata, body = get_file_content(artefact.source)
+    def _render_body(self, body: str) -> str:
+        extensions = tuple(self._markdown_extensions)
+        if self._fragments is None:
+            return _markdown_converter(extensions).reset().convert(body)
 
-        template_name = metadata.get("template")
-        if not template_name:
-            raise StencilException("No template provided")
+        key = digest_json([FRAGMENT_VERSION, _markdown_versions(), extensions, body])
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = _markdown_converter(extensions).reset().convert(body)
+            self._fragments.put(key, fragment)
+        return fragment
 
-        template = self._template_env.get_template(template_name)
-        current = template.render(content=body, metadata=metadata, ctx=ctx)
-        if not self._recursive:
-            return current
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
+        if self._fragments is None:
+            super().build(ctx, manifest, jobs)
+            return
 
-        previous = None
-        while current != previous:
-            previous = current
-            current = Template(current).render(ctx=ctx, metadata=metadata)
+        hits, misses = self._fragments.hits, self._fragments.misses
+        super().build(ctx, manifest, jobs)
+        hits, misses = self._fragments.hits - hits, self._fragments.misses - misses
+        logger.info("%s: markdown cache %d hits, %d misses", self._name, hits, misses)
+        if misses:
+            self._fragments.trim()
 
-        return current
 
-    def add_content(self, ctx: BuildContext, content: Artefact) -> None:
-        """
-        Registers content to the builder
-        """
-        super().add_content(ctx, content)
-        metadata, _ = get_file_content(content.source)
-        name = metadata.get("name") or content.source.name
-        ctx.register_content(name, content, metadata)
+class HTMLBuilder(TemplateBuilder):
+    """
+    Build strategy for building templated HTML with jinja2
+    """
 
-    def build(self, ctx: BuildContext) -> None:
-        for artefact in self._content:
-            destination = ctx.output_directory / artefact.destination
-            content = self._build_artefact(ctx, artefact)
-            with open(destination, "w", encoding="utf-8") as f:
-                f.write(content)
+    def _render_body(self, body: str) -> str:
+        return body
 
 
 class StaticBuilder(Builder):
     """
-    Build strategy that takes markdown documents as an input
+    Build strategy that publishes files to the output directory as they are
     """
 
-    def __init__(self, name: str, symlink: bool = False) -> None:
+    def __init__(self, name: str, mode: str = "copy", symlink: bool = False) -> None:
         super().__init__(name)
-        self._symlink: bool = symlink
+        self._mode = "symlink" if symlink else mode
+        if self._mode not in MODES:
+            raise StencilException(
+                f"{name}: unknown mode {mode}, expected one of {', '.join(MODES)}"
+            )
+
+    def _publish(self, pending: tuple[Artefact, pathlib.Path]) -> None:
+        artefact, destination = pending
+        with profile.span("write", self._name, str(artefact.source)):
+            publish(artefact.source, destination, self._mode)
 
-    def build(self, ctx: BuildContext) -> None:
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
+        pending = []
         for artefact in self._content:
             destination = ctx.output_directory / artefact.destination
-            destination.parent.mkdir(exist_ok=True, parents=True)
-            shutil.copy(artefact.source, destination)
+            stat = os.stat(artefact.source)
+            stamp = file_stamp(stat)
+            inputs = {f"source:{artefact.source}": stamp, "mode": self._mode}
+            # Post-processed assets no longer match their source, but are current
+            if manifest.is_current(destination, inputs):
+                continue
+            if is_published(artefact.source, destination, self._mode, stat):
+                manifest.record(destination, inputs, None, False, stamp=stamp)
+            else:
+                pending.append((artefact, destination, inputs, stamp))
+
+        logger.debug(
+            "%s: publishing %d of %d assets",
+            self._name,
+            len(pending),
+            len(self._content),
+        )
+        # Publishing is bound by I/O rather than CPU, so use more threads than jobs
+        with ThreadPoolExecutor(max_workers=jobs * COPY_THREADS_PER_JOB) as executor:
+            list(
+                executor.map(
+                    self._publish,
+                    [
+                        (artefact, destination)
+                        for artefact, destination, _, _ in pending
+                    ],
+                )
+            )
+
+        # Published outputs keep the size and modification time of their source
+        for _, destination, inputs, stamp in pending:
+            manifest.record(destination, inputs, None, stamp=stamp)
 
     def add_content(self, ctx: BuildContext, content: Artefact) -> None:
         """
@@ -178,6 +624,542 @@ class StaticBuilder(Builder):
         super().add_content(ctx, content)
         ctx.register_content(content.source.name, content)
 
+    def render(self, ctx: BuildContext, artefact: Artefact) -> Optional[bytes]:
+        if artefact not in self._content:
+            return None
+        return artefact.source.read_bytes()
+
+
+@dataclass(frozen=True)
+class CollectionPage:
+    """
+    One page of a paginated collection, as passed to its template
+    """
+
+    group: Any
+    number: int
+    count: int
+    items: list[tuple[Metadata, Artefact]]
+    artefact: Artefact
+    previous: Optional[Artefact] = None
+    next: Optional[Artefact] = None
+
+
+# Value of the group key, and the content listed under it
+CollectionGroup = tuple[Any, list[tuple[Metadata, Artefact]]]
+
+
+# Group values differing only in case or these separators are the same group
+_GROUP_SEPARATORS = re.compile(r"[\s_-]+")
+_SLUG_SEPARATORS = re.compile(r"[\W_]+")
+
+# Length of the hash telling apart groups whose slugs would otherwise collide
+SLUG_HASH_LENGTH = 8
+
+
+def _group_key(value: Any) -> str:
+    return _GROUP_SEPARATORS.sub("-", str(value).casefold()).strip("-")
+
+
+def _slug(key: str) -> str:
+    """
+    Returns the path segment of the group @key, keeping letters of any script
+    """
+    return _SLUG_SEPARATORS.sub("-", key).strip("-")
+
+
+def _slugs(keys: Sequence[str]) -> dict[str, str]:
+    """
+    Returns the slug of each of @keys, keys whose slugs drop punctuation that
+    tells them apart from another key get a hash of the key appended
+    """
+    slugs = {key: _slug(key) for key in keys}
+    counts = collections.Counter(slugs.values())
+    for key, slug in slugs.items():
+        if not slug or (slug != key and counts[slug] > 1):
+            suffix = digest_bytes(key.encode("utf-8"))[:SLUG_HASH_LENGTH]
+            slugs[key] = f"{slug}-{suffix}" if slug else suffix
+    return slugs
+
+
+class CollectionBuilder(Builder):  # pylint: disable=too-many-instance-attributes
+    """
+    Build strategy that renders paginated listings of registered content,
+    optionally grouped by the value of a metadata key
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        template_directory: pathlib.Path,
+        *,
+        template: str,
+        output_directory: str = "",
+        group_by: Optional[str] = None,
+        where: Optional[dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        page_size: int = 10,
+        path: str = "{group}/page-{page}.html",
+    ) -> None:
+        super().__init__(name)
+        if page_size < 1:
+            raise StencilException(f"{name}: page_size must be at least 1")
+        self._template_directory = pathlib.Path(template_directory)
+        self._template_loader, self._template_env = template_environment(
+            template_directory
+        )
+        self._template = template
+        self._output_directory = pathlib.Path(output_directory)
+        self._group_by = group_by
+        self._where = where or {}
+        self._order_by = order_by
+        self._page_size = page_size
+        self._path = path
+        self._pages: list[CollectionPage] = []
+
+    def clear(self) -> None:
+        super().clear()
+        self._pages.clear()
+
+    def input_directories(self) -> List[pathlib.Path]:
+        return [self._template_directory]
+
+    def dependencies(self, builders: dict[str, Builder]) -> set[str]:
+        return {
+            name
+            for name, elt in builders.items()
+            if not isinstance(elt, (CollectionBuilder, IndexBuilder))
+        }
+
+    def _groups(self, ctx: BuildContext) -> dict[str, CollectionGroup]:
+        """
+        Returns the content to list grouped by the slug of the group key's value,
+        in a single pass over content that is already filtered and ordered
+        """
+        groups: dict[str, CollectionGroup] = {}
+        keys: dict[Any, str] = {None: ""}
+        for metadata, artefact in ctx.query(where=self._where, order_by=self._order_by):
+            # Pages of collections aren't listed themselves
+            if ctx.is_listing(artefact):
+                continue
+            values: Sequence[Any] = [None]
+            if self._group_by is not None:
+                value = metadata.get(self._group_by)
+                values = value if isinstance(value, (list, tuple)) else [value]
+
+            for member in dict.fromkeys(values):
+                if member is None and self._group_by is not None:
+                    continue
+                if member not in keys:
+                    keys[member] = _group_key(member)
+                # Values differing only in case or separators share a group
+                group = groups.setdefault(keys[member], (member, []))
+                group[1].append((metadata, artefact))
+
+        slugs = _slugs(list(groups)) if self._group_by is not None else {"": ""}
+        return {slugs[key]: group for key, group in groups.items()}
+
+    def _destination(self, slug: str, number: int) -> pathlib.Path:
+        relative = self._path.format(group=slug, page=number)
+        return self._output_directory / relative.lstrip("/")
+
+    def plan(self, ctx: BuildContext) -> None:
+        self._pages.clear()
+        source = self._template_directory / self._template
+        for slug, (group, items) in self._groups(ctx).items():
+            count = (len(items) + self._page_size - 1) // self._page_size
+            artefacts = [
+                Artefact(source, self._destination(slug, number))
+                for number in range(1, count + 1)
+            ]
+            for index, artefact in enumerate(artefacts):
+                start = index * self._page_size
+                page = CollectionPage(
+                    group,
+                    index + 1,
+                    count,
+                    items[start : start + self._page_size],
+                    artefact,
+                    artefacts[index - 1] if index else None,
+                    artefacts[index + 1] if index + 1 < count else None,
+                )
+                self._pages.append(page)
+                name = ":".join(
+                    str(elt) for elt in (self._name, slug, index + 1) if elt != ""
+                )
+                ctx.register_content(
+                    name,
+                    artefact,
+                    {"collection": self._name, "group": group, "page": index + 1},
+                    listing=True,
+                )
+
+        logger.debug("%s: planned %d pages", self._name, len(self._pages))
+
+    def render(self, ctx: BuildContext, artefact: Artefact) -> Optional[bytes]:
+        page = next((elt for elt in self._pages if elt.artefact == artefact), None)
+        if page is None:
+            return None
+        self._template_loader.clear()
+        return (
+            self._template_env.get_template(self._template)
+            .render(page=page, metadata={"collection": self._name}, ctx=ctx)
+            .encode("utf-8")
+        )
+
+    def _write_page(
+        self, ctx: BuildContext, manifest: BuildManifest, index: int
+    ) -> tuple[str, bool, dict[str, str]]:
+        """
+        Renders the page at @index to its destination
+
+        Returns the content hash of the output, whether it was replaced
+        and the reads of @ctx made while rendering it
+        """
+        page = self._pages[index]
+        destination = ctx.output_directory / page.artefact.destination
+        tracked = TrackedContext(ctx)
+        with profile.span("render", self._name, str(page.artefact.destination)):
+            chunks = self._template_env.get_template(self._template).generate(
+                page=page, metadata={"collection": self._name}, ctx=tracked
+            )
+            digest, written = write_chunks(
+                destination,
+                (chunk.encode("utf-8") for chunk in chunks),
+                manifest.existing_digest(destination),
+            )
+            return digest, written, tracked.reads
+
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
+        self._template_loader.clear()
+        templates = {
+            f"template:{filename}": manifest.file_digest(filename)
+            for filename in self._template_loader.dependencies(
+                self._template_env, self._template
+            )
+        }
+
+        pending = []
+        for index, page in enumerate(self._pages):
+            destination = ctx.output_directory / page.artefact.destination
+            # Pages depend on what they list rather than on all content
+            listed = [
+                page.group,
+                page.count,
+                page.items,
+                page.previous,
+                page.next,
+            ]
+            inputs = templates | {"page": digest_json(listed)}
+            reads = ctx.replay(manifest.previous_inputs(destination))
+            if not manifest.is_current(destination, inputs | reads):
+                pending.append((index, destination, inputs))
+
+        logger.debug(
+            "%s: rendering %d of %d pages", self._name, len(pending), len(self._pages)
+        )
+        written = parallel_map(
+            functools.partial(self._write_page, ctx, manifest),
+            [index for index, _, _ in pending],
+            jobs,
+        )
+        for (_, destination, inputs), (digest, replaced, reads) in zip(
+            pending, written
+        ):
+            manifest.record(destination, inputs | reads, digest, replaced)
+
+
+# Entry of an index file, with json serialisable values
+IndexEntry = dict[str, Any]
+
+# Most urls a single sitemap may list, larger sitemaps are split into shards
+MAX_SITEMAP_URLS = 50000
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+# Shared, as json.dumps constructs an encoder per call when given options
+_SEARCH_ENCODER = json.JSONEncoder(sort_keys=True, default=str)
+
+
+def _timestamp(value: Any, time_of_day: bool = False) -> str:
+    """
+    Returns the date or datetime @value as an ISO 8601 string, dates given as strings
+    are passed through. With @time_of_day dates are given as midnight UTC
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return value.isoformat() + "Z"
+        return value.isoformat()
+    text = value.isoformat() if isinstance(value, datetime.date) else str(value)
+    if time_of_day and len(text) == len("YYYY-MM-DD"):
+        return text + "T00:00:00Z"
+    return text
+
+
+class IndexBuilder(Builder):
+    """
+    Abstract build strategy for files indexing registered content, such as
+    sitemaps and feeds, written from the build context without reading
+    sources or outputs again
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output: str,
+        where: Optional[dict[str, Any]] = None,
+        include: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(name)
+        self._output = output.lstrip("/")
+        self._where = where or {}
+        self._include = (
+            re.compile("|".join(fnmatch.translate(elt) for elt in include))
+            if include
+            else None
+        )
+
+    def dependencies(self, builders: dict[str, Builder]) -> set[str]:
+        return {
+            name for name, elt in builders.items() if not isinstance(elt, IndexBuilder)
+        }
+
+    def _selected(
+        self, ctx: BuildContext, order_by: Optional[str] = None
+    ) -> Iterator[tuple[Metadata, Artefact]]:
+        """
+        Yields the content to index, content registered without metadata
+        such as static assets is left out
+        """
+        for metadata, artefact in ctx.query(where=self._where, order_by=order_by):
+            if metadata and (
+                self._include is None or self._include.match(str(artefact.destination))
+            ):
+                yield metadata, artefact
+
+    @abstractmethod
+    def _files(
+        self, ctx: BuildContext
+    ) -> Iterator[tuple[str, list[IndexEntry], Iterator[str]]]:
+        """
+        Yields the path of each file to write relative to the output directory,
+        the entries it lists, and a generator of its content
+        """
+
+    def build(self, ctx: BuildContext, manifest: BuildManifest, jobs: int = 1) -> None:
+        del jobs
+        for path, entries, chunks in self._files(ctx):
+            destination = ctx.output_directory / path
+            inputs = {"entries": digest_json(entries)}
+            if manifest.is_current(destination, inputs):
+                continue
+            with profile.span("write", self._name, path):
+                digest, written = write_chunks(
+                    destination,
+                    (chunk.encode("utf-8") for chunk in chunks),
+                    manifest.existing_digest(destination),
+                )
+            manifest.record(destination, inputs, digest, written)
+
+
+class SitemapBuilder(IndexBuilder):
+    """
+    Build strategy that writes a sitemap of registered content, split into shards
+    listed by a sitemap index once there are more urls than a sitemap may hold
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        base_url: str,
+        *,
+        output: str = "sitemap.xml",
+        lastmod: Optional[str] = "date",
+        shard_size: int = MAX_SITEMAP_URLS,
+        where: Optional[dict[str, Any]] = None,
+        include: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(name, output, where, include)
+        if not 1 <= shard_size <= MAX_SITEMAP_URLS:
+            raise StencilException(
+                f"{name}: shard_size must be between 1 and {MAX_SITEMAP_URLS}"
+            )
+        self._base_url = base_url.rstrip("/")
+        self._lastmod = lastmod
+        self._shard_size = shard_size
+
+    def _url(self, path: str) -> str:
+        return self._base_url + urllib.parse.quote(path)
+
+    def _entry(self, metadata: Metadata, artefact: Artefact) -> IndexEntry:
+        entry = {"loc": self._url(artefact.url)}
+        if self._lastmod and metadata.get(self._lastmod) is not None:
+            entry["lastmod"] = _timestamp(metadata[self._lastmod])
+        return entry
+
+    @staticmethod
+    def _urlset(entries: list[IndexEntry]) -> Iterator[str]:
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield f'<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+        for entry in entries:
+            lastmod = entry.get("lastmod")
+            yield (
+                f"<url><loc>{escape(entry['loc'])}</loc>"
+                + (f"<lastmod>{escape(lastmod)}</lastmod>" if lastmod else "")
+                + "</url>\n"
+            )
+        yield "</urlset>\n"
+
+    @staticmethod
+    def _index(entries: list[IndexEntry]) -> Iterator[str]:
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+        for entry in entries:
+            yield f"<sitemap><loc>{escape(entry['loc'])}</loc></sitemap>\n"
+        yield "</sitemapindex>\n"
+
+    def _files(
+        self, ctx: BuildContext
+    ) -> Iterator[tuple[str, list[IndexEntry], Iterator[str]]]:
+        entries = [self._entry(*elt) for elt in self._selected(ctx)]
+        if len(entries) <= self._shard_size:
+            yield self._output, entries, self._urlset(entries)
+            return
+
+        output = pathlib.PurePosixPath(self._output)
+        shards = []
+        for number, start in enumerate(range(0, len(entries), self._shard_size), 1):
+            path = str(output.with_name(f"{output.stem}-{number}{output.suffix}"))
+            listed = entries[start : start + self._shard_size]
+            shards.append({"loc": self._url(f"/{path}")})
+            yield path, listed, self._urlset(listed)
+        yield self._output, shards, self._index(shards)
+
+
+class FeedBuilder(IndexBuilder):
+    """
+    Build strategy that writes an Atom feed of the most recent registered content
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        base_url: str,
+        title: str,
+        *,
+        output: str = "feed.xml",
+        date: str = "date",
+        summary: Optional[str] = "summary",
+        limit: int = 20,
+        where: Optional[dict[str, Any]] = None,
+        include: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(name, output, where, include)
+        if limit < 1:
+            raise StencilException(f"{name}: limit must be at least 1")
+        self._base_url = base_url.rstrip("/")
+        self._title = title
+        self._date = date
+        self._summary = summary
+        self._limit = limit
+
+    def _entry(self, metadata: Metadata, artefact: Artefact) -> IndexEntry:
+        url = self._base_url + urllib.parse.quote(artefact.url)
+        entry = {
+            "id": url,
+            "title": str(metadata.get("title") or artefact.destination.stem),
+            "updated": _timestamp(metadata[self._date], time_of_day=True),
+        }
+        if self._summary and metadata.get(self._summary) is not None:
+            entry["summary"] = str(metadata[self._summary])
+        return entry
+
+    def _feed(self, entries: list[IndexEntry]) -> Iterator[str]:
+        home = escape(self._base_url + "/")
+        updated = entries[0]["updated"] if entries else "1970-01-01T00:00:00Z"
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        yield f"<title>{escape(self._title)}</title>\n"
+        yield f"<id>{home}</id>\n<link href={quoteattr(home)}/>\n"
+        yield (
+            f'<link rel="self" href='
+            f"{quoteattr(self._base_url + urllib.parse.quote('/' + self._output))}/>\n"
+        )
+        yield f"<updated>{escape(updated)}</updated>\n"
+        for entry in entries:
+            yield (
+                f"<entry><title>{escape(entry['title'])}</title>"
+                f"<id>{escape(entry['id'])}</id>"
+                f"<link href={quoteattr(entry['id'])}/>"
+                f"<updated>{escape(entry['updated'])}</updated>"
+            )
+            if "summary" in entry:
+                yield f"<summary>{escape(entry['summary'])}</summary>"
+            yield "</entry>\n"
+        yield "</feed>\n"
+
+    def _files(
+        self, ctx: BuildContext
+    ) -> Iterator[tuple[str, list[IndexEntry], Iterator[str]]]:
+        # Ordering by date leaves out content without one, such as listings
+        selected = itertools.islice(self._selected(ctx, f"-{self._date}"), self._limit)
+        entries = [self._entry(*elt) for elt in selected]
+        yield self._output, entries, self._feed(entries)
+
+
+class SearchIndexBuilder(IndexBuilder):
+    """
+    Build strategy that writes a json search index of the url and chosen
+    metadata of registered content, for searching client side
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        *,
+        output: str = "search.json",
+        fields: Optional[list[str]] = None,
+        where: Optional[dict[str, Any]] = None,
+        include: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(name, output, where, include)
+        self._fields = fields or ["title", "summary", "tags"]
+
+    def _entry(self, metadata: Metadata, artefact: Artefact) -> IndexEntry:
+        entry = {"url": artefact.url}
+        for key in self._fields:
+            if metadata.get(key) is not None:
+                entry[key] = metadata[key]
+        return entry
+
+    @staticmethod
+    def _index(entries: list[IndexEntry]) -> Iterator[str]:
+        yield "["
+        for index, entry in enumerate(entries):
+            yield ("," if index else "") + "\n" + _SEARCH_ENCODER.encode(entry)
+        yield "\n]\n"
+
+    def _files(
+        self, ctx: BuildContext
+    ) -> Iterator[tuple[str, list[IndexEntry], Iterator[str]]]:
+        entries = [
+            self._entry(metadata, artefact)
+            for metadata, artefact in self._selected(ctx)
+            # Listings of other content aren't searched themselves
+            if not ctx.is_listing(artefact)
+        ]
+        yield self._output, entries, self._index(entries)
+
+
+def _flavors(types: List[Type[Builder]]) -> Iterator[Type[Builder]]:
+    """
+    Yields the concrete builder types in @types and those that derive from them
+    """
+    for elt in types:
+        if not inspect.isabstract(elt):
+            yield elt
+        yield from _flavors(elt.__subclasses__())
+
 
 def construct(name: str, builder: StencilBuilder) -> Builder:
     """
@@ -189,7 +1171,7 @@ def construct(name: str, builder: StencilBuilder) -> Builder:
     # Needs type annotation https://github.com/python/mypy/issues/1843
     builders: List[Type[Builder]] = Builder.__subclasses__()
     builder_type = next(
-        (elt for elt in builders if elt.__name__ == builder.flavor), None
+        (elt for elt in _flavors(builders) if elt.__name__ == builder.flavor), None
     )
     if not builder_type:
         raise StencilException(f"No builder for flavor {builder_type}")
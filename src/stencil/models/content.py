@@ -2,22 +2,70 @@
 Types for managing YASSG content
 """
 
+import os
 import pathlib
-from dataclasses import dataclass
+from typing import Any
+from typing import Union
+
+PathLike = Union[str, os.PathLike[str]]
+
+
+def _normalise(path: PathLike) -> str:
+    # Path objects are already normalised, and cache their string
+    if isinstance(path, pathlib.PurePath):
+        return str(path)
+    return str(pathlib.PurePath(path))
 
 
-@dataclass
 class Artefact:
     """
     Type that represents a singular item of templated content in YASSG
+
+    Paths are held as strings, which take a third of the memory of path
+    objects, and converted on access
     """
 
-    source: pathlib.Path
-    destination: pathlib.Path
+    __slots__ = ("_source", "_destination")
+
+    def __init__(self, source: PathLike, destination: PathLike) -> None:
+        # Normalised as paths would be, so equal paths compare equal
+        self._source = _normalise(source)
+        self._destination = _normalise(destination)
+
+    @property
+    def source(self) -> pathlib.Path:
+        """
+        Returns the path of the file the artefact is built from
+        """
+        return pathlib.Path(self._source)
+
+    @property
+    def destination(self) -> pathlib.Path:
+        """
+        Returns the path of the artefact's output, relative to the output directory
+        """
+        return pathlib.Path(self._destination)
 
     @property
     def url(self) -> str:
         """
         Returns the url for the artefact in its output directory
         """
+        # Normalised relative posix paths already join their parts with slashes
+        if os.sep == "/" and not self._destination.startswith(("/", ".")):
+            return "/" + self._destination
         return f"/{'/'.join(self.destination.parts)}"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Artefact):
+            return NotImplemented
+        return (self._source, self._destination) == (
+            other._source,
+            other._destination,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self._source, self._destination))
+
+    def __repr__(self) -> str:
+        return f"Artefact(source={self.source!r}, destination={self.destination!r})"
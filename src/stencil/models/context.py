@@ -2,37 +2,215 @@
 Environment management for the template context
 """
 
+import json
 import logging
 import pathlib
+from collections import defaultdict
 from dataclasses import dataclass
 from dataclasses import field
 from typing import Any
+from typing import Iterable
 from typing import Optional
 
 from stencil.models.content import Artefact
+from stencil.models.registry import MemoryStore
+from stencil.models.registry import Metadata
+from stencil.models.registry import MetadataStore
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import digest_json
 
 logger = logging.getLogger(__name__)
 
+_COLLECTIONS = (list, tuple, set, frozenset)
+
+# Prefix of build inputs that record a read of registered content
+READ_PREFIX = "ctx:"
+
+# Read standing in for any that can't be replayed, it changes with any content
+_READ_ALL = json.dumps(["content"])
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class _MetadataIndex:  # pylint: disable=too-few-public-methods
+    """
+    Names of registered content grouped by the value of a metadata key
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, Any]]) -> None:
+        self._values: defaultdict[Any, list[str]] = defaultdict(list)
+        self._unhashable: list[tuple[str, Any]] = []
+        for name, value in entries:
+            if _hashable(value):
+                self._values[value].append(name)
+            else:
+                self._unhashable.append((name, value))
+
+    def lookup(self, value: Any) -> list[str]:
+        """
+        Returns the names of content indexed under @value
+        """
+        matches = [name for name, other in self._unhashable if other == value]
+        if _hashable(value) and value in self._values:
+            return self._values[value] + matches
+        return matches
+
 
 @dataclass
-class BuildContext:
+class BuildContext:  # pylint: disable=too-many-instance-attributes
     """
     Encapsulates the build environment so that content can reference other content
     """
 
     output_directory: pathlib.Path
     variables: dict[str, Any]
-    content: dict[str, tuple[Artefact, dict[str, Any]]] = field(default_factory=dict)
+    content: dict[str, tuple[Artefact, Metadata]] = field(default_factory=dict)
+    store: MetadataStore = field(default_factory=MemoryStore, repr=False, compare=False)
+    _indexes: dict[tuple[str, bool], _MetadataIndex] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _orderings: dict[tuple[str, bool], list[str]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _positions: dict[str, int] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _reads: dict[str, str] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _listings: set[Artefact] = field(
+        default_factory=set, init=False, repr=False, compare=False
+    )
+
+    def _invalidate(self) -> None:
+        self._indexes.clear()
+        self._orderings.clear()
+        self._positions.clear()
+        self._reads.clear()
 
     def register_content(
-        self, name: str, artefact: Artefact, metadata: Optional[dict[str, Any]] = None
-    ) -> None:
+        self,
+        name: str,
+        artefact: Artefact,
+        metadata: Optional[Metadata] = None,
+        listing: bool = False,
+    ) -> Metadata:
         """
         Registers content in the build context, so that builders can meaningfully reference
-        others content
+        others content, @listing marks content that lists other content
+
+        Returns the read only copy of @metadata held by the context's store
         """
         logger.debug("Registering identifier: %s, with %s", name, artefact)
-        self.content[name] = (artefact, metadata or {})
+        stored = self.store.add(metadata or {})
+        self.content[name] = (artefact, stored)
+        if listing:
+            self._listings.add(artefact)
+        else:
+            self._listings.discard(artefact)
+        self._invalidate()
+        return stored
+
+    def clear(self) -> None:
+        """
+        Removes all registered content
+        """
+        self.content.clear()
+        self.store.clear()
+        self._listings.clear()
+        self._invalidate()
+
+    def is_listing(self, artefact: Artefact) -> bool:
+        """
+        Returns whether @artefact was registered as a listing of other content
+        """
+        return artefact in self._listings
+
+    def _index(self, key: str, members: bool = False) -> _MetadataIndex:
+        """
+        Returns the index of content by the value of metadata @key, or by each
+        member of the value if @members is set
+        """
+        if (key, members) not in self._indexes:
+            logger.debug("Indexing content by %s", key)
+            entries = (
+                (name, metadata.get(key))
+                for name, (_, metadata) in self.content.items()
+            )
+            if members:
+                entries = (
+                    (name, member)
+                    for name, value in entries
+                    if isinstance(value, _COLLECTIONS)
+                    for member in dict.fromkeys(value)
+                )
+            self._indexes[(key, members)] = _MetadataIndex(entries)
+        return self._indexes[(key, members)]
+
+    def _ordering(self, key: str, reverse: bool) -> list[str]:
+        """
+        Returns the names of content that has metadata @key, ordered by its value
+        """
+        if (key, reverse) not in self._orderings:
+            names = [
+                name for name, (_, metadata) in self.content.items() if key in metadata
+            ]
+            try:
+                names.sort(key=lambda name: self.content[name][1][key], reverse=reverse)
+            except TypeError as exc:
+                raise StencilException(f"Cannot order content by {key}") from exc
+            self._orderings[(key, reverse)] = names
+        return self._orderings[(key, reverse)]
+
+    def _position(self, name: str) -> int:
+        if not self._positions:
+            self._positions.update((name, i) for i, name in enumerate(self.content))
+        return self._positions[name]
+
+    def query(
+        self,
+        where: Optional[dict[str, Any]] = None,
+        contains: Optional[dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[tuple[Metadata, Artefact]]:
+        """
+        Returns registered content whose metadata equals each value in @where
+        and whose collection valued metadata contains each value in @contains
+
+        Results are in registration order, or ordered by the metadata key @order_by
+        (descending if prefixed with '-') omitting content without it,
+        and truncated to @limit entries
+        """
+        candidates: Optional[set[str]] = None
+        lookups = [(key, value, False) for key, value in (where or {}).items()]
+        lookups += [(key, value, True) for key, value in (contains or {}).items()]
+        for key, value, members in lookups:
+            names = self._index(key, members).lookup(value)
+            candidates = (
+                set(names) if candidates is None else candidates.intersection(names)
+            )
+
+        results: list[str] = []
+        if order_by is not None:
+            key = order_by.removeprefix("-")
+            for name in self._ordering(key, reverse=key != order_by):
+                if limit is not None and len(results) >= limit:
+                    break
+                if candidates is None or name in candidates:
+                    results.append(name)
+        elif candidates is None:
+            results = list(self.content)[:limit]
+        else:
+            results = sorted(candidates, key=self._position)[:limit]
+
+        return [(self.content[name][1], self.content[name][0]) for name in results]
 
     def get_artifact_by_name(self, name: str) -> Optional[Artefact]:
         """
@@ -47,13 +225,120 @@ class BuildContext:
 
     def get_artifact_by_metadata(
         self, key: str, value: Any
-    ) -> list[tuple[dict[str, Any], Artefact]]:
+    ) -> list[tuple[Metadata, Artefact]]:
         """
         Returns artifact by an embedded metadata value
         """
+        return self.query(where={key: value})
 
-        return [
-            (metadata, artefact)
-            for artefact, metadata in self.content.values()
-            if metadata.get(key) == value
-        ]
+    def digest(self) -> str:
+        """
+        Returns a content hash of the registered content, templates that
+        reference @ctx depend on this
+        """
+        return digest_json(
+            sorted(
+                (name, str(artefact.destination), metadata)
+                for name, (artefact, metadata) in self.content.items()
+            )
+        )
+
+    def read_digest(self, read: str) -> str:
+        """
+        Returns the content hash of the result of @read, as recorded by a
+        TrackedContext, hashes are reused until content is next registered
+        """
+        if read not in self._reads:
+            kind, *args = json.loads(read)
+            if kind == "query":
+                self._reads[read] = digest_json(self.query(*args))
+            elif kind == "name":
+                self._reads[read] = digest_json(self.get_artifact_by_name(*args))
+            else:
+                self._reads[read] = self.digest()
+        return self._reads[read]
+
+    def replay(self, inputs: dict[str, str]) -> dict[str, str]:
+        """
+        Returns the reads recorded in @inputs with the content hashes of their
+        results against the content registered now
+        """
+        replayed = {}
+        for key in inputs:
+            if not key.startswith(READ_PREFIX):
+                continue
+            try:
+                replayed[key] = self.read_digest(key.removeprefix(READ_PREFIX))
+            except (StencilException, TypeError, ValueError):
+                # Reads that can no longer be made have changed
+                replayed[key] = ""
+        return replayed
+
+
+class TrackedContext:
+    """
+    View of a build context passed to the templates of a single output,
+    recording each read of registered content so that the output need
+    only be rebuilt once the result of one of its reads changes
+    """
+
+    def __init__(self, ctx: BuildContext) -> None:
+        self._ctx = ctx
+        self.reads: dict[str, str] = {}
+
+    def _record(self, *read: Any) -> None:
+        try:
+            key = json.dumps(read, sort_keys=True)
+        except TypeError:
+            key = _READ_ALL
+        self.reads[READ_PREFIX + key] = self._ctx.read_digest(key)
+
+    @property
+    def output_directory(self) -> pathlib.Path:
+        """
+        Returns the directory that outputs are written to
+        """
+        return self._ctx.output_directory
+
+    @property
+    def variables(self) -> dict[str, Any]:
+        """
+        Returns the variables of the project's config
+        """
+        return self._ctx.variables
+
+    @property
+    def content(self) -> dict[str, tuple[Artefact, Metadata]]:
+        """
+        Returns all registered content, reading it depends on all content
+        """
+        self._record("content")
+        return self._ctx.content
+
+    def query(
+        self,
+        where: Optional[dict[str, Any]] = None,
+        contains: Optional[dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[tuple[Metadata, Artefact]]:
+        """
+        Returns the result of BuildContext.query
+        """
+        self._record("query", where, contains, order_by, limit)
+        return self._ctx.query(where, contains, order_by, limit)
+
+    def get_artifact_by_name(self, name: str) -> Optional[Artefact]:
+        """
+        Returns an artifact by its name
+        """
+        self._record("name", name)
+        return self._ctx.get_artifact_by_name(name)
+
+    def get_artifact_by_metadata(
+        self, key: str, value: Any
+    ) -> list[tuple[Metadata, Artefact]]:
+        """
+        Returns artifact by an embedded metadata value
+        """
+        return self.query(where={key: value})
@@ -0,0 +1,341 @@
+"""
+stencil builtin processors,
+
+objects that post-process build outputs once every builder has run,
+to shrink them before they are served
+"""
+
+import functools
+import gzip
+import importlib
+import inspect
+import json
+import logging
+import pathlib
+import re
+from abc import ABC
+from abc import abstractmethod
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Type
+
+from stencil.util import profile
+from stencil.util.config import StencilBuilder
+from stencil.util.exceptions import StencilException
+from stencil.util.fragments import FragmentCache
+from stencil.util.manifest import BuildManifest
+from stencil.util.manifest import digest_bytes
+from stencil.util.manifest import digest_json
+from stencil.util.manifest import write_chunks
+from stencil.util.optional import optional_module
+from stencil.util.pool import parallel_map
+
+logger = logging.getLogger(__name__)
+
+# Processed content of an output, and of the files to write beside it by suffix
+Processed = tuple[bytes, dict[str, bytes]]
+
+# Bumped when a builtin processor changes its output, to invalidate cached results
+CACHE_VERSION = 2
+
+
+class Processor(ABC):
+    """
+    Abstract class that represents some post-processing of build outputs
+    """
+
+    # Output suffixes that the processor applies to unless configured otherwise
+    suffixes: tuple[str, ...] = ()
+
+    def __init__(self, suffixes: Optional[list[str]] = None) -> None:
+        self._suffixes = tuple(suffixes) if suffixes is not None else self.suffixes
+
+    def applies(self, path: pathlib.Path) -> bool:
+        """
+        Returns true if the output at @path should be processed
+        """
+        return path.suffix in self._suffixes
+
+    @abstractmethod
+    def process(self, data: bytes) -> Processed:
+        """
+        Returns the processed content of an output, and the content of any files
+        to write beside it keyed by the suffix appended to the output's name
+        """
+
+    def __repr__(self) -> str:
+        attrs = ", ".join([f"{key}={value}" for key, value in vars(self).items()])
+        return f"{self.__class__.__name__}({attrs})"
+
+
+_HTML_PRESERVED = re.compile(
+    rb"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL
+)
+_HTML_COMMENT = re.compile(rb"<!--(?!\[if).*?-->", re.DOTALL)
+_WHITESPACE = re.compile(rb"\s+")
+
+
+class HTMLMinifier(Processor):
+    """
+    Removes comments and collapses runs of whitespace in HTML, leaving the
+    content of elements where whitespace is significant untouched
+    """
+
+    suffixes = (".html", ".htm")
+
+    def _minify(self, text: bytes) -> bytes:
+        text = _HTML_COMMENT.sub(b"", text)
+
+        def _collapse(match: re.Match[bytes]) -> bytes:
+            return b"\n" if b"\n" in match.group() else b" "
+
+        return _WHITESPACE.sub(_collapse, text)
+
+    def process(self, data: bytes) -> Processed:
+        parts = _HTML_PRESERVED.split(data)
+        # split yields text, then the preserved element and its tag name, repeated
+        chunks = [
+            part if index % 3 == 1 else self._minify(part)
+            for index, part in enumerate(parts)
+            if index % 3 != 2
+        ]
+        return b"".join(chunks).strip(), {}
+
+
+_CSS_TOKENS = re.compile(
+    rb"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)|([^"'/\s]+|/)""",
+    re.DOTALL,
+)
+
+# Whitespace after and before these is never significant
+_CSS_OPENING = b"{};,>:("
+_CSS_CLOSING = b"{};,>)"
+
+
+class CSSMinifier(Processor):
+    """
+    Removes comments and redundant whitespace from stylesheets
+    """
+
+    suffixes = (".css",)
+
+    def process(self, data: bytes) -> Processed:
+        chunks: list[bytes] = []
+        space = False
+        for match in _CSS_TOKENS.finditer(data):
+            string, comment, whitespace, other = match.groups()
+            if comment or whitespace:
+                space = space or bool(whitespace)
+                continue
+
+            token = string or other
+            if (
+                space
+                and chunks
+                and chunks[-1][-1] not in _CSS_OPENING
+                and token[0] not in _CSS_CLOSING
+            ):
+                chunks.append(b" ")
+            chunks.append(token)
+            space = False
+        return b"".join(chunks), {}
+
+
+class JSMinifier(Processor):
+    """
+    Minifies scripts with rjsmin
+    """
+
+    suffixes = (".js", ".mjs")
+
+    def __init__(self, suffixes: Optional[list[str]] = None) -> None:
+        super().__init__(suffixes)
+        optional_module("rjsmin", "JSMinifier")
+
+    def process(self, data: bytes) -> Processed:
+        minified: bytes = importlib.import_module("rjsmin").jsmin(data)
+        return minified.strip(), {}
+
+
+class Compressor(Processor):
+    """
+    Writes gzip and brotli compressed copies beside outputs,
+    for servers to send to clients that accept them
+    """
+
+    suffixes = (".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt")
+
+    def __init__(
+        self,
+        suffixes: Optional[list[str]] = None,
+        formats: Optional[list[str]] = None,
+        min_size: int = 256,
+    ) -> None:
+        super().__init__(suffixes)
+        self._min_size = min_size
+        if formats is None:
+            formats = ["gzip"]
+            try:
+                importlib.import_module("brotli")
+                formats.append("br")
+            except ImportError:
+                logger.debug("brotli not installed, only writing gzip variants")
+
+        unknown = set(formats) - {"gzip", "br"}
+        if unknown:
+            raise StencilException(f"Compressor: unknown formats {sorted(unknown)}")
+        if "br" in formats:
+            optional_module("brotli", "Compressor format br")
+        self._formats = formats
+
+    def process(self, data: bytes) -> Processed:
+        if len(data) < self._min_size:
+            return data, {}
+
+        siblings = {}
+        for elt in self._formats:
+            if elt == "gzip":
+                # Fixed mtime so that unchanged outputs compress identically
+                siblings[".gz"] = gzip.compress(data, compresslevel=9, mtime=0)
+            else:
+                siblings[".br"] = importlib.import_module("brotli").compress(data)
+        return data, {
+            suffix: compressed
+            for suffix, compressed in siblings.items()
+            if len(compressed) < len(data)
+        }
+
+
+def _flavors(types: List[Type[Processor]]) -> Iterator[Type[Processor]]:
+    """
+    Yields the concrete processor types in @types and those that derive from them
+    """
+    for elt in types:
+        if not inspect.isabstract(elt):
+            yield elt
+        yield from _flavors(elt.__subclasses__())
+
+
+def construct(processor: StencilBuilder) -> Processor:
+    """
+    Given the flavor of some processor type and the kwargs for its constructor
+
+    return an instantiation of the type
+    """
+    # Needs type annotation https://github.com/python/mypy/issues/1843
+    processors: List[Type[Processor]] = Processor.__subclasses__()
+    processor_type = next(
+        (elt for elt in _flavors(processors) if elt.__name__ == processor.flavor),
+        None,
+    )
+    if not processor_type:
+        raise StencilException(f"No processor for flavor {processor.flavor}")
+
+    return processor_type(**processor.config)
+
+
+def _encode(processed: Processed) -> bytes:
+    """
+    Returns @processed as a json line of the length of each sibling by suffix,
+    followed by the siblings then the processed output
+    """
+    content, siblings = processed
+    header = json.dumps({suffix: len(data) for suffix, data in siblings.items()})
+    return b"".join([header.encode("utf-8"), b"\n", *siblings.values(), content])
+
+
+def _decode(data: bytes) -> Optional[Processed]:
+    """
+    Returns the processed output encoded in @data, or None if it is malformed
+    """
+    header, _, body = data.partition(b"\n")
+    try:
+        lengths: dict[str, int] = json.loads(header)
+    except ValueError:
+        return None
+    if not isinstance(lengths, dict) or sum(lengths.values()) > len(body):
+        return None
+
+    siblings, offset = {}, 0
+    for suffix, length in lengths.items():
+        siblings[suffix] = body[offset : offset + length]
+        offset += length
+    return body[offset:], siblings
+
+
+def _apply(
+    cache: FragmentCache, chain: list[Processor], data: bytes, digest: str
+) -> Processed:
+    """
+    Returns @data, with content hash @digest, processed by each of @chain,
+    reusing the result of processing identical content previously
+    """
+    key = digest_json([CACHE_VERSION, digest, [repr(elt) for elt in chain]])
+    cached = cache.get_bytes(key)
+    processed = _decode(cached) if cached is not None else None
+    if processed is not None:
+        return processed
+
+    content, siblings = data, {}
+    for elt in chain:
+        content, produced = elt.process(content)
+        siblings.update(produced)
+    cache.put_bytes(key, _encode((content, siblings)))
+    return content, siblings
+
+
+def _process_output(
+    processors: Sequence[Processor],
+    cache: FragmentCache,
+    item: tuple[pathlib.Path, tuple[int, ...]],
+) -> tuple[str, list[pathlib.Path]]:
+    """
+    Applies the processors at the indexes in @item to the output it names
+
+    Returns the content hash of the processed output and the siblings written
+    """
+    path, indexes = item
+    with profile.span("postprocess", "postprocess", str(path)):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        digest = digest_bytes(data)
+        content, siblings = _apply(
+            cache, [processors[index] for index in indexes], data, digest
+        )
+        processed, _ = write_chunks(path, [content], digest)
+        written = []
+        for suffix, sibling in siblings.items():
+            written.append(path.with_name(path.name + suffix))
+            write_chunks(written[-1], [sibling], None)
+        return processed, written
+
+
+def process_outputs(
+    processors: Sequence[Processor], manifest: BuildManifest, jobs: int = 1
+) -> None:
+    """
+    Applies @processors to the outputs in @manifest that have not been
+    processed already, across @jobs workers
+    """
+    pending = []
+    for path in manifest.unprocessed():
+        indexes = tuple(
+            index for index, elt in enumerate(processors) if elt.applies(path)
+        )
+        if indexes:
+            pending.append((path, indexes))
+
+    logger.debug("Post-processing %d outputs", len(pending))
+    cache = FragmentCache("processed")
+    misses = cache.misses
+    results = parallel_map(
+        functools.partial(_process_output, processors, cache), pending, jobs
+    )
+    for (path, _), (digest, siblings) in zip(pending, results):
+        manifest.record_processed(path, digest, siblings)
+
+    if cache.misses > misses:
+        cache.trim()
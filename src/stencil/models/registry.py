@@ -0,0 +1,299 @@
+"""
+Compact storage for the metadata of registered content,
+so that very large sites can be registered without holding a dict per page
+"""
+
+import logging
+import os
+import pickle
+import sys
+import threading
+import weakref
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any
+from typing import Iterator
+from typing import TYPE_CHECKING
+
+from stencil.util.cache import cache_directory
+from stencil.util.exceptions import StencilException
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Metadata as registered, read only once stored
+Metadata = Mapping[str, Any]
+
+# Strings up to this length are interned, longer ones are rarely repeated
+MAX_INTERNED_LENGTH = 32
+
+# Number of pages of metadata decoded from disk that are kept in memory
+DEFAULT_SQLITE_CACHE = 1024
+
+
+def _intern(value: Any) -> Any:
+    """
+    Returns @value with short strings, and those in lists, interned
+    """
+    # Exact type checks, as this runs for every value of every page
+    if value.__class__ is str:
+        return sys.intern(value) if len(value) <= MAX_INTERNED_LENGTH else value
+    if value.__class__ is list:
+        return [
+            (
+                sys.intern(elt)
+                if elt.__class__ is str and len(elt) <= MAX_INTERNED_LENGTH
+                else elt
+            )
+            for elt in value
+        ]
+    return value
+
+
+class CompactMetadata(Mapping[str, Any]):
+    """
+    Read only metadata of a single page, pages with the same keys share
+    the layout of those keys so only the values are held per page
+    """
+
+    __slots__ = ("_layout", "_values")
+
+    def __init__(self, layout: dict[str, int], values: tuple[Any, ...]) -> None:
+        self._layout = layout
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._layout[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._layout)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class MetadataStore(ABC):
+    """
+    Abstract storage for the metadata of registered content
+    """
+
+    @abstractmethod
+    def add(self, metadata: Metadata) -> Metadata:
+        """
+        Stores @metadata, returning the read only copy to register
+        """
+
+    def clear(self) -> None:
+        """
+        Marks all stored metadata as replaced, that which isn't added again
+        is dropped by the next flush
+        """
+
+    def flush(self) -> None:
+        """
+        Makes stored metadata visible to workers forked after this returns
+        """
+
+
+class MemoryStore(MetadataStore):
+    """
+    Holds metadata in memory with keys, and short string values, shared between pages
+    """
+
+    def __init__(self) -> None:
+        self._layouts: dict[tuple[str, ...], dict[str, int]] = {}
+
+    def add(self, metadata: Metadata) -> Metadata:
+        if isinstance(metadata, CompactMetadata):
+            return metadata
+
+        keys = tuple(metadata)
+        layout = self._layouts.get(keys)
+        if layout is None:
+            layout = {sys.intern(key): index for index, key in enumerate(keys)}
+            self._layouts[keys] = layout
+        return CompactMetadata(layout, tuple(map(_intern, metadata.values())))
+
+
+class StoredMetadata(Mapping[str, Any]):
+    """
+    Handle to the metadata of a single page held in a SqliteStore,
+    read from disk on access
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "SqliteStore", row: int) -> None:
+        self._store = store
+        self._row = row
+
+    @property
+    def store(self) -> "SqliteStore":
+        """
+        Returns the store holding the metadata
+        """
+        return self._store
+
+    @property
+    def row(self) -> int:
+        """
+        Returns the row the metadata is stored at
+        """
+        return self._row
+
+    def __getitem__(self, key: str) -> Any:
+        return self._store.load(self._row)[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.load(self._row))
+
+    def __len__(self) -> int:
+        return len(self._store.load(self._row))
+
+    def __repr__(self) -> str:
+        return repr(self._store.load(self._row))
+
+
+def _remove_database(path: str, pid: int) -> None:
+    # Forked workers share the finalizer, only the process that made the file removes it
+    if os.getpid() == pid:
+        for suffix in ("", "-journal"):
+            try:
+                os.unlink(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class SqliteStore(MetadataStore):  # pylint: disable=too-many-instance-attributes
+    """
+    Holds metadata in a temporary sqlite database, keeping only recently read
+    pages in memory. Metadata is pickled, so values such as dates keep their types
+    as they would in memory. The database is made by, and only read by, this build
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_SQLITE_CACHE) -> None:
+        directory = cache_directory("registry")
+        self._path = str(directory / f"metadata-{os.getpid()}-{id(self)}.sqlite")
+        self._pid = os.getpid()
+        self._connection = self._connect()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata "
+            "(row INTEGER PRIMARY KEY AUTOINCREMENT, data BLOB)"
+        )
+        self._dirty = False
+        # Rows before this were stored before the last clear
+        self._first_row = 1
+        self._replaced = False
+        self._cache: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._cache_size = cache_size
+        # Builds fall back to threads where workers can't be forked
+        self._lock = threading.Lock()
+        weakref.finalize(self, _remove_database, self._path, self._pid)
+
+    def _connect(self) -> "sqlite3.Connection":
+        # Imported on first use, as most builds keep metadata in memory
+        import sqlite3  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        connection = sqlite3.connect(self._path, check_same_thread=False)
+        # The database is rebuilt on every run, so durability isn't needed
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("PRAGMA journal_mode = MEMORY")
+        return connection
+
+    def _reader(self) -> "sqlite3.Connection":
+        """
+        Returns a connection to read through, connections can't be shared
+        with workers forked after they were opened
+        """
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._connection = self._connect()
+            self._cache.clear()
+        else:
+            self._commit()
+        return self._connection
+
+    def _commit(self) -> None:
+        if self._dirty:
+            self._connection.commit()
+            self._dirty = False
+
+    def clear(self) -> None:
+        (last,) = self._connection.execute("SELECT MAX(row) FROM metadata").fetchone()
+        self._first_row = (last or 0) + 1
+        self._replaced = True
+
+    def flush(self) -> None:
+        if self._replaced:
+            self._connection.execute(
+                "DELETE FROM metadata WHERE row < ?", (self._first_row,)
+            )
+            with self._lock:
+                self._cache.clear()
+            self._replaced = False
+            self._dirty = True
+        self._commit()
+
+    def add(self, metadata: Metadata) -> Metadata:
+        if isinstance(metadata, StoredMetadata) and metadata.store is self:
+            if metadata.row >= self._first_row:
+                return metadata
+            # Unchanged sources register the metadata stored for them before a clear
+            cursor = self._connection.execute(
+                "INSERT INTO metadata (data) SELECT data FROM metadata WHERE row = ?",
+                (metadata.row,),
+            )
+        else:
+            data = pickle.dumps(dict(metadata), protocol=pickle.HIGHEST_PROTOCOL)
+            cursor = self._connection.execute(
+                "INSERT INTO metadata (data) VALUES (?)", (data,)
+            )
+        self._dirty = True
+        if cursor.lastrowid is None:
+            raise StencilException("Could not store metadata")
+        return StoredMetadata(self, cursor.lastrowid)
+
+    def load(self, row: int) -> dict[str, Any]:
+        """
+        Returns the metadata stored at @row
+        """
+        with self._lock:
+            cached = self._cache.get(row)
+            if cached is not None:
+                self._cache.move_to_end(row)
+                return cached
+
+            result = (
+                self._reader()
+                .execute("SELECT data FROM metadata WHERE row = ?", (row,))
+                .fetchone()
+            )
+            if result is None:
+                raise StencilException(f"No metadata stored at row {row}")
+            metadata: dict[str, Any] = pickle.loads(result[0])
+            self._cache[row] = metadata
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return metadata
+
+
+STORES: dict[str, type[MetadataStore]] = {"memory": MemoryStore, "sqlite": SqliteStore}
+
+
+def create_store(name: str) -> MetadataStore:
+    """
+    Returns an empty metadata store of the kind @name
+    """
+    store = STORES.get(name)
+    if store is None:
+        raise StencilException(
+            f"Unknown metadata store {name}, expected one of {', '.join(STORES)}"
+        )
+    return store()
@@ -0,0 +1,25 @@
+"""
+Utilities for locating stencil's persistent caches
+"""
+
+import os
+import pathlib
+
+CACHE_DIRECTORY_ENV = "STENCIL_CACHE_DIR"
+
+
+def cache_directory(name: str) -> pathlib.Path:
+    """
+    Returns the directory for the cache @name, shared by all stencil projects
+    built by the current user
+    """
+    if root := os.environ.get(CACHE_DIRECTORY_ENV):
+        base = pathlib.Path(root)
+    elif xdg := os.environ.get("XDG_CACHE_HOME"):
+        base = pathlib.Path(xdg) / "stencil"
+    else:
+        base = pathlib.Path.home() / ".cache" / "stencil"
+
+    directory = base / name
+    directory.mkdir(exist_ok=True, parents=True)
+    return directory
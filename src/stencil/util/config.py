@@ -2,19 +2,31 @@
 Utilities to manage the configuration supplied to stencil
 """
 
+import functools
 import json
 import logging
 import pathlib
+from collections import OrderedDict
 from dataclasses import dataclass
+from dataclasses import field
 from typing import Any
 from typing import Dict
+from typing import TYPE_CHECKING
 
-import jsonschema
 from stencil.util.exceptions import StencilException
+from stencil.util.manifest import digest_json
+
+if TYPE_CHECKING:
+    import jsonschema
 
 SCHEMA = pathlib.Path(__file__).parent.joinpath("schema.json")
 logger = logging.getLogger(__name__)
 
+# Number of validated config hashes remembered
+MAX_VALIDATED = 256
+
+_VALIDATED: OrderedDict[str, None] = OrderedDict()
+
 
 @dataclass(frozen=True)
 class StencilContent:
@@ -25,6 +37,9 @@ class StencilContent:
     source_directory: pathlib.Path
     output_directory: pathlib.Path
     builder: str
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    recursive: bool = True
 
 
 @dataclass(frozen=True)
@@ -35,6 +50,8 @@ class StencilBuilder:
 
     flavor: str
     config: dict[str, Any]
+    # Names of builders to plan and build before this one
+    after: tuple[str, ...] = ()
 
 
 @dataclass(frozen=True)
@@ -46,6 +63,8 @@ class StencilConfig:
     content: list[StencilContent]
     builders: dict[str, StencilBuilder]
     variables: dict[str, Any]
+    postprocess: list[StencilBuilder] = field(default_factory=list)
+    metadata_store: str = "memory"
 
 
 def prepare_content(config: list[dict[str, Any]]) -> list[StencilContent]:
@@ -54,34 +73,82 @@ def prepare_content(config: list[dict[str, Any]]) -> list[StencilContent]:
     """
 
     def _to_asset(
-        source_directory: str, output_directory: str, builder: str
+        source_directory: str,
+        output_directory: str,
+        builder: str,
+        **options: Any,
     ) -> StencilContent:
         return StencilContent(
-            pathlib.Path(source_directory), pathlib.Path(output_directory), builder
+            pathlib.Path(source_directory),
+            pathlib.Path(output_directory),
+            builder,
+            tuple(options.get("include", ())),
+            tuple(options.get("exclude", ())),
+            options.get("recursive", True),
         )
 
     # Unpacking here is safe through jsonschema validation
     return [_to_asset(**asset) for asset in config]
 
 
+@functools.cache
+def _validator() -> "jsonschema.Draft7Validator":
+    """
+    Returns a validator for the config schema, the schema is read and
+    checked against its meta-schema once per process
+    """
+    # jsonschema is slow to import, and only needed once a config is read
+    import jsonschema  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    with open(SCHEMA, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    jsonschema.Draft7Validator.check_schema(schema)
+    return jsonschema.Draft7Validator(schema)
+
+
+def validate(config: Dict[str, Any]) -> None:
+    """
+    Validates @config against the config schema, configs with the same
+    content hash as one already validated are not checked again
+    """
+    digest = digest_json(config)
+    if digest in _VALIDATED:
+        _VALIDATED.move_to_end(digest)
+        return
+
+    validator = _validator()
+    error = next(validator.iter_errors(config), None)
+    if error is not None:
+        raise StencilException("stencil config malformed") from error
+
+    _VALIDATED[digest] = None
+    if len(_VALIDATED) > MAX_VALIDATED:
+        _VALIDATED.popitem(last=False)
+
+
 def parse_and_validate(config: Dict[str, Any]) -> StencilConfig:
     """
     Given a config file as a dictionary, parse and validate the config
     """
-
-    try:
-        with open(SCHEMA, "r", encoding="utf-8") as schema:
-            jsonschema.validate(config, json.load(schema))
-    except jsonschema.exceptions.ValidationError as exc:
-        raise StencilException("stencil config malformed") from exc
+    validate(config)
 
     content = prepare_content(config["content"])
     builders = {
-        name: StencilBuilder(**value) for name, value in config["builders"].items()
+        name: StencilBuilder(
+            value["flavor"], value["config"], tuple(value.get("after", ()))
+        )
+        for name, value in config["builders"].items()
     }
     variables = config["variables"]
-
-    validated_config = StencilConfig(content, builders, variables)
+    postprocess = [StencilBuilder(**value) for value in config.get("postprocess", [])]
+
+    validated_config = StencilConfig(
+        content,
+        builders,
+        variables,
+        postprocess,
+        config.get("metadata_store", "memory"),
+    )
 
     logger.debug("Constructed config: %s", validated_config)
 
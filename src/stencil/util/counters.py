@@ -0,0 +1,44 @@
+"""
+Utilities for counting events during a build, such as cache hits,
+across the build process and the workers it forks
+"""
+
+import threading
+from collections import Counter
+
+_COUNTS: Counter[str] = Counter()
+_LOCK = threading.Lock()
+
+
+def add(name: str, count: int = 1) -> None:
+    """
+    Adds @count to the counter @name
+    """
+    with _LOCK:
+        _COUNTS[name] += count
+
+
+def get(name: str) -> int:
+    """
+    Returns the count of @name, including counts merged from workers
+    """
+    with _LOCK:
+        return _COUNTS[name]
+
+
+def drain() -> dict[str, int]:
+    """
+    Removes and returns the counts recorded in this process
+    """
+    with _LOCK:
+        counts = dict(_COUNTS)
+        _COUNTS.clear()
+    return counts
+
+
+def merge(counts: dict[str, int]) -> None:
+    """
+    Adds counts recorded in a worker process
+    """
+    with _LOCK:
+        _COUNTS.update(counts)
@@ -0,0 +1,130 @@
+"""
+Utilities for caching fragments of html converted from source bodies between
+builds, evicting those least recently used once the cache is over its size
+"""
+
+import logging
+import os
+import pathlib
+from typing import Optional
+
+from stencil.util import counters
+from stencil.util.cache import cache_directory
+from stencil.util.manifest import replace_file
+
+DEFAULT_MAX_FRAGMENT_BYTES = 128 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentCache:
+    """
+    On disk cache of converted fragments keyed by a hash of what they were
+    converted from, shared by all projects. Reading a fragment marks it as used
+    """
+
+    def __init__(self, name: str, max_bytes: int = DEFAULT_MAX_FRAGMENT_BYTES) -> None:
+        self._name = name
+        self._max_bytes = max_bytes
+        self._directory: Optional[pathlib.Path] = None
+
+    @property
+    def directory(self) -> pathlib.Path:
+        """
+        Directory holding the fragments, created on first use
+        """
+        if self._directory is None:
+            self._directory = cache_directory(self._name)
+        return self._directory
+
+    @property
+    def hits(self) -> int:
+        """
+        Fragments read from the cache by this process and its workers
+        """
+        return counters.get(f"{self._name}.hits")
+
+    @property
+    def misses(self) -> int:
+        """
+        Fragments looked up but not found by this process and its workers
+        """
+        return counters.get(f"{self._name}.misses")
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / key
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Returns the bytes stored under @key, or None if there are none
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            counters.add(f"{self._name}.misses")
+            return None
+
+        counters.add(f"{self._name}.hits")
+        try:
+            os.utime(path)
+        except OSError:
+            logger.debug("Could not mark %s as used", path)
+        return data
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        """
+        Stores @data under @key
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        replace_file(path, data)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the fragment stored under @key, or None if there is none
+        """
+        data = self.get_bytes(key)
+        try:
+            return data.decode("utf-8") if data is not None else None
+        except ValueError:
+            return None
+
+    def put(self, key: str, fragment: str) -> None:
+        """
+        Stores @fragment under @key
+        """
+        self.put_bytes(key, fragment.encode("utf-8"))
+
+    def trim(self) -> int:
+        """
+        Removes the least recently used fragments until the cache is within
+        its size, returning the number of fragments removed
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as it:
+                    for entry in it:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                        total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.debug("Evicted %d fragments from %s", removed, self._name)
+        return removed
@@ -0,0 +1,355 @@
+"""
+Utilities for tracking build inputs and outputs between builds
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import threading
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Union
+
+MANIFEST_NAME = ".stencil-manifest.json"
+MANIFEST_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def digest_bytes(data: bytes) -> str:
+    """
+    Returns the content hash of @data
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_stamp(stat: os.stat_result) -> str:
+    """
+    Returns the size and modification time of the file with stat result @stat,
+    standing in for its content where reading it would be too slow
+    """
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def digest_json(value: Any) -> str:
+    """
+    Returns a stable content hash of a json serialisable @value,
+    other mappings are hashed as dicts and other values as strings
+    """
+    return digest_bytes(
+        json.dumps(
+            value, sort_keys=True, separators=(",", ":"), default=_json_default
+        ).encode()
+    )
+
+
+def temporary_path(destination: pathlib.Path) -> pathlib.Path:
+    """
+    Returns a path beside @destination to stage its replacement at,
+    unique to the calling process and thread
+    """
+    return destination.with_name(
+        f".{destination.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+
+
+def write_chunks(
+    destination: pathlib.Path, chunks: Iterable[bytes], existing: Optional[str]
+) -> tuple[str, bool]:
+    """
+    Streams @chunks to a temporary file that atomically replaces @destination,
+    unless the content hash matches the @existing content of @destination
+
+    Returns the content hash and whether @destination was replaced
+    """
+    destination.parent.mkdir(exist_ok=True, parents=True)
+    tmp = temporary_path(destination)
+    digest = hashlib.sha256()
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+
+        if digest.hexdigest() == existing:
+            tmp.unlink()
+            return digest.hexdigest(), False
+
+        os.replace(tmp, destination)
+        return digest.hexdigest(), True
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def replace_file(destination: pathlib.Path, data: bytes) -> None:
+    """
+    Atomically replaces @destination with @data, the directory
+    holding @destination must already exist
+    """
+    tmp = temporary_path(destination)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, destination)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@dataclass
+class OutputRecord:
+    """
+    The inputs that an output was built from, and the hash of what was written
+
+    Post-processed outputs also hold the hash of the processed output,
+    and the sibling files that processing produced. Assets published as they
+    are hold a stamp of the output's size and modification time instead of a hash
+    """
+
+    inputs: dict[str, str]
+    digest: Optional[str]
+    processed: Optional[str] = None
+    siblings: list[str] = field(default_factory=list)
+    stamp: Optional[str] = None
+
+
+class BuildManifest:  # pylint: disable=too-many-instance-attributes
+    """
+    On disk record of the content hashes of build inputs and outputs,
+    used to skip artefacts whose inputs are unchanged since the last build
+    """
+
+    def __init__(
+        self,
+        output_directory: pathlib.Path,
+        config: str,
+        files: Optional[dict[str, tuple[int, int, str]]] = None,
+        outputs: Optional[dict[str, OutputRecord]] = None,
+    ) -> None:
+        self._output_directory = output_directory
+        self._config = config
+        self._files = files or {}
+        self._outputs = outputs or {}
+        self._seen_files: dict[str, tuple[int, int, str]] = {}
+        self._seen_outputs: dict[str, OutputRecord] = {}
+        self.written: list[pathlib.Path] = []
+        self.skipped: list[pathlib.Path] = []
+
+    def reset(self) -> None:
+        """
+        Starts tracking a new build against the outputs of the last one
+        """
+        self._files, self._seen_files = self._seen_files, {}
+        self._outputs, self._seen_outputs = self._seen_outputs, {}
+        self.written = []
+        self.skipped = []
+
+    @property
+    def path(self) -> pathlib.Path:
+        """
+        Location of the manifest on disk
+        """
+        return self._output_directory / MANIFEST_NAME
+
+    @classmethod
+    def load(cls, output_directory: pathlib.Path, config: str) -> "BuildManifest":
+        """
+        Loads the manifest from @output_directory, previous outputs are
+        discarded if the manifest was written for a different @config digest
+        """
+        try:
+            with open(output_directory / MANIFEST_NAME, encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            logger.debug("No usable manifest in %s", output_directory)
+            return cls(output_directory, config)
+
+        if raw.get("version") != MANIFEST_VERSION or raw.get("config") != config:
+            logger.debug("Manifest out of date, rebuilding all outputs")
+            return cls(output_directory, config)
+
+        files = {
+            path: (size, mtime, digest)
+            for path, (size, mtime, digest) in raw["files"].items()
+        }
+        outputs = {
+            path: OutputRecord(**record) for path, record in raw["outputs"].items()
+        }
+        return cls(output_directory, config, files, outputs)
+
+    def save(self) -> None:
+        """
+        Persists the manifest, only outputs produced in this build are kept
+        """
+        self._output_directory.mkdir(exist_ok=True, parents=True)
+        raw = {
+            "version": MANIFEST_VERSION,
+            "config": self._config,
+            "files": self._seen_files,
+            "outputs": {
+                path: asdict(record) for path, record in self._seen_outputs.items()
+            },
+        }
+        tmp = self.path.with_name(f"{MANIFEST_NAME}.tmp")
+        # dumps encodes in one shot with the C encoder, dump would not
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(raw, sort_keys=True))
+        os.replace(tmp, self.path)
+
+    def file_digest(self, path: Union[str, pathlib.Path]) -> str:
+        """
+        Returns the content hash of the file at @path, reusing the previous
+        hash if the file's size and modification time are unchanged
+        """
+        key = str(path)
+        if key in self._seen_files:
+            return self._seen_files[key][2]
+
+        stat = os.stat(path)
+        previous = self._files.get(key)
+        if previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = previous[2]
+        else:
+            with open(path, "rb") as f:
+                digest = digest_bytes(f.read())
+
+        self._seen_files[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def _key(self, destination: pathlib.Path) -> str:
+        return str(destination.relative_to(self._output_directory))
+
+    def is_current(self, destination: pathlib.Path, inputs: dict[str, str]) -> bool:
+        """
+        Returns true if @destination was built from @inputs in the previous build
+        and has not been modified since, marking it as an output of this build
+        """
+        key = self._key(destination)
+        record = self._outputs.get(key)
+        if not record or record.inputs != inputs or not destination.is_file():
+            return False
+        if record.stamp is not None and record.processed is None:
+            if file_stamp(os.stat(destination)) != record.stamp:
+                return False
+        elif self.file_digest(destination) != (record.processed or record.digest):
+            return False
+
+        self._seen_outputs[key] = record
+        self.skipped.append(destination)
+        return True
+
+    def previous_inputs(self, destination: pathlib.Path) -> dict[str, str]:
+        """
+        Returns the inputs that @destination was built from in the previous build
+        """
+        record = self._outputs.get(self._key(destination))
+        return record.inputs if record else {}
+
+    def existing_digest(self, destination: pathlib.Path) -> Optional[str]:
+        """
+        Returns the content hash of @destination if it exists, a post-processed
+        output stands in for the content that it was processed from
+        """
+        if not destination.is_file():
+            return None
+        digest = self.file_digest(destination)
+        previous = self._outputs.get(self._key(destination))
+        if previous and previous.processed == digest:
+            return previous.digest
+        return digest
+
+    def record(  # pylint: disable=too-many-arguments
+        self,
+        destination: pathlib.Path,
+        inputs: dict[str, str],
+        digest: Optional[str],
+        written: bool = True,
+        *,
+        stamp: Optional[str] = None,
+    ) -> None:
+        """
+        Records that @destination was built from @inputs with content hash @digest,
+        and whether it was written or left untouched. Assets published as they
+        are give the @stamp of the output rather than its content hash
+        """
+        key = self._key(destination)
+        record = OutputRecord(inputs, digest, stamp=stamp)
+        self._seen_outputs[key] = record
+
+        # Untouched outputs keep their post-processing if the processed file remains
+        previous = self._outputs.get(key)
+        if (
+            not written
+            and previous
+            and previous.processed
+            and (previous.digest, previous.stamp) == (digest, stamp)
+            and self.file_digest(destination) == previous.processed
+        ):
+            record.processed, record.siblings = previous.processed, previous.siblings
+        elif digest is not None:
+            stat = os.stat(destination)
+            self._seen_files[str(destination)] = (
+                stat.st_size,
+                stat.st_mtime_ns,
+                digest,
+            )
+
+        if written:
+            self.written.append(destination)
+        else:
+            self.skipped.append(destination)
+
+    def unprocessed(self) -> list[pathlib.Path]:
+        """
+        Returns the outputs of this build that have not been post-processed
+        """
+        return [
+            self._output_directory / key
+            for key, record in self._seen_outputs.items()
+            if record.processed is None
+        ]
+
+    def record_processed(
+        self, destination: pathlib.Path, digest: str, siblings: list[pathlib.Path]
+    ) -> None:
+        """
+        Records that @destination was post-processed to content hash @digest,
+        producing the files @siblings beside it. Siblings produced previously
+        but not this time are removed
+        """
+        key = self._key(destination)
+        record = self._seen_outputs[key]
+        previous = self._outputs.get(key)
+        record.processed = digest
+        record.siblings = [self._key(elt) for elt in siblings]
+        for sibling in set(previous.siblings if previous else []) - set(
+            record.siblings
+        ):
+            (self._output_directory / sibling).unlink(missing_ok=True)
+
+        stat = os.stat(destination)
+        self._seen_files[str(destination)] = (stat.st_size, stat.st_mtime_ns, digest)
+
+    def remove_stale(self) -> None:
+        """
+        Removes outputs recorded in the previous build that were not produced
+        in this build
+        """
+        for key in self._outputs.keys() - self._seen_outputs.keys():
+            logger.debug("Removing stale output %s", key)
+            for path in [key, *self._outputs[key].siblings]:
+                (self._output_directory / path).unlink(missing_ok=True)
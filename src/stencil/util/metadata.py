@@ -1,45 +1,103 @@
 """
-Utilities for extracting json metadata headers in files
+Utilities for extracting metadata headers in files
+
+A header opens on the first line of a file with a fence and closes at the next
+line holding the same fence. `---` fences a JSON object, or YAML when the header
+does not start with a brace, and `+++` fences TOML
 """
 
+import io
 import json
 import logging
-import pathlib
-import re
+import sys
+from dataclasses import dataclass
 from typing import Any
+from typing import BinaryIO
+from typing import Callable
 from typing import Optional
 
-_METADATA_WRAPPER = r"(?:---)"
-METADATA_REGEX = f"^{_METADATA_WRAPPER}\n(.+?){_METADATA_WRAPPER}(?:\n)?(.*)$"
-REGEX = re.compile(METADATA_REGEX, re.S | re.M)
+from stencil.util.exceptions import StencilException
+from stencil.util.optional import optional_module
+
+JSON_OR_YAML_FENCE = b"---"
+TOML_FENCE = b"+++"
 
 logger = logging.getLogger(__name__)
 
 
-def get_embedded_metadata(string: str) -> Optional[tuple[dict[str, Any], str]]:
+@dataclass(frozen=True)
+class FrontMatter:
     """
-    Returns embedded json documents from files
+    The metadata header of a file and the offset in bytes at which its body starts,
+    the offset is zero for files without a header
     """
-    result = REGEX.search(string)
 
-    if not result:
-        return None
+    metadata: dict[str, Any]
+    offset: int
+
+
+def _loader(fence: bytes, text: str) -> tuple[str, Callable[[str], Any], Any]:
+    """
+    Returns the name of the format of header @text, a function that parses it
+    and the errors that function raises on malformed input
+    """
+    if fence == TOML_FENCE:
+        toml = (
+            optional_module("tomllib", "TOML metadata")
+            if sys.version_info >= (3, 11)
+            else optional_module("tomli", "TOML metadata")
+        )
+        return "TOML", toml.loads, ValueError
+    if text.lstrip().startswith("{"):
+        return "JSON", json.loads, ValueError
+
+    yaml = optional_module("yaml", "YAML metadata")
+    return "YAML", yaml.safe_load, yaml.YAMLError
+
+
+def _parse_header(fence: bytes, header: bytes) -> dict[str, Any]:
+    text = header.decode("utf-8")
+    if not text.strip():
+        return {}
+
+    header_format, loads, errors = _loader(fence, text)
     try:
-        return json.loads(result.group(1)), result.group(2)
-    except json.decoder.JSONDecodeError:
-        logger.fatal("Could not extract metadata from header: %s", result.group(1))
-        raise
+        metadata = loads(text)
+    except errors as exc:
+        logger.error("Could not extract metadata from header: %s", text)
+        raise StencilException(
+            f"Could not parse {header_format} metadata header: {exc}"
+        ) from exc
+
+    if not isinstance(metadata, dict):
+        raise StencilException(f"{header_format} metadata header is not a mapping")
+    return metadata
 
 
-def get_file_content(path: pathlib.Path) -> tuple[dict[str, Any], str]:
+def read_front_matter(f: BinaryIO) -> FrontMatter:
     """
-    Returns the metadata associated with content and the content of the file
+    Reads the metadata header from the start of @f, leaving @f positioned
+    at the start of the body so that only the header is read
     """
+    fence = f.readline().rstrip()
+    if fence in (JSON_OR_YAML_FENCE, TOML_FENCE):
+        lines: list[bytes] = []
+        for line in iter(f.readline, b""):
+            if line.rstrip() == fence:
+                return FrontMatter(_parse_header(fence, b"".join(lines)), f.tell())
+            lines.append(line)
 
-    with open(path, encoding="utf-8") as f:
-        raw_content = f.read()
+    f.seek(0)
+    return FrontMatter({}, 0)
 
-    if content_tuple := get_embedded_metadata(raw_content):
-        return content_tuple
 
-    return {}, raw_content
+def get_embedded_metadata(string: str) -> Optional[tuple[dict[str, Any], str]]:
+    """
+    Returns the metadata header of @string and the body after it,
+    or None if @string has no header
+    """
+    data = string.encode("utf-8")
+    front_matter = read_front_matter(io.BytesIO(data))
+    if not front_matter.offset:
+        return None
+    return front_matter.metadata, data[front_matter.offset :].decode("utf-8")
@@ -0,0 +1,20 @@
+"""
+Utilities for importing dependencies that stencil does not require
+"""
+
+import importlib
+from typing import Any
+
+from stencil.util.exceptions import StencilException
+
+
+def optional_module(name: str, purpose: str) -> Any:
+    """
+    Imports the optional dependency @name, needed for @purpose
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError as exc:
+        raise StencilException(
+            f"{purpose} requires the {name} package to be installed"
+        ) from exc
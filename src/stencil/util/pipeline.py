@@ -0,0 +1,194 @@
+"""
+Utilities for running items through a sequence of stages connected by bounded
+queues, so that waiting on I/O in one stage overlaps with work in the others
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last item, once for each thread of the stage it is queued for
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A step of a pipeline, applying @func to each item across @threads threads
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    threads: int = 1
+
+
+@dataclass
+class StageStats:
+    """
+    Time a stage spent working and stalled, it is starved when waiting for items
+    from the stage before it and blocked when waiting for space in the next
+    """
+
+    name: str
+    items: int = 0
+    busy: float = 0.0
+    starved: float = 0.0
+    blocked: float = 0.0
+    # Most items seen waiting in the queue that the stage reads from
+    peak_depth: int = 0
+
+    def merge(self, other: "StageStats") -> None:
+        """
+        Adds the counts and times of @other to this stage
+        """
+        self.items += other.items
+        self.busy += other.busy
+        self.starved += other.starved
+        self.blocked += other.blocked
+        self.peak_depth = max(self.peak_depth, other.peak_depth)
+
+
+@dataclass
+class PipelineStats:
+    """
+    Queue depths and stalls of each stage of a pipeline
+    """
+
+    depth: int
+    stages: list[StageStats] = field(default_factory=list)
+
+    def merge(self, other: "PipelineStats") -> None:
+        """
+        Adds the stages of @other, a run of the same pipeline, to these
+        """
+        for mine, theirs in zip(self.stages, other.stages):
+            mine.merge(theirs)
+
+    def summary(self) -> str:
+        """
+        Returns a line per stage describing its queue and stalls
+        """
+        return "\n".join(
+            f"{elt.name:<8} {elt.items:>8} items, busy {elt.busy:.3f}s, "
+            f"starved {elt.starved:.3f}s, blocked {elt.blocked:.3f}s, "
+            f"queue peak {elt.peak_depth}/{self.depth}"
+            for elt in self.stages
+        )
+
+
+class _Run:  # pylint: disable=too-few-public-methods
+    """
+    State shared by the threads of a single pipeline run
+    """
+
+    def __init__(self, stages: Sequence[Stage], depth: int) -> None:
+        self.stages = stages
+        self.queues: list[queue.Queue[Any]] = [
+            queue.Queue(maxsize=depth) for _ in stages
+        ]
+        self.stats = PipelineStats(depth, [StageStats(elt.name) for elt in stages])
+        self.results: dict[int, Any] = {}
+        self.errors: list[BaseException] = []
+        self.lock = threading.Lock()
+        self._running = [elt.threads for elt in stages]
+
+    def work(self, index: int) -> None:
+        """
+        Applies stage @index to items from its queue until it is told it is done
+        """
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        local = StageStats(self.stages[index].name)
+        peak = 0
+
+        while True:
+            start = time.perf_counter()
+            entry = inbox.get()
+            started = time.perf_counter()
+            local.starved += started - start
+            if entry is _DONE:
+                break
+
+            position, value = entry
+            # After a failure items are drained, so earlier stages don't block
+            if self.errors:
+                continue
+            try:
+                value = self.stages[index].func(value)
+            except BaseException as exc:  # pylint: disable=broad-exception-caught
+                with self.lock:
+                    self.errors.append(exc)
+                continue
+
+            finished = time.perf_counter()
+            local.busy += finished - started
+            local.items += 1
+            if outbox is None:
+                self.results[position] = value
+            else:
+                outbox.put((position, value))
+                local.blocked += time.perf_counter() - finished
+                peak = max(peak, outbox.qsize())
+
+        with self.lock:
+            self.stats.stages[index].merge(local)
+            if outbox is not None:
+                following = self.stats.stages[index + 1]
+                following.peak_depth = max(following.peak_depth, peak)
+            self._running[index] -= 1
+            last = not self._running[index]
+
+        if last and outbox is not None:
+            for _ in range(self.stages[index + 1].threads):
+                outbox.put(_DONE)
+
+
+def run_pipeline(
+    stages: Sequence[Stage], items: Iterable[Any], depth: int
+) -> tuple[list[Any], PipelineStats]:
+    """
+    Passes each of @items through @stages in turn, with at most @depth items
+    queued for each stage
+
+    Returns the results of the last stage in the same order as @items,
+    and the stalls of each stage. The first error raised by a stage is
+    raised once the remaining items have been drained
+    """
+    run = _Run(stages, max(1, depth))
+    threads = [
+        threading.Thread(target=run.work, args=(index,), name=f"pipeline-{elt.name}")
+        for index, elt in enumerate(stages)
+        for _ in range(elt.threads)
+    ]
+    for thread in threads:
+        thread.start()
+
+    count = 0
+    peak = 0
+    inbox = run.queues[0]
+    try:
+        for count, item in enumerate(items, 1):
+            if run.errors:
+                break
+            inbox.put((count - 1, item))
+            peak = max(peak, inbox.qsize())
+    finally:
+        for _ in range(stages[0].threads):
+            inbox.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    run.stats.stages[0].peak_depth = max(run.stats.stages[0].peak_depth, peak)
+    if run.errors:
+        raise run.errors[0]
+    logger.debug("Pipeline stalls:\n%s", run.stats.summary())
+    return [run.results[position] for position in range(count)], run.stats
@@ -0,0 +1,79 @@
+"""
+Utilities for spreading work across a pool of workers
+"""
+
+import logging
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import TypeVar
+
+from stencil.util import counters
+from stencil.util import profile
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by the pool initialiser, workers are forked so the
+# callable (and everything it closes over) is inherited rather than pickled
+_WORKER_FUNC: Optional[Callable[[Any], Any]] = None
+
+
+def _initialise_worker(func: Callable[[Any], Any]) -> None:
+    global _WORKER_FUNC  # pylint: disable=global-statement
+    _WORKER_FUNC = func
+    # Spans and counts recorded before the fork are already held by the parent
+    profile.drain()
+    counters.drain()
+
+
+def _call_worker(item: Any) -> tuple[Any, list[profile.Span], dict[str, int]]:
+    assert _WORKER_FUNC is not None
+    result = _WORKER_FUNC(item)
+    return result, profile.drain(), counters.drain()
+
+
+def parallel_map(
+    func: Callable[[T], R], items: Sequence[T], jobs: int = 1
+) -> Iterator[R]:
+    """
+    Applies @func to each of @items across @jobs workers, yielding results
+    in the same order as @items
+
+    Workers are forked where the platform allows so that state reachable from
+    @func is shared read-only with them, only the items, results, counts and
+    any profiling spans are pickled. Elsewhere this falls back to a thread pool
+    """
+    if jobs <= 1 or len(items) <= 1:
+        yield from map(func, items)
+        return
+
+    # Process pools are slow to import, and serial builds never need them
+    # pylint: disable=import-outside-toplevel
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        logger.debug("fork unavailable, falling back to a thread pool")
+        with ThreadPoolExecutor(max_workers=jobs) as threads:
+            yield from threads.map(func, items)
+        return
+
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_initialise_worker,
+        initargs=(func,),
+    ) as processes:
+        for result, spans, counts in processes.map(
+            _call_worker, items, chunksize=chunksize
+        ):
+            profile.merge(spans)
+            counters.merge(counts)
+            yield result
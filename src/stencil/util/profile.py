@@ -0,0 +1,215 @@
+"""
+Utilities for recording where a build spends its time
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterator
+from typing import Optional
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Span:
+    """
+    Time spent in one phase of building an artefact
+    """
+
+    phase: str
+    builder: str
+    artefact: str
+    start: float
+    duration: float
+    pid: int
+    tid: int
+
+
+class Profiler:
+    """
+    Collects spans recorded during a build
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, entry: Span) -> None:
+        """
+        Adds a span recorded in this process
+        """
+        with self._lock:
+            self.spans.append(entry)
+
+    def drain(self) -> list[Span]:
+        """
+        Removes and returns the spans recorded so far
+        """
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def merge(self, spans: list[Span]) -> None:
+        """
+        Adds spans recorded by another process
+        """
+        with self._lock:
+            self.spans.extend(spans)
+
+    def summary(self, limit: int = 20) -> str:
+        """
+        Returns a table of time spent per builder and phase,
+        followed by the @limit slowest artefacts
+        """
+        phases: defaultdict[tuple[str, str], list[float]] = defaultdict(list)
+        artefacts: defaultdict[tuple[str, str], float] = defaultdict(float)
+        for entry in self.spans:
+            phases[(entry.builder, entry.phase)].append(entry.duration)
+            if entry.artefact:
+                artefacts[(entry.builder, entry.artefact)] += entry.duration
+
+        lines = [f"{'builder':<20} {'phase':<12} {'count':>8} {'total ms':>12}"]
+        for (builder, phase), durations in sorted(
+            phases.items(), key=lambda item: -sum(item[1])
+        ):
+            lines.append(
+                f"{builder:<20} {phase:<12} {len(durations):>8} "
+                f"{sum(durations) * 1000:>12.2f}"
+            )
+
+        lines += ["", f"{'builder':<20} {'total ms':>12} artefact"]
+        slowest = sorted(artefacts.items(), key=lambda item: -item[1])[:limit]
+        for (builder, artefact), duration in slowest:
+            lines.append(f"{builder:<20} {duration * 1000:>12.2f} {artefact}")
+
+        return "\n".join(lines)
+
+    def write_trace(self, path: pathlib.Path) -> None:
+        """
+        Writes the recorded spans to @path in the chrome trace event format
+        """
+        origin = min((entry.start for entry in self.spans), default=0.0)
+        events = [
+            {
+                "name": entry.phase,
+                "cat": entry.builder,
+                "ph": "X",
+                "ts": (entry.start - origin) * 1e6,
+                "dur": entry.duration * 1e6,
+                "pid": entry.pid,
+                "tid": entry.tid,
+                "args": {"artefact": entry.artefact},
+            }
+            for entry in self.spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class TimedIterator(Iterator[T]):  # pylint: disable=too-few-public-methods
+    """
+    Iterator that accumulates the time spent producing each item
+    """
+
+    def __init__(self, iterator: Iterator[T]) -> None:
+        self._iterator = iterator
+        self.elapsed = 0.0
+
+    def __next__(self) -> T:
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+def enable() -> Profiler:
+    """
+    Starts recording spans for this process and any workers it forks
+    """
+    global _PROFILER  # pylint: disable=global-statement
+    _PROFILER = Profiler()
+    return _PROFILER
+
+
+def disable() -> None:
+    """
+    Stops recording spans
+    """
+    global _PROFILER  # pylint: disable=global-statement
+    _PROFILER = None
+
+
+def enabled() -> bool:
+    """
+    Returns true if spans are being recorded
+    """
+    return _PROFILER is not None
+
+
+def now() -> float:
+    """
+    Returns the current time on the clock that spans are recorded against
+    """
+    return time.perf_counter()
+
+
+def record(
+    phase: str, builder: str, artefact: str, start: float, duration: float
+) -> None:
+    """
+    Records a span if profiling is enabled
+    """
+    if _PROFILER is not None:
+        _PROFILER.add(
+            Span(
+                phase,
+                builder,
+                artefact,
+                start,
+                duration,
+                os.getpid(),
+                threading.get_ident(),
+            )
+        )
+
+
+@contextlib.contextmanager
+def span(phase: str, builder: str, artefact: str = "") -> Iterator[None]:
+    """
+    Records the time spent in the body as a span, if profiling is enabled
+    """
+    if _PROFILER is None:
+        yield
+        return
+
+    start = now()
+    try:
+        yield
+    finally:
+        record(phase, builder, artefact, start, now() - start)
+
+
+def drain() -> list[Span]:
+    """
+    Removes and returns the spans recorded in this process
+    """
+    return _PROFILER.drain() if _PROFILER is not None else []
+
+
+def merge(spans: list[Span]) -> None:
+    """
+    Adds spans recorded in a worker process
+    """
+    if _PROFILER is not None:
+        _PROFILER.merge(spans)
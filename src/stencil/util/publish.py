@@ -0,0 +1,116 @@
+"""
+Utilities for publishing static assets to the output directory
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import pathlib
+import shutil
+import stat as stat_module
+import sys
+
+from stencil.util.manifest import temporary_path
+
+MODES = ("copy", "hardlink", "symlink", "reflink")
+
+# From linux/fs.h, clones the extents of one file into another
+_FICLONE = 0x40049409
+# Errors indicating the filesystem can't share data between the two files
+_UNSUPPORTED = (errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS, errno.EPERM)
+
+logger = logging.getLogger(__name__)
+
+
+def is_published(
+    source: pathlib.Path, destination: pathlib.Path, mode: str, stat: os.stat_result
+) -> bool:
+    """
+    Returns true if @destination already holds @source, whose stat result is @stat,
+    as published by @mode
+    """
+    try:
+        existing = os.lstat(destination)
+    except FileNotFoundError:
+        return False
+
+    if stat_module.S_ISLNK(existing.st_mode):
+        return (
+            mode == "symlink"
+            and pathlib.Path(os.readlink(destination)) == source.resolve()
+        )
+    if mode == "symlink":
+        return False
+    linked = os.path.samestat(existing, stat)
+    # Hardlinks across filesystems fall back to copies
+    if mode == "hardlink" and (linked or existing.st_dev == stat.st_dev):
+        return linked
+    # Copies must not share the source's data, edits to one would change both
+    if linked:
+        return False
+
+    # Copies keep the modification time of their source
+    return (existing.st_size, existing.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+
+def _clone(source: pathlib.Path, destination: pathlib.Path) -> None:
+    """
+    Copies @source to @destination sharing its data blocks where the filesystem
+    supports it, falling back to copy_file_range then a plain copy
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        if sys.platform == "linux":
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                return
+            except OSError as exc:
+                if exc.errno not in _UNSUPPORTED + (errno.ENOTTY,):
+                    raise
+
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return
+            except OSError as exc:
+                if exc.errno not in _UNSUPPORTED:
+                    raise
+
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+        shutil.copyfileobj(src, dst)
+
+
+def publish(source: pathlib.Path, destination: pathlib.Path, mode: str) -> None:
+    """
+    Atomically replaces @destination with @source using the strategy @mode
+    """
+    destination.parent.mkdir(exist_ok=True, parents=True)
+    tmp = temporary_path(destination)
+    try:
+        if mode == "symlink":
+            os.symlink(source.resolve(), tmp)
+        elif mode == "hardlink":
+            try:
+                os.link(source, tmp)
+            except OSError as exc:
+                if exc.errno not in _UNSUPPORTED:
+                    raise
+                logger.warning("Cannot hardlink %s, copying instead", source)
+                shutil.copy2(source, tmp)
+        elif mode == "reflink":
+            _clone(source, tmp)
+            shutil.copystat(source, tmp)
+        else:
+            shutil.copy2(source, tmp)
+        os.replace(tmp, destination)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
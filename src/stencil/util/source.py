@@ -0,0 +1,157 @@
+"""
+Utilities for caching parsed source files between registration and rendering
+"""
+
+import logging
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from typing import Mapping
+from typing import Optional
+
+from stencil.util import profile
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import digest_bytes
+from stencil.util.metadata import read_front_matter
+
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Bodies up to this size are read along with their header, larger ones on demand
+DEFAULT_INLINE_BODY_BYTES = 256 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ParsedSource:
+    """
+    A source file split into its metadata header and body, the body is read
+    when first needed and dropped when the cache is over its memory cap
+    """
+
+    metadata: Mapping[str, Any]
+    body: Optional[str]
+    offset: int
+    size: int
+    mtime_ns: int
+    # Content hash of the file, known when it was small enough to read whole
+    digest: Optional[str] = None
+
+
+class SourceCache:
+    """
+    Cache of parsed source files, so that each file is read once per change
+    and shared between registration and rendering
+    """
+
+    def __init__(
+        self,
+        owner: str = "",
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+        inline_body_bytes: int = DEFAULT_INLINE_BODY_BYTES,
+    ) -> None:
+        self._owner = owner
+        # Keyed by path strings, which are smaller than path objects
+        self._sources: dict[str, ParsedSource] = {}
+        self._bodies: OrderedDict[str, int] = OrderedDict()
+        self._body_bytes = 0
+        self._max_body_bytes = max_body_bytes
+        self._inline_body_bytes = inline_body_bytes
+        # Pipelined builds read sources from several threads
+        self._lock = threading.Lock()
+
+    def _remember_body(self, path: pathlib.Path, body: str) -> None:
+        with self._lock:
+            self._bodies[str(path)] = len(body)
+            self._body_bytes += len(body)
+            self._evict()
+
+    def _read(self, path: pathlib.Path, stat: os.stat_result) -> ParsedSource:
+        self._forget_body(path)
+        with open(path, "rb") as f:
+            with profile.span("parse", self._owner, str(path)):
+                try:
+                    front_matter = read_front_matter(f)
+                except StencilException as exc:
+                    raise StencilException(f"{path}: {exc}") from exc
+
+            source = ParsedSource(
+                front_matter.metadata,
+                None,
+                front_matter.offset,
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+            # Small files cost no more to read whole than the header did
+            if stat.st_size - front_matter.offset <= self._inline_body_bytes:
+                with profile.span("read", self._owner, str(path)):
+                    f.seek(0)
+                    raw = f.read()
+                source.body = raw[front_matter.offset :].decode("utf-8")
+                source.digest = digest_bytes(raw)
+
+        self._sources[str(path)] = source
+        if source.body is not None:
+            self._remember_body(path, source.body)
+        return source
+
+    def _forget_body(self, path: pathlib.Path) -> None:
+        with self._lock:
+            self._body_bytes -= self._bodies.pop(str(path), 0)
+
+    def _evict(self) -> None:
+        while self._body_bytes > self._max_body_bytes and len(self._bodies) > 1:
+            path, size = self._bodies.popitem(last=False)
+            self._body_bytes -= size
+            self._sources[path].body = None
+            logger.debug("Evicted body of %s from source cache", path)
+
+    def load(self, path: pathlib.Path) -> ParsedSource:
+        """
+        Returns the parsed content of @path, reading the file only if it
+        has changed since it was last read
+        """
+        stat = os.stat(path)
+        source = self._sources.get(str(path))
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        if source and (source.size, source.mtime_ns) == stamp:
+            return source
+        return self._read(path, stat)
+
+    def cached(self, path: pathlib.Path) -> ParsedSource:
+        """
+        Returns the parsed content of @path as last loaded, without checking
+        whether the file has since changed
+        """
+        return self._sources.get(str(path)) or self.load(path)
+
+    def get(self, path: pathlib.Path) -> tuple[Mapping[str, Any], str]:
+        """
+        Returns the metadata and body of @path as last loaded, reading the body
+        from the file if it was not read with the header or was evicted since
+        """
+        key = str(path)
+        source = self._sources.get(key) or self.load(path)
+        # Held locally, as another thread may evict the body from the cache
+        body = source.body
+        if body is not None:
+            with self._lock:
+                if key in self._bodies:
+                    self._bodies.move_to_end(key)
+            return source.metadata, body
+
+        # The offset of the body is only valid for the file the header came from
+        source = self.load(path)
+        body = source.body
+        if body is None:
+            with profile.span("read", self._owner, str(path)):
+                with open(path, "rb") as f:
+                    f.seek(source.offset)
+                    body = f.read().decode("utf-8")
+            source.body = body
+            self._remember_body(path, body)
+
+        return source.metadata, body
@@ -0,0 +1,115 @@
+"""
+Utilities for loading jinja2 templates
+"""
+
+import os
+from typing import Any
+from typing import Mapping
+from typing import Sequence
+from typing import Union
+
+from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
+from jinja2 import FileSystemLoader
+from jinja2 import meta
+from stencil.util.cache import cache_directory
+
+# Jinja markers that begin a variable, block or comment
+_TEMPLATE_MARKERS = ("{{", "{%", "{#")
+
+
+class DependencyLoader(FileSystemLoader):
+    """
+    Filesystem loader that can resolve the files a template depends on
+    through extends, include and import tags
+    """
+
+    def __init__(self, searchpath: Union[str, os.PathLike[str], Sequence[Any]]) -> None:
+        super().__init__(searchpath)
+        self._dependencies: dict[str, frozenset[str]] = {}
+
+    def clear(self) -> None:
+        """
+        Discards resolved dependencies, so that edited templates are re-read
+        """
+        self._dependencies.clear()
+
+    def dependencies(self, environment: Environment, template: str) -> frozenset[str]:
+        """
+        Returns the filenames of @template and every template it references,
+        a reference that can't be resolved statically depends on all templates
+        """
+        if template in self._dependencies:
+            return self._dependencies[template]
+
+        resolved: set[str] = set()
+        pending = [template]
+        while pending:
+            name = pending.pop()
+            source, filename, _ = self.get_source(environment, name)
+            if filename in resolved:
+                continue
+            resolved.add(filename)
+
+            for reference in meta.find_referenced_templates(environment.parse(source)):
+                if reference is None:
+                    pending.extend(self.list_templates())
+                else:
+                    pending.append(reference)
+
+        self._dependencies[template] = frozenset(resolved)
+        return self._dependencies[template]
+
+
+def _mapping_to_dict(value: Any) -> dict[str, Any]:
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def create_environment(loader: DependencyLoader) -> Environment:
+    """
+    Returns a template environment for @loader, with compiled templates
+    cached on disk between builds
+    """
+    environment = Environment(
+        loader=loader,
+        bytecode_cache=FileSystemBytecodeCache(str(cache_directory("jinja"))),
+    )
+    # Registered metadata is a read only mapping rather than a dict
+    environment.policies["json.dumps_kwargs"] = {
+        "sort_keys": True,
+        "default": _mapping_to_dict,
+    }
+    return environment
+
+
+# Loaders and environments by resolved template directory, shared by builders
+_ENVIRONMENTS: dict[str, tuple[DependencyLoader, Environment]] = {}
+
+
+def template_environment(
+    directory: Union[str, os.PathLike[str]],
+) -> tuple[DependencyLoader, Environment]:
+    """
+    Returns the loader and environment for the templates in @directory, shared by
+    the builders of every project built in this process that use the directory,
+    so that each template is compiled and loaded once
+    """
+    key = os.path.realpath(directory)
+    if key not in _ENVIRONMENTS:
+        loader = DependencyLoader([directory])
+        _ENVIRONMENTS[key] = (loader, create_environment(loader))
+    return _ENVIRONMENTS[key]
+
+
+def is_fixed_point(source: str) -> bool:
+    """
+    Returns true if rendering @source as a template would reproduce it unchanged,
+    without needing to compile it
+    """
+    return (
+        not any(marker in source for marker in _TEMPLATE_MARKERS)
+        and "\r" not in source
+        and not source.endswith("\n")
+    )
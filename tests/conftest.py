@@ -0,0 +1,79 @@
+"""
+Fixtures shared across the stencil test suite
+"""
+
+import json
+import pathlib
+
+import pytest
+from stencil.util.cache import CACHE_DIRECTORY_ENV
+from stencil.util.config import parse_and_validate
+from stencil.util.config import StencilConfig
+
+PAGE_COUNT = 8
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(
+    tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    """
+    Keeps persistent caches written during tests out of the user's cache directory
+    """
+    directory = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIRECTORY_ENV, str(directory))
+    return directory
+
+
+@pytest.fixture
+def site(tmp_path: pathlib.Path) -> StencilConfig:
+    """
+    Yields the config for a small stencil project laid out in a temporary directory
+    """
+    templates = tmp_path / "templates"
+    pages = tmp_path / "pages"
+    static = tmp_path / "static"
+    for directory in (templates, pages, static):
+        directory.mkdir()
+
+    (templates / "base.html").write_text(
+        "<title>{{ metadata.title }}</title>{% block body %}{% endblock %}",
+        encoding="utf-8",
+    )
+    (templates / "page.html").write_text(
+        '{% extends "base.html" %}{% block body %}{{ content }}'
+        "<p>{{ ctx.variables.site_name }}</p>{% endblock %}",
+        encoding="utf-8",
+    )
+    for index in range(PAGE_COUNT):
+        metadata = {"template": "page.html", "title": f"Page {index}"}
+        (pages / f"page-{index}.md").write_text(
+            f"---\n{json.dumps(metadata)}\n---\n# Heading {index}\n\nBody {index}\n",
+            encoding="utf-8",
+        )
+    (static / "style.css").write_text("body { margin: 0; }\n", encoding="utf-8")
+
+    return parse_and_validate(
+        {
+            "content": [
+                {
+                    "builder": "pages",
+                    "source_directory": str(pages),
+                    "output_directory": "",
+                },
+                {
+                    "builder": "static",
+                    "source_directory": str(static),
+                    "output_directory": "static",
+                },
+            ],
+            "builders": {
+                "pages": {
+                    "flavor": "MarkdownBuilder",
+                    "config": {"template_directory": str(templates)},
+                },
+                "static": {"flavor": "StaticBuilder", "config": {}},
+            },
+            "variables": {"site_name": "example.com"},
+        }
+    )
@@ -0,0 +1,407 @@
+"""
+Tests for building stencil projects
+"""
+
+import builtins
+import dataclasses
+import gzip
+import json
+import pathlib
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from stencil.impl.build import build_from_config
+from stencil.impl.build import BuildSession
+from stencil.impl.build import construct_builders
+from stencil.impl.build import enumerate_content
+from stencil.models.content import Artefact
+from stencil.util.config import StencilBuilder
+from stencil.util.config import StencilConfig
+from stencil.util.config import StencilContent
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import MANIFEST_NAME
+
+
+def _read_tree(directory: pathlib.Path) -> dict[str, bytes]:
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in directory.rglob("*")
+        if path.is_file() and path.name != MANIFEST_NAME
+    }
+
+
+def _mtimes(directory: pathlib.Path) -> dict[str, int]:
+    return {
+        str(path.relative_to(directory)): path.stat().st_mtime_ns
+        for path in directory.rglob("*")
+        if path.is_file() and path.name != MANIFEST_NAME
+    }
+
+
+def _touch(root: pathlib.Path, *paths: str) -> None:
+    for elt in paths:
+        path = root / elt
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+
+def test_enumerate_content_mirrors_tree(tmp_path: pathlib.Path) -> None:
+    """
+    Test that nested sources are discovered with destinations mirroring the tree
+    """
+    _touch(tmp_path / "src", "index.md", "posts/2024/one.md", "posts/two.md")
+    content = StencilContent(tmp_path / "src", pathlib.Path("blog"), "pages")
+
+    artefacts = enumerate_content(content)
+
+    assert not isinstance(artefacts, list)
+    assert {
+        str(elt.source.relative_to(tmp_path / "src")): str(elt.destination)
+        for elt in artefacts
+    } == {
+        "index.md": "blog/index.md",
+        "posts/2024/one.md": "blog/posts/2024/one.md",
+        "posts/two.md": "blog/posts/two.md",
+    }
+
+
+def test_enumerate_content_filters(tmp_path: pathlib.Path) -> None:
+    """
+    Test that include and exclude globs filter files and prune directories
+    """
+    _touch(
+        tmp_path,
+        "index.md",
+        "notes.txt",
+        "posts/one.md",
+        "drafts/two.md",
+        "nested/deep/three.md",
+    )
+    content = StencilContent(
+        tmp_path,
+        pathlib.Path(""),
+        "pages",
+        include=("*.md",),
+        exclude=("drafts",),
+    )
+    flat = StencilContent(tmp_path, pathlib.Path(""), "pages", recursive=False)
+
+    assert [str(elt.destination) for elt in enumerate_content(content)] == [
+        "index.md",
+        "nested/deep/three.md",
+        "posts/one.md",
+    ]
+    assert [str(elt.destination) for elt in enumerate_content(flat)] == [
+        "index.md",
+        "notes.txt",
+    ]
+
+
+def test_build_outputs(site: StencilConfig, tmp_path: pathlib.Path) -> None:
+    """
+    Test that a project builds rendered pages and copied assets
+    """
+    output = tmp_path / "output"
+    build_from_config(site, output)
+
+    page = (output / "page-0.md").read_text(encoding="utf-8")
+    assert page.startswith("<title>Page 0</title><h1>Heading 0</h1>")
+    assert "<p>example.com</p>" in page
+    assert (output / "static" / "style.css").exists()
+
+
+def test_build_reads_sources_once(site: StencilConfig, tmp_path: pathlib.Path) -> None:
+    """
+    Test that each source is read a single time for registration and rendering
+    """
+    pages = site.content[0].source_directory
+    with patch("builtins.open", wraps=builtins.open) as mock_open:
+        build_from_config(site, tmp_path / "output")
+
+    opened = [pathlib.Path(call.args[0]) for call in mock_open.call_args_list]
+    for source in pages.iterdir():
+        assert opened.count(source) == 1
+
+
+def test_parallel_build_matches_serial(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that rendering across workers produces identical outputs to a serial build
+    """
+    build_from_config(site, tmp_path / "serial")
+    build_from_config(site, tmp_path / "parallel", jobs=4)
+
+    assert _read_tree(tmp_path / "serial") == _read_tree(tmp_path / "parallel")
+
+
+def test_parallel_build_names_failing_artefact(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that errors raised in workers identify the artefact that failed
+    """
+    broken = site.content[0].source_directory / "page-3.md"
+    broken.write_text("---\n{}\n---\nno template", encoding="utf-8")
+
+    with pytest.raises(StencilException, match="page-3.md"):
+        build_from_config(site, tmp_path / "output", jobs=4)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_pipelined_build_matches_serial(
+    site: StencilConfig, tmp_path: pathlib.Path, jobs: int
+) -> None:
+    """
+    Test that building through read, render and write pipelines produces
+    identical outputs to a serial build, and skips unchanged outputs
+    """
+    pages = site.builders["pages"]
+    pipelined = dataclasses.replace(
+        site,
+        builders={
+            **site.builders,
+            "pages": StencilBuilder(pages.flavor, {**pages.config, "pipeline": 2}),
+        },
+    )
+    build_from_config(site, tmp_path / "serial")
+    result = build_from_config(pipelined, tmp_path / "pipelined", jobs=jobs)
+
+    assert _read_tree(tmp_path / "serial") == _read_tree(tmp_path / "pipelined")
+    assert len(result.written) == len(_read_tree(tmp_path / "serial"))
+    assert not build_from_config(pipelined, tmp_path / "pipelined", jobs=jobs).written
+
+
+def test_incremental_build_keeps_unchanged_outputs(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that a rebuild only rewrites outputs whose sources changed
+    """
+    output = tmp_path / "output"
+    build_from_config(site, output)
+    before = _mtimes(output)
+
+    source = site.content[0].source_directory / "page-1.md"
+    source.write_text(
+        source.read_text(encoding="utf-8").replace("Body 1", "Edited body"),
+        encoding="utf-8",
+    )
+    build_from_config(site, output)
+    after = _mtimes(output)
+
+    assert "Edited" in (output / "page-1.md").read_text(encoding="utf-8")
+    assert {key for key in after if after[key] != before[key]} == {"page-1.md"}
+
+
+def test_incremental_build_tracks_context_reads(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that pages reading the context are rebuilt only when what they read changes
+    """
+    (tmp_path / "templates" / "index.html").write_text(
+        "{{ ctx.get_artifact_by_name('page-1.md').url }}"
+        "{% for metadata, _ in ctx.query(contains={'tags': 'news'}) %}"
+        " {{ metadata.title }}{% endfor %}",
+        encoding="utf-8",
+    )
+    pages = site.content[0].source_directory
+    (pages / "index.md").write_text(
+        '---\n{"template": "index.html"}\n---\n', encoding="utf-8"
+    )
+    output = tmp_path / "output"
+    build_from_config(site, output)
+
+    def _retitle(metadata: dict[str, Any]) -> set[str]:
+        before = _mtimes(output)
+        source = pages / "page-3.md"
+        _, body = source.read_text(encoding="utf-8").split("---\n")[1:]
+        source.write_text(f"---\n{json.dumps(metadata)}\n---\n{body}", "utf-8")
+        build_from_config(site, output)
+        after = _mtimes(output)
+        return {key for key in after if after[key] != before[key]}
+
+    assert _retitle({"template": "page.html", "title": "Three"}) == {"page-3.md"}
+    # page-3 renders identically with tags, so only the listing changes
+    tagged = {"template": "page.html", "title": "Three", "tags": ["news"]}
+    assert _retitle(tagged) == {"index.md"}
+    assert (output / "index.md").read_text(encoding="utf-8") == "/page-1.md Three"
+
+
+def test_builders_ordered_by_dependencies(site: StencilConfig) -> None:
+    """
+    Test that builders follow those they depend on, and cycles are rejected
+    """
+    collection = StencilBuilder(
+        "CollectionBuilder",
+        {"template_directory": "templates", "template": "list.html"},
+    )
+    builders = {"archive": collection, **site.builders}
+    builders["static"] = StencilBuilder("StaticBuilder", {}, after=("pages",))
+    config = dataclasses.replace(site, builders=builders)
+
+    assert list(construct_builders(config)) == ["pages", "static", "archive"]
+
+    builders["pages"] = StencilBuilder(
+        site.builders["pages"].flavor, site.builders["pages"].config, ("static",)
+    )
+    with pytest.raises(StencilException, match="depend on each other"):
+        construct_builders(config)
+
+
+def test_incremental_build_tracks_templates(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that editing a template that is extended rebuilds the pages using it
+    """
+    output = tmp_path / "output"
+    build_from_config(site, output)
+
+    base = tmp_path / "templates" / "base.html"
+    base.write_text(
+        base.read_text(encoding="utf-8").replace("title>", "h2>"), encoding="utf-8"
+    )
+    build_from_config(site, output)
+
+    assert (output / "page-0.md").read_text(encoding="utf-8").startswith("<h2>")
+
+
+def test_incremental_build_removes_stale_outputs(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that outputs of deleted sources are removed on rebuild
+    """
+    output = tmp_path / "output"
+    build_from_config(site, output)
+
+    (site.content[0].source_directory / "page-2.md").unlink()
+    build_from_config(site, output)
+
+    assert not (output / "page-2.md").exists()
+    assert (output / "page-3.md").exists()
+
+
+def test_build_postprocesses_outputs(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that outputs are minified and compressed once, and that compressed
+    siblings are removed with their output
+    """
+    stylesheet = site.content[1].source_directory / "style.css"
+    stylesheet.write_text("body {\n  margin: 0;\n}\n" * 50, encoding="utf-8")
+    site = dataclasses.replace(
+        site,
+        postprocess=[
+            StencilBuilder("CSSMinifier", {}),
+            StencilBuilder("Compressor", {"formats": ["gzip"]}),
+        ],
+    )
+    output = tmp_path / "output"
+    build_from_config(site, output)
+    before = _mtimes(output)
+
+    minified = (output / "static" / "style.css").read_bytes()
+    assert minified == b"body{margin:0;}" * 50
+    assert (
+        gzip.decompress((output / "static" / "style.css.gz").read_bytes()) == minified
+    )
+
+    build_from_config(site, output)
+    assert _mtimes(output) == before
+
+    stylesheet.unlink()
+    build_from_config(site, output)
+    assert not (output / "static" / "style.css.gz").exists()
+
+
+def test_session_rebuild_reloads_edited_content(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that a warm session reloads body edits in place, and registers
+    content again when sources are added or their metadata changes
+    """
+    output = tmp_path / "output"
+    pages = site.content[0].source_directory
+    session = BuildSession(site, output)
+    first = session.build()
+    assert len(first.written) == len(list(pages.iterdir())) + 1
+    assert first.registered and "register" in first.timings
+
+    source = pages / "page-1.md"
+    source.write_text(
+        source.read_text(encoding="utf-8").replace("Body 1", "Edited body"),
+        encoding="utf-8",
+    )
+    edited = session.rebuild([source])
+    assert not edited.registered
+    assert edited.written == [output / "page-1.md"]
+    assert "Edited body" in (output / "page-1.md").read_text(encoding="utf-8")
+
+    source.write_text(
+        source.read_text(encoding="utf-8").replace("Page 1", "Retitled"),
+        encoding="utf-8",
+    )
+    retitled = session.rebuild([source])
+    assert retitled.registered
+    assert retitled.written == [output / "page-1.md"]
+
+    added = pages / "added.md"
+    added.write_text('---\n{"template": "page.html"}\n---\nNew\n', encoding="utf-8")
+    assert session.rebuild([added]).registered
+    assert (output / "added.md").exists()
+
+
+def test_markdown_cached_across_template_changes(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that pages rebuilt for template changes reuse converted markdown
+    """
+    output = tmp_path / "output"
+    pages = len(list(site.content[0].source_directory.iterdir()))
+    first = BuildSession(site, output).build()
+    assert first.counts == {"markdown.misses": pages}
+    assert first.summary().endswith(f"; markdown cache 0 hits, {pages} misses")
+
+    base = tmp_path / "templates" / "base.html"
+    base.write_text(
+        base.read_text(encoding="utf-8").replace("title>", "h2>"), encoding="utf-8"
+    )
+    with patch("stencil.models.builder._markdown_converter") as converter:
+        rebuilt = BuildSession(site, output).build()
+
+    converter.assert_not_called()
+    assert rebuilt.counts == {"markdown.hits": pages}
+    assert (
+        (output / "page-0.md")
+        .read_text(encoding="utf-8")
+        .startswith("<h2>Page 0</h2><h1>Heading 0</h1>")
+    )
+
+
+def test_session_renders_one_artefact(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that a session renders a single artefact without writing it
+    """
+    output = tmp_path / "output"
+    session = BuildSession(site, output)
+    artefact = Artefact(
+        site.content[0].source_directory / "page-0.md", pathlib.Path("page-0.md")
+    )
+
+    rendered = session.render_one(artefact)
+
+    assert rendered.startswith(b"<title>Page 0</title><h1>Heading 0</h1>")
+    assert not output.exists()
+    session.build()
+    assert (output / "page-0.md").read_bytes() == rendered
+    with pytest.raises(StencilException, match="No builder"):
+        session.render_one(Artefact("missing.md", "missing.md"))
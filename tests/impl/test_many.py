@@ -0,0 +1,104 @@
+"""
+Tests for building many stencil projects together
+"""
+
+import dataclasses
+import json
+import pathlib
+
+import pytest
+from stencil.impl.many import build_many
+from stencil.impl.many import Site
+from stencil.impl.many import sites_from_file
+from stencil.impl.many import summary
+from stencil.util.config import StencilConfig
+from stencil.util.exceptions import StencilException
+
+
+def _sites(site: StencilConfig, output: pathlib.Path) -> list[Site]:
+    other = dataclasses.replace(site, variables={"site_name": "example.org"})
+    return [Site("com", site, output / "com"), Site("org", other, output / "org")]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_build_many_builds_each_site(
+    site: StencilConfig, tmp_path: pathlib.Path, jobs: int
+) -> None:
+    """
+    Test that every site is built into its own output directory
+    """
+    builds = build_many(_sites(site, tmp_path / "output"), jobs)
+
+    assert [elt.site for elt in builds] == ["com", "org"]
+    assert all(elt.error is None for elt in builds)
+    for name in ("com", "org"):
+        page = tmp_path / "output" / name / "page-0.md"
+        assert f"<p>example.{name}</p>" in page.read_text(encoding="utf-8")
+        assert (tmp_path / "output" / name / "static" / "style.css").exists()
+
+
+def test_build_many_shares_markdown(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that sites with the same sources reuse markdown converted for each other
+    """
+    pages = len(list(site.content[0].source_directory.iterdir()))
+
+    first, second = build_many(_sites(site, tmp_path / "output"))
+
+    assert first.result is not None and second.result is not None
+    assert first.result.counts == {"markdown.misses": pages}
+    assert second.result.counts == {"markdown.hits": pages}
+    assert summary([first, second]).splitlines()[-1].split()[:3] == [
+        "total",
+        str(2 * len(first.result.written)),
+        "0",
+    ]
+
+
+def test_build_many_reports_failed_sites(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that a failing site is reported without stopping the others
+    """
+    content = dataclasses.replace(
+        site.content[0], source_directory=tmp_path / "missing"
+    )
+    broken = dataclasses.replace(site, content=[content])
+    sites = [
+        Site("broken", broken, tmp_path / "broken"),
+        Site("working", site, tmp_path / "working"),
+    ]
+
+    failed, built = build_many(sites, 2)
+
+    assert failed.result is None and failed.error
+    assert built.result is not None and built.error is None
+    assert "broken" in summary([failed, built])
+
+
+def test_sites_from_file_rejects_duplicates(tmp_path: pathlib.Path) -> None:
+    """
+    Test that sites listed in a file must have distinct names
+    """
+    config = tmp_path / "config.json"
+    config.write_text(
+        '{"content": [], "builders": {}, "variables": {}}', encoding="utf-8"
+    )
+    sites = tmp_path / "sites.json"
+    sites.write_text(
+        json.dumps(
+            {
+                "sites": [
+                    {"config": str(config), "output_directory": str(tmp_path / "a")},
+                    {"config": str(config), "output_directory": str(tmp_path / "b")},
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    with pytest.raises(StencilException, match="share names"):
+        sites_from_file(sites)
@@ -0,0 +1,137 @@
+"""
+Tests for serving built website content
+"""
+
+import gzip
+import http.client
+import os
+import pathlib
+import threading
+from typing import Generator
+from typing import Optional
+
+import pytest
+from stencil.impl.serve import accepted_encodings
+from stencil.impl.serve import create_server
+from stencil.impl.serve import LIVE_PATH
+from stencil.impl.serve import LIVE_SNIPPET
+from stencil.impl.serve import LiveReload
+
+# Fixtures inject based on name
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def live(request: pytest.FixtureRequest) -> Optional[LiveReload]:
+    """
+    Returns the live reload broadcaster used by the server, if any
+    """
+    return getattr(request, "param", None)
+
+
+@pytest.fixture
+def client(
+    tmp_path: pathlib.Path, live: Optional[LiveReload]
+) -> Generator[http.client.HTTPConnection, None, None]:
+    """
+    Yields a connection to a server for a small site in a temporary directory
+    """
+    (tmp_path / "index.html").write_text("<h1>Home</h1>", encoding="utf-8")
+    (tmp_path / "style.css").write_text("body {}" * 100, encoding="utf-8")
+    (tmp_path / "style.css.gz").write_bytes(gzip.compress(b"body {}" * 100))
+
+    server = create_server("localhost", 0, tmp_path, live)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection("localhost", server.server_address[1])
+    yield connection
+    connection.close()
+    if live:
+        live.close()
+    server.shutdown()
+    server.server_close()
+
+
+def _get(
+    connection: http.client.HTTPConnection, path: str, **headers: str
+) -> http.client.HTTPResponse:
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response
+
+
+def test_accepted_encodings() -> None:
+    """
+    Test that codings refused with a zero quality are not accepted
+    """
+    assert accepted_encodings("gzip, br;q=0, deflate;q=0.5") == {"gzip", "deflate"}
+
+
+def test_serves_index_with_validators(client: http.client.HTTPConnection) -> None:
+    """
+    Test that files are served with validators over a persistent connection
+    """
+    first = _get(client, "/")
+    second = _get(client, "/index.html")
+
+    assert first.status == second.status == 200
+    assert first.getheader("ETag") == second.getheader("ETag")
+    assert first.getheader("Last-Modified")
+    assert first.getheader("Content-Length") == str(len("<h1>Home</h1>"))
+
+
+def test_conditional_requests(client: http.client.HTTPConnection) -> None:
+    """
+    Test that requests for a representation the client holds return not modified
+    """
+    response = _get(client, "/index.html")
+    etag = response.getheader("ETag", "")
+    last_modified = response.getheader("Last-Modified", "")
+
+    assert _get(client, "/index.html", **{"If-None-Match": etag}).status == 304
+    assert (
+        _get(client, "/index.html", **{"If-Modified-Since": last_modified}).status
+        == 304
+    )
+    assert _get(client, "/index.html", **{"If-None-Match": '"stale"'}).status == 200
+
+
+def test_serves_precompressed_variant(
+    client: http.client.HTTPConnection, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that precompressed variants are served to clients that accept them,
+    unless they are older than the file they compress
+    """
+    compressed = _get(client, "/style.css", **{"Accept-Encoding": "gzip"})
+    plain = _get(client, "/style.css")
+
+    assert compressed.getheader("Content-Encoding") == "gzip"
+    assert compressed.getheader("Content-Type") == "text/css"
+    assert compressed.getheader("ETag") != plain.getheader("ETag")
+    assert plain.getheader("Content-Encoding") is None
+
+    os.utime(tmp_path / "style.css.gz", ns=(0, 0))
+    stale = _get(client, "/style.css", **{"Accept-Encoding": "gzip"})
+    assert stale.getheader("Content-Encoding") is None
+
+
+@pytest.mark.parametrize("live", [LiveReload(pathlib.Path("/site"))], indirect=True)
+def test_live_reload(client: http.client.HTTPConnection, live: LiveReload) -> None:
+    """
+    Test that html is served with the reload snippet, and that changed outputs
+    are pushed to connected browsers
+    """
+    page = _get(client, "/index.html")
+    assert page.getheader("Content-Length") == str(
+        len("<h1>Home</h1>") + len(LIVE_SNIPPET)
+    )
+
+    client.request("GET", LIVE_PATH)
+    events = client.getresponse()
+    assert events.getheader("Content-Type") == "text/event-stream"
+
+    live.notify([pathlib.Path("/site/posts/new post.html")])
+    assert events.readline() == b"event: reload\n"
+    assert events.readline() == b'data: ["/posts/new%20post.html"]\n'
@@ -0,0 +1,28 @@
+"""
+Tests for rebuilding stencil projects as inputs change
+"""
+
+import pathlib
+import threading
+
+from stencil.impl.watch import watch_changes
+
+
+def test_watch_changes_debounces_edits(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a burst of edits is reported as a single set of changes
+    """
+    output = tmp_path / "output"
+    output.mkdir()
+
+    def _edit() -> None:
+        for index in range(3):
+            (tmp_path / f"page-{index}.md").write_text("edit", encoding="utf-8")
+        (output / "page.html").write_text("ignored", encoding="utf-8")
+
+    timer = threading.Timer(0.2, _edit)
+    timer.start()
+    changes = next(watch_changes([tmp_path], output, debounce=0.1))
+    timer.join()
+
+    assert changes == {tmp_path / f"page-{index}.md" for index in range(3)}
@@ -0,0 +1,373 @@
+"""
+Tests for stencil's builtin builders
+"""
+
+import builtins
+import json
+import os
+import pathlib
+from unittest.mock import patch
+
+import markdown
+import pytest
+from stencil.impl.build import build_from_config
+from stencil.models.builder import construct
+from stencil.models.builder import MarkdownBuilder
+from stencil.models.builder import StaticBuilder
+from stencil.models.content import Artefact
+from stencil.models.context import BuildContext
+from stencil.util.config import StencilBuilder
+from stencil.util.config import StencilConfig
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import BuildManifest
+
+
+def test_markdown_converter_reset_between_documents(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a reused markdown converter matches converting each document afresh
+    """
+    builder = MarkdownBuilder("pages", tmp_path, markdown_extensions=["footnotes"])
+    documents = ["First[^1]\n\n[^1]: one", "Second[^2]\n\n[^2]: two", "Third"]
+
+    for document in documents:
+        expected = markdown.markdown(document, extensions=["footnotes"])
+        # pylint: disable-next=protected-access
+        assert builder._render_body(document) == expected
+
+
+def test_templates_compiled_to_bytecode_cache(
+    site: StencilConfig, tmp_path: pathlib.Path, cache_directory: pathlib.Path
+) -> None:
+    """
+    Test that compiled templates are persisted to the cache directory
+    """
+    build_from_config(site, tmp_path / "output")
+
+    assert len(list((cache_directory / "jinja").iterdir())) == 2
+
+
+def test_static_builder_skips_published_assets(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that unchanged assets are not copied again on rebuild
+    """
+    output = tmp_path / "output"
+    build_from_config(site, output, force=True)
+    before = os.stat(output / "static" / "style.css")
+
+    build_from_config(site, output, force=True)
+    after = os.stat(output / "static" / "style.css")
+
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_static_builder_symlink_option(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that the legacy symlink option publishes assets as symlinks
+    """
+    site.builders["static"] = StencilBuilder("StaticBuilder", {"symlink": True})
+    build_from_config(site, tmp_path / "output")
+
+    assert (tmp_path / "output" / "static" / "style.css").is_symlink()
+
+
+def test_static_builder_rejects_unknown_mode() -> None:
+    """
+    Test that an unknown publishing mode is reported
+    """
+    with pytest.raises(StencilException, match="unknown mode"):
+        StaticBuilder("static", mode="teleport")
+
+
+def test_static_builder_switches_modes(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that existing outputs are published again when the mode changes
+    between copies and hardlinks
+    """
+    source = site.content[1].source_directory / "style.css"
+    output = tmp_path / "output" / "static" / "style.css"
+    build_from_config(site, tmp_path / "output")
+    assert not os.path.samestat(os.stat(source), os.stat(output))
+
+    site.builders["static"] = StencilBuilder("StaticBuilder", {"mode": "hardlink"})
+    build_from_config(site, tmp_path / "output")
+    assert os.path.samestat(os.stat(source), os.stat(output))
+
+    site.builders["static"] = StencilBuilder("StaticBuilder", {"mode": "copy"})
+    build_from_config(site, tmp_path / "output")
+    assert not os.path.samestat(os.stat(source), os.stat(output))
+    output.write_text("edited", encoding="utf-8")
+    assert source.read_text(encoding="utf-8") == "body { margin: 0; }\n"
+
+
+LISTING = (
+    "{{ page.group }} {{ page.number }}/{{ page.count }}:"
+    "{% for metadata, artefact in page.items %} {{ metadata.title }}{% endfor %}"
+    "{% if page.next %} next={{ page.next.url }}{% endif %}"
+)
+
+
+def test_collection_builder_groups_and_paginates(tmp_path: pathlib.Path) -> None:
+    """
+    Test that content is grouped by each value of a metadata key, merging values
+    with the same slug, ordered, and split into pages registered with the context
+    """
+    (tmp_path / "list.html").write_text(LISTING, encoding="utf-8")
+    ctx = BuildContext(output_directory=tmp_path / "output", variables={})
+    posts = [("a", ["Python", "web"]), ("b", ["python"]), ("c", ["Python"])]
+    for title, tags in posts:
+        artefact = Artefact(tmp_path / f"{title}.md", pathlib.Path(f"{title}.html"))
+        ctx.register_content(title, artefact, {"title": title, "tags": tags})
+
+    builder = StencilBuilder(
+        "CollectionBuilder",
+        {
+            "template_directory": str(tmp_path),
+            "template": "list.html",
+            "output_directory": "tags",
+            "group_by": "tags",
+            "order_by": "-title",
+            "page_size": 1,
+        },
+    )
+    collection = construct("tags", builder)
+    collection.plan(ctx)
+    collection.build(ctx, BuildManifest(ctx.output_directory, "config"))
+
+    output = ctx.output_directory / "tags"
+    assert sorted(str(path.relative_to(output)) for path in output.rglob("*")) == [
+        "python",
+        "python/page-1.html",
+        "python/page-2.html",
+        "python/page-3.html",
+        "web",
+        "web/page-1.html",
+    ]
+    assert (output / "python" / "page-1.html").read_text(encoding="utf-8") == (
+        "Python 1/3: c next=/tags/python/page-2.html"
+    )
+    assert ctx.get_artifact_by_name("tags:python:2") == Artefact(
+        tmp_path / "list.html", pathlib.Path("tags/python/page-2.html")
+    )
+
+
+def test_collection_builder_keeps_distinct_groups_apart(
+    tmp_path: pathlib.Path,
+) -> None:
+    """
+    Test that groups whose slugs would collide, or drop every character,
+    are listed separately
+    """
+    (tmp_path / "list.html").write_text(LISTING, encoding="utf-8")
+    ctx = BuildContext(output_directory=tmp_path / "output", variables={})
+    tags = ["C++", "C#", "c", "日本", "中文", "Web Dev", "web-dev"]
+    for index, tag in enumerate(tags):
+        artefact = Artefact(tmp_path / f"{index}.md", pathlib.Path(f"{index}.html"))
+        ctx.register_content(str(index), artefact, {"title": tag, "tags": [tag]})
+
+    collection = construct(
+        "tags",
+        StencilBuilder(
+            "CollectionBuilder",
+            {
+                "template_directory": str(tmp_path),
+                "template": "list.html",
+                "group_by": "tags",
+                "order_by": "title",
+            },
+        ),
+    )
+    collection.plan(ctx)
+    collection.build(ctx, BuildManifest(ctx.output_directory, "config"))
+
+    listings = {
+        str(path.parent.relative_to(ctx.output_directory)): path.read_text(
+            encoding="utf-8"
+        )
+        for path in ctx.output_directory.rglob("page-1.html")
+    }
+    assert len(listings) == 6
+    assert listings["c"] == "c 1/1: c"
+    assert listings["日本"] == "日本 1/1: 日本"
+    assert listings["中文"] == "中文 1/1: 中文"
+    assert listings["web-dev"] == "Web Dev 1/1: Web Dev web-dev"
+    assert sorted(text for slug, text in listings.items() if slug.startswith("c-")) == [
+        "C# 1/1: C#",
+        "C++ 1/1: C++",
+    ]
+
+
+def test_collection_builder_in_project(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that collections list the content of a project, and not other listings
+    """
+    (tmp_path / "templates" / "list.html").write_text(LISTING, encoding="utf-8")
+    for name in ("archive", "index"):
+        site.builders[name] = StencilBuilder(
+            "CollectionBuilder",
+            {
+                "template_directory": str(tmp_path / "templates"),
+                "template": "list.html",
+                "output_directory": name,
+                "order_by": "title",
+                "page_size": 5,
+            },
+        )
+    build_from_config(site, tmp_path / "output")
+
+    archive = tmp_path / "output" / "archive"
+    assert (archive / "page-2.html").read_text(encoding="utf-8") == (
+        "None 2/2: Page 5 Page 6 Page 7"
+    )
+    assert not (archive / "page-3.html").exists()
+
+
+def test_content_with_collection_metadata_still_listed(tmp_path: pathlib.Path) -> None:
+    """
+    Test that content with its own collection metadata is listed and searched,
+    and only the pages a collection plans are left out as listings
+    """
+    (tmp_path / "list.html").write_text(LISTING, encoding="utf-8")
+    ctx = BuildContext(output_directory=tmp_path / "output", variables={})
+    for title, metadata in (("a", {}), ("b", {"collection": "recipes"})):
+        artefact = Artefact(tmp_path / f"{title}.md", pathlib.Path(f"{title}.html"))
+        ctx.register_content(title, artefact, {"title": title, **metadata})
+
+    manifest = BuildManifest(ctx.output_directory, "config")
+    for name in ("archive", "index"):
+        collection = construct(
+            name,
+            StencilBuilder(
+                "CollectionBuilder",
+                {
+                    "template_directory": str(tmp_path),
+                    "template": "list.html",
+                    "output_directory": name,
+                    "order_by": "title",
+                },
+            ),
+        )
+        collection.plan(ctx)
+        collection.build(ctx, manifest)
+    search = construct("search", StencilBuilder("SearchIndexBuilder", {}))
+    search.build(ctx, manifest)
+
+    assert (ctx.output_directory / "index" / "page-1.html").read_text(
+        encoding="utf-8"
+    ) == "None 1/1: a b"
+    index = json.loads((ctx.output_directory / "search.json").read_text("utf-8"))
+    assert [entry["url"] for entry in index] == ["/a.html", "/b.html"]
+
+
+def test_collections_listed_by_index_builders(
+    site: StencilConfig, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that sitemaps and feeds are built after the collections they list
+    """
+    (tmp_path / "templates" / "list.html").write_text(LISTING, encoding="utf-8")
+    site.builders["archive"] = StencilBuilder(
+        "CollectionBuilder",
+        {
+            "template_directory": str(tmp_path / "templates"),
+            "template": "list.html",
+            "output_directory": "archive",
+            "page_size": 5,
+        },
+    )
+    site.builders["sitemap"] = StencilBuilder(
+        "SitemapBuilder", {"base_url": "https://example.com"}
+    )
+    site.builders["feed"] = StencilBuilder(
+        "FeedBuilder", {"base_url": "https://example.com", "title": "Pages"}
+    )
+    output = tmp_path / "output"
+    build_from_config(site, output)
+
+    sitemap = (output / "sitemap.xml").read_text(encoding="utf-8")
+    assert "<loc>https://example.com/archive/page-2.html</loc>" in sitemap
+    assert "<loc>https://example.com/page-0.md</loc>" in sitemap
+    assert (output / "feed.xml").exists()
+
+
+def test_sitemap_builder_shards_large_sitemaps(tmp_path: pathlib.Path) -> None:
+    """
+    Test that sitemaps over the shard size are split and listed by an index,
+    leaving out content registered without metadata
+    """
+    ctx = BuildContext(output_directory=tmp_path / "output", variables={})
+    for index in range(5):
+        artefact = Artefact(tmp_path / f"{index}.md", pathlib.Path(f"{index}.html"))
+        ctx.register_content(str(index), artefact, {"date": f"2024-01-0{index + 1}"})
+    ctx.register_content("style.css", Artefact("style.css", "style.css"))
+
+    sitemap = construct(
+        "sitemap",
+        StencilBuilder(
+            "SitemapBuilder", {"base_url": "https://example.com/", "shard_size": 2}
+        ),
+    )
+    sitemap.build(ctx, BuildManifest(ctx.output_directory, "config"))
+
+    output = ctx.output_directory
+    assert sorted(path.name for path in output.iterdir()) == [
+        "sitemap-1.xml",
+        "sitemap-2.xml",
+        "sitemap-3.xml",
+        "sitemap.xml",
+    ]
+    assert "<loc>https://example.com/sitemap-3.xml</loc>" in (
+        output / "sitemap.xml"
+    ).read_text(encoding="utf-8")
+    assert (output / "sitemap-2.xml").read_text(encoding="utf-8").count("<url>") == 2
+    assert (
+        "<url><loc>https://example.com/4.html</loc>"
+        "<lastmod>2024-01-05</lastmod></url>"
+    ) in (output / "sitemap-3.xml").read_text(encoding="utf-8")
+
+
+def test_index_builders_in_project(site: StencilConfig, tmp_path: pathlib.Path) -> None:
+    """
+    Test that feeds and search indexes are built from registered content
+    without reading sources again, and are skipped once up to date
+    """
+    pages = site.content[0].source_directory
+    for day in (1, 3, 2):
+        (pages / f"post-{day}.md").write_text(
+            f'---\n{{"template": "page.html", "title": "Post & {day}", '
+            f'"date": "2024-05-0{day}", "summary": "Day {day}"}}\n---\nPost\n',
+            encoding="utf-8",
+        )
+    site.builders["feed"] = StencilBuilder(
+        "FeedBuilder",
+        {"base_url": "https://example.com", "title": "Posts", "limit": 2},
+    )
+    site.builders["search"] = StencilBuilder(
+        "SearchIndexBuilder", {"fields": ["title", "date"]}
+    )
+    output = tmp_path / "output"
+    with patch("builtins.open", wraps=builtins.open) as mock_open:
+        build_from_config(site, output)
+
+    opened = [pathlib.Path(call.args[0]) for call in mock_open.call_args_list]
+    for source in pages.iterdir():
+        assert opened.count(source) == 1
+
+    feed = (output / "feed.xml").read_text(encoding="utf-8")
+    assert feed.count("<entry>") == 2
+    assert "<updated>2024-05-03T00:00:00Z</updated>" in feed
+    assert feed.index("Post &amp; 3") < feed.index("Post &amp; 2")
+    assert "<summary>Day 3</summary>" in feed
+
+    index = json.loads((output / "search.json").read_text(encoding="utf-8"))
+    assert len(index) == len(list(pages.iterdir()))
+    assert {"url": "/post-1.md", "title": "Post & 1", "date": "2024-05-01"} in index
+
+    assert not build_from_config(site, output).written
@@ -0,0 +1,121 @@
+"""
+Tests for the build context exposed to templates
+"""
+
+import datetime
+import pathlib
+from typing import Any
+
+import pytest
+from stencil.models.content import Artefact
+from stencil.models.context import BuildContext
+from stencil.models.context import TrackedContext
+from stencil.models.registry import create_store
+from stencil.models.registry import Metadata
+from stencil.util.exceptions import StencilException
+
+# Mocks inject based on name
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def ctx(request: pytest.FixtureRequest) -> BuildContext:
+    """
+    Yields a build context with posts and pages registered,
+    with metadata held in each kind of store
+    """
+    context = BuildContext(
+        output_directory=pathlib.Path("out"),
+        variables={},
+        store=create_store(request.param),
+    )
+    entries: list[dict[str, Any]] = [
+        {"type": "post", "date": "2024-01-03", "tags": ["python", "web"]},
+        {"type": "page"},
+        {"type": "post", "date": "2024-01-01", "tags": ["python"]},
+        {"type": "post", "date": "2024-01-02", "tags": ["rust"]},
+    ]
+    for index, metadata in enumerate(entries):
+        name = f"entry-{index}"
+        context.register_content(
+            name, Artefact(pathlib.Path(name), pathlib.Path(name)), metadata
+        )
+    return context
+
+
+def _names(results: list[tuple[Metadata, Artefact]]) -> list[str]:
+    return [artefact.source.name for _, artefact in results]
+
+
+def test_get_by_metadata_in_registration_order(ctx: BuildContext) -> None:
+    """
+    Test that indexed lookups match a scan of the registered content
+    """
+    assert _names(ctx.get_artifact_by_metadata("type", "post")) == [
+        "entry-0",
+        "entry-2",
+        "entry-3",
+    ]
+    assert _names(ctx.get_artifact_by_metadata("tags", ["rust"])) == ["entry-3"]
+    assert _names(ctx.get_artifact_by_metadata("date", None)) == ["entry-1"]
+
+
+def test_query_filters_orders_and_limits(ctx: BuildContext) -> None:
+    """
+    Test that queries combine filters, ordering and limits
+    """
+    results = ctx.query(
+        where={"type": "post"}, contains={"tags": "python"}, order_by="-date"
+    )
+    assert _names(results) == ["entry-0", "entry-2"]
+    assert _names(ctx.query(order_by="date", limit=2)) == ["entry-2", "entry-3"]
+
+
+def test_stores_keep_metadata_types(ctx: BuildContext) -> None:
+    """
+    Test that metadata reads back with the types it was registered with,
+    so queries behave the same whichever store holds it
+    """
+    artefact = Artefact(pathlib.Path("dated"), pathlib.Path("dated"))
+    ctx.register_content(
+        "dated", artefact, {"date": datetime.date(2024, 1, 4), "pair": (1, 2)}
+    )
+
+    _, metadata = ctx.content["dated"]
+    assert metadata["date"] == datetime.date(2024, 1, 4)
+    assert metadata["pair"] == (1, 2)
+    with pytest.raises(StencilException, match="Cannot order content by date"):
+        ctx.query(order_by="-date")
+
+
+def test_indexes_invalidated_on_register(ctx: BuildContext) -> None:
+    """
+    Test that content registered after a query is visible to later queries
+    """
+    assert len(ctx.get_artifact_by_metadata("type", "page")) == 1
+
+    artefact = Artefact(pathlib.Path("new"), pathlib.Path("new"))
+    ctx.register_content("new", artefact, {"type": "page"})
+
+    assert _names(ctx.get_artifact_by_metadata("type", "page")) == ["entry-1", "new"]
+
+
+def test_tracked_reads_replay_until_results_change(ctx: BuildContext) -> None:
+    """
+    Test that recorded reads replay to the same hashes until content
+    they returned changes
+    """
+    tracked = TrackedContext(ctx)
+    assert _names(tracked.get_artifact_by_metadata("type", "post"))[0] == "entry-0"
+    assert tracked.get_artifact_by_name("entry-1") is not None
+    reads = tracked.reads
+    assert len(reads) == 2
+    assert ctx.replay({"source": "digest", **reads}) == reads
+
+    artefact = Artefact(pathlib.Path("new"), pathlib.Path("new"))
+    ctx.register_content("new", artefact, {"type": "page"})
+    assert ctx.replay(reads) == reads
+
+    ctx.register_content("entry-1", artefact, {"type": "post"})
+    assert ctx.replay(reads).keys() == reads.keys()
+    assert not set(ctx.replay(reads).values()) & set(reads.values())
@@ -0,0 +1,120 @@
+"""
+Tests for post-processing build outputs
+"""
+
+import gzip
+import importlib.util
+import pathlib
+
+import pytest
+from stencil.models.processor import construct
+from stencil.models.processor import Compressor
+from stencil.models.processor import CSSMinifier
+from stencil.models.processor import HTMLMinifier
+from stencil.models.processor import JSMinifier
+from stencil.models.processor import process_outputs
+from stencil.util.config import StencilBuilder
+from stencil.util.exceptions import StencilException
+from stencil.util.manifest import BuildManifest
+from stencil.util.manifest import digest_bytes
+
+
+def test_html_minifier_preserves_significant_whitespace() -> None:
+    """
+    Test that whitespace is collapsed outside of elements where it is significant
+    """
+    document = (
+        b"<body>  <!-- note -->\n  <p>a    b</p>\n"
+        b"<pre>  kept\n    as is </pre><script>x = '  y  ';</script></body>"
+    )
+    minified, siblings = HTMLMinifier().process(document)
+
+    assert minified == (
+        b"<body>\n<p>a b</p>\n<pre>  kept\n    as is </pre><script>x = '  y  ';</script>"
+        b"</body>"
+    )
+    assert not siblings
+
+
+def test_css_minifier() -> None:
+    """
+    Test that comments and insignificant whitespace are removed from stylesheets
+    """
+    stylesheet = (
+        b"/* theme */\na :hover , b > c {\n  color : red ;\n"
+        b'  content: "x ;  y";\n  width: calc(1px + 2px);\n}\n'
+    )
+    minified, _ = CSSMinifier().process(stylesheet)
+
+    assert (
+        minified == b'a :hover,b>c{color :red;content:"x ;  y";width:calc(1px + 2px);}'
+    )
+
+
+def test_compressor_writes_smaller_siblings() -> None:
+    """
+    Test that compressed siblings are produced only where they save space
+    """
+    compressor = Compressor(formats=["gzip"], min_size=16)
+    content = b"repetitive " * 100
+
+    data, siblings = compressor.process(content)
+    assert data == content
+    assert gzip.decompress(siblings[".gz"]) == content
+    assert compressor.process(b"tiny") == (b"tiny", {})
+
+
+def test_compressor_rejects_unknown_format() -> None:
+    """
+    Test that unknown compression formats are reported
+    """
+    with pytest.raises(StencilException, match="unknown formats"):
+        Compressor(formats=["zip"])
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("rjsmin") is not None, reason="rjsmin is installed"
+)
+def test_missing_optional_dependency() -> None:
+    """
+    Test that processors needing an uninstalled package say which one
+    """
+    with pytest.raises(StencilException, match="requires the rjsmin package"):
+        JSMinifier()
+
+
+def test_construct_processor() -> None:
+    """
+    Test that processors are constructed by flavor with their config
+    """
+    processor = construct(StencilBuilder("CSSMinifier", {"suffixes": [".scss"]}))
+
+    assert isinstance(processor, CSSMinifier)
+    with pytest.raises(StencilException, match="No processor for flavor"):
+        construct(StencilBuilder("Uglifier", {}))
+
+
+def test_processed_outputs_cached_as_bytes(
+    tmp_path: pathlib.Path, cache_directory: pathlib.Path
+) -> None:
+    """
+    Test that processing identical content again reuses the cached result,
+    which is stored as raw bytes rather than pickled
+    """
+    content = b"<p>  repetitive  </p>" * 100
+    processors = [HTMLMinifier(), Compressor(formats=["gzip"])]
+    for name in ("one", "two"):
+        output = tmp_path / "output" / f"{name}.html"
+        output.parent.mkdir(exist_ok=True)
+        output.write_bytes(content)
+        manifest = BuildManifest(tmp_path / "output", "config")
+        manifest.record(output, {}, digest_bytes(content))
+        process_outputs(processors, manifest)
+
+    one, two = tmp_path / "output" / "one.html", tmp_path / "output" / "two.html"
+    assert one.read_bytes() == two.read_bytes() == b"<p> repetitive </p>" * 100
+    assert gzip.decompress(two.with_name("two.html.gz").read_bytes()) == (
+        two.read_bytes()
+    )
+    (entry,) = (cache_directory / "processed").glob("*/*")
+    assert entry.read_bytes().startswith(b'{".gz": ')
@@ -0,0 +1,89 @@
+"""
+Tests for the compact storage of registered content
+"""
+
+import pathlib
+
+import pytest
+from stencil.models.content import Artefact
+from stencil.models.registry import create_store
+from stencil.models.registry import MemoryStore
+from stencil.models.registry import SqliteStore
+from stencil.util.exceptions import StencilException
+from stencil.util.pool import parallel_map
+
+
+def test_memory_store_shares_layouts() -> None:
+    """
+    Test that pages with the same keys share them, and short values are interned
+    """
+    store = MemoryStore()
+    first = store.add({"template": "page.html", "tags": ["a" * 8]})
+    second = store.add({"template": "".join(["page", ".html"]), "tags": ["a" * 8]})
+
+    assert first == {"template": "page.html", "tags": ["aaaaaaaa"]}
+    assert first.get("title") is None
+    assert list(second) == ["template", "tags"]
+    assert second["template"] is first["template"]
+    assert second["tags"][0] is first["tags"][0]
+    assert store.add(first) is first
+
+
+def test_sqlite_store_read_from_workers() -> None:
+    """
+    Test that metadata held on disk is readable from forked workers
+    """
+    store = SqliteStore(cache_size=1)
+    pages = []
+    for index in range(4):
+        metadata = store.add({"title": f"Page {index}", "path": pathlib.Path("a")})
+        assert store.add(metadata) is metadata
+        pages.append(metadata)
+    store.flush()
+
+    titles = parallel_map(lambda index: pages[index]["title"], range(4), 2)
+    assert list(titles) == [f"Page {index}" for index in range(4)]
+    assert pages[0] == {"title": "Page 0", "path": pathlib.Path("a")}
+
+
+def test_sqlite_store_clear_drops_replaced_metadata() -> None:
+    """
+    Test that metadata not registered again after a clear is dropped on flush,
+    so the store doesn't grow across rebuilds
+    """
+    store = SqliteStore()
+    kept = store.add({"title": "Kept"})
+    dropped = store.add({"title": "Dropped"})
+    store.flush()
+
+    for _ in range(3):
+        store.clear()
+        kept = store.add(kept)
+        store.flush()
+
+    assert kept == {"title": "Kept"}
+    with pytest.raises(StencilException, match="No metadata"):
+        dict(dropped)
+    # pylint: disable-next=protected-access
+    rows = store._connection.execute("SELECT COUNT(*) FROM metadata").fetchone()
+    assert rows == (1,)
+
+
+def test_unknown_store() -> None:
+    """
+    Test that unknown kinds of store are rejected
+    """
+    with pytest.raises(StencilException, match="sqlite"):
+        create_store("redis")
+
+
+def test_artefact_paths_normalised() -> None:
+    """
+    Test that artefacts compare equal however their paths were given
+    """
+    artefact = Artefact(pathlib.Path("pages/one.md"), pathlib.Path(""))
+
+    assert artefact == Artefact("pages/./one.md", ".")
+    assert artefact.source == pathlib.Path("pages/one.md")
+    assert artefact.url == "/"
+    assert len({artefact, Artefact("pages/one.md", "")}) == 1
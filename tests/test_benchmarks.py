@@ -0,0 +1,56 @@
+"""
+Tests for the benchmark harness
+"""
+
+import pathlib
+
+import pytest
+from benchmarks.run import find_regressions
+from benchmarks.run import measure
+from benchmarks.run import Measurement
+from benchmarks.run import run_benchmarks
+from benchmarks.sitegen import SiteSpec
+from stencil.util.exceptions import StencilException
+
+
+def test_run_benchmarks_scenarios(tmp_path: pathlib.Path) -> None:
+    """
+    Test that cold, warm and incremental builds write the expected outputs
+    """
+    spec = SiteSpec(pages=5, paragraphs=2, inheritance_depth=2, assets=2)
+    results = run_benchmarks(tmp_path, spec)
+
+    assert [(result.written, result.skipped) for result in results] == [
+        (7, 0),
+        (0, 7),
+        (1, 6),
+    ]
+
+
+def test_failed_build_reported(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a build failing in its child process is reported
+    rather than waited on forever
+    """
+    with pytest.raises(StencilException, match="cold build failed"):
+        measure("cold", {"content": []}, tmp_path / "output", 1)
+
+
+def test_find_regressions() -> None:
+    """
+    Test that only scenarios slower than the baseline threshold are reported
+    """
+    baseline = {
+        "results": [
+            {"scenario": "cold", "wall_seconds": 1.0},
+            {"scenario": "warm", "wall_seconds": 1.0},
+        ]
+    }
+    results = [
+        Measurement("cold", 1.1, 0, 0, 0, 0),
+        Measurement("warm", 1.5, 0, 0, 0, 0),
+    ]
+
+    regressions = find_regressions(results, baseline, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("warm")
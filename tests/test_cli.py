@@ -33,7 +33,7 @@ def mock_serve() -> Generator[Mock, None, None]:
     """
     Mock the underlying call to begin serving content
     """
-    mock = patch("stencil.cli.serve_directory")
+    mock = patch("stencil.impl.serve.serve_directory")
     yield mock.start()
     mock.stop()
 
@@ -45,3 +45,112 @@ def test_something(runner: Callable[[List[str]], Result], mock_serve: Mock) -> N
     retval = runner(["serve", "--directory", "src"])
     assert retval.exit_code == 0
     mock_serve.assert_called_once_with("localhost", 8080, pathlib.Path("src"))
+
+
+@pytest.fixture
+def mock_watch() -> Generator[Mock, None, None]:
+    """
+    Mock the underlying call to begin watching a project
+    """
+    mock = patch("stencil.impl.watch.watch_config")
+    yield mock.start()
+    mock.stop()
+
+
+def test_build_watch(
+    runner: Callable[[List[str]], Result], mock_watch: Mock, tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that --watch hands the build over to the watcher
+    """
+    config = tmp_path / "config.json"
+    config.write_text(
+        '{"content": [], "builders": {}, "variables": {}}', encoding="utf-8"
+    )
+
+    retval = runner(
+        ["build", "project", "-c", str(config), "-o", str(tmp_path), "--watch"]
+    )
+    assert retval.exit_code == 0
+    mock_watch.assert_called_once()
+    assert mock_watch.call_args.kwargs["force"] is False
+
+    retval = runner(
+        ["build", "project", "-c", str(config), "-o", str(tmp_path), "--watch"]
+        + ["--force"]
+    )
+    assert retval.exit_code == 0
+    assert mock_watch.call_args.kwargs["force"] is True
+
+
+def test_build_prints_summary(
+    runner: Callable[[List[str]], Result], tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that a build reports what it wrote
+    """
+    config = tmp_path / "config.json"
+    config.write_text(
+        '{"content": [], "builders": {}, "variables": {}}', encoding="utf-8"
+    )
+
+    retval = runner(["build", "project", "-c", str(config), "-o", str(tmp_path)])
+    assert retval.exit_code == 0
+    assert retval.stderr.startswith("Wrote 0 outputs, 0 unchanged in ")
+
+
+def test_serve_live_requires_config(runner: Callable[[List[str]], Result]) -> None:
+    """
+    Test that live serving refuses to start without a config to rebuild from
+    """
+    retval = runner(["serve", "--directory", "src", "--live"])
+    assert retval.exit_code != 0
+    assert "--live requires --config" in retval.output
+
+
+def test_serve_live(
+    runner: Callable[[List[str]], Result], tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that --live hands serving over to the live server
+    """
+    config = tmp_path / "config.json"
+    config.write_text(
+        '{"content": [], "builders": {}, "variables": {}}', encoding="utf-8"
+    )
+
+    with patch("stencil.impl.live.serve_live") as mock_live:
+        retval = runner(
+            ["serve", "--directory", str(tmp_path), "--live", "-c", str(config)]
+        )
+    assert retval.exit_code == 0
+    mock_live.assert_called_once()
+
+
+def test_build_many(
+    runner: Callable[[List[str]], Result], tmp_path: pathlib.Path
+) -> None:
+    """
+    Test that each config is built beneath the output directory, with totals
+    """
+    configs = []
+    for name in ("one", "two"):
+        config = tmp_path / f"{name}.json"
+        config.write_text(
+            '{"content": [], "builders": {}, "variables": {}}', encoding="utf-8"
+        )
+        configs += ["-c", str(config)]
+
+    retval = runner(["build", "many", *configs, "-o", str(tmp_path / "out")])
+
+    assert retval.exit_code == 0, retval.output
+    assert (tmp_path / "out" / "one").is_dir() and (tmp_path / "out" / "two").is_dir()
+    assert retval.output.splitlines()[-1].startswith("total")
+
+
+def test_build_many_requires_sites(runner: Callable[[List[str]], Result]) -> None:
+    """
+    Test that building many projects needs to be told which
+    """
+    retval = runner(["build", "many"])
+    assert retval.exit_code == 2
@@ -0,0 +1,56 @@
+"""
+Tests that starting the stencil cli stays fast
+"""
+
+import subprocess
+import sys
+
+# Dependencies that only the commands needing them should import
+HEAVY_MODULES = {"markdown", "jinja2", "jsonschema", "inotify", "multiprocessing"}
+
+# Cumulative import time of the cli, generous to allow for slow machines
+IMPORT_BUDGET_US = 150_000
+
+
+def _import_times(code: str) -> dict[str, int]:
+    """
+    Runs @code in a fresh interpreter, returning the cumulative import time
+    in microseconds of each module it imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_light() -> None:
+    """
+    Test that importing the cli imports no heavy dependencies, within a time budget
+    """
+    times = _import_times("import stencil.cli")
+
+    assert not {name.split(".")[0] for name in times} & HEAVY_MODULES
+    assert times["stencil.cli"] < IMPORT_BUDGET_US
+
+
+def test_serve_imports_no_build_dependencies() -> None:
+    """
+    Test that serving a directory doesn't import what building needs
+    """
+    times = _import_times(
+        "from stencil.cli import cli\n"
+        "cli(['serve', '--help'], standalone_mode=False)\n"
+        "import stencil.impl.serve"
+    )
+
+    assert "stencil.impl.serve" in times
+    assert not {name.split(".")[0] for name in times} & HEAVY_MODULES
@@ -3,8 +3,12 @@ Tests for config parsing in stencil
 """
 
 from typing import Any
+from unittest.mock import patch
 
+import pytest
+from stencil.util.config import _validator
 from stencil.util.config import parse_and_validate
+from stencil.util.exceptions import StencilException
 
 
 def test_valid_config() -> None:
@@ -27,3 +31,47 @@ def test_vars_optional() -> None:
     """
     config: dict[str, Any] = {"content": {"templates": [], "assets": [], "static": []}}
     parse_and_validate(config)
+
+
+def _config(**extra: Any) -> dict[str, Any]:
+    return {"content": [], "builders": {}, "variables": {}, **extra}
+
+
+def test_validated_configs_not_checked_again() -> None:
+    """
+    Test that a config identical to one already validated skips validation,
+    and that the schema is compiled once
+    """
+    config = _config(variables={"unique": "test_validated_configs_not_checked_again"})
+    parse_and_validate(config)
+    with patch(
+        "jsonschema.Draft7Validator.iter_errors", return_value=iter(())
+    ) as iter_errors:
+        parse_and_validate(dict(config))
+        parse_and_validate(_config(variables={"other": True}))
+
+    assert iter_errors.call_count == 1
+    assert _validator.cache_info().misses == 1
+
+
+def test_malformed_config_always_rejected() -> None:
+    """
+    Test that malformed configs are rejected each time they are parsed
+    """
+    config = _config(content=[{"builder": "pages"}])
+    for _ in range(2):
+        with pytest.raises(StencilException, match="malformed"):
+            parse_and_validate(config)
+
+
+def test_builder_after_must_list_names() -> None:
+    """
+    Test that builders name those they follow in a list of strings
+    """
+    builders = {"pages": {"flavor": "HTMLBuilder", "config": {}, "after": ["static"]}}
+    config = parse_and_validate(_config(builders=builders))
+    assert config.builders["pages"].after == ("static",)
+
+    builders["pages"]["after"] = "static"
+    with pytest.raises(StencilException, match="malformed"):
+        parse_and_validate(_config(builders=builders))
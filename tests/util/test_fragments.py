@@ -0,0 +1,36 @@
+"""
+Tests for caching converted fragments between builds
+"""
+
+import os
+
+from stencil.util.fragments import FragmentCache
+
+
+def test_fragments_counted_and_stored() -> None:
+    """
+    Test that fragments are returned once stored, counting hits and misses
+    """
+    cache = FragmentCache("test-fragments")
+    hits, misses = cache.hits, cache.misses
+
+    assert cache.get("ab12") is None
+    cache.put("ab12", "<p>fragment</p>")
+    assert cache.get("ab12") == "<p>fragment</p>"
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+
+def test_trim_evicts_least_recently_used() -> None:
+    """
+    Test that trimming removes the fragments read least recently first
+    """
+    cache = FragmentCache("test-trim", max_bytes=20)
+    for index, key in enumerate(("aa1", "bb2", "cc3")):
+        cache.put(key, "x" * 10)
+        os.utime(cache.directory / key[:2] / key, ns=(index, index))
+    # Reading a fragment marks it as the most recently used
+    cache.get("aa1")
+
+    assert cache.trim() == 1
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") == cache.get("cc3") == "x" * 10
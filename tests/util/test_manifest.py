@@ -0,0 +1,103 @@
+"""
+Tests for tracking build inputs and outputs between builds
+"""
+
+import pathlib
+from typing import Iterator
+
+import pytest
+from stencil.util.manifest import BuildManifest
+from stencil.util.manifest import digest_bytes
+from stencil.util.manifest import write_chunks
+
+
+def _write(
+    manifest: BuildManifest,
+    destination: pathlib.Path,
+    content: bytes,
+    inputs: dict[str, str],
+) -> None:
+    """
+    Writes @content to @destination as builders do, recording it with @manifest
+    """
+    digest, written = write_chunks(
+        destination, [content], manifest.existing_digest(destination)
+    )
+    manifest.record(destination, inputs, digest, written)
+
+
+def test_write_skips_identical_content(tmp_path: pathlib.Path) -> None:
+    """
+    Test that writing unchanged content leaves the existing file untouched
+    """
+    destination = tmp_path / "page.html"
+    manifest = BuildManifest(tmp_path, "config")
+    _write(manifest, destination, b"content", {})
+    mtime = destination.stat().st_mtime_ns
+
+    _write(manifest, destination, b"content", {})
+
+    assert destination.stat().st_mtime_ns == mtime
+    assert manifest.written == [destination]
+    assert manifest.skipped == [destination]
+
+
+def test_outputs_current_across_loads(tmp_path: pathlib.Path) -> None:
+    """
+    Test that outputs are current only for the inputs and config they were built with
+    """
+    destination = tmp_path / "page.html"
+    manifest = BuildManifest(tmp_path, "config")
+    _write(manifest, destination, b"content", {"source": "abc"})
+    manifest.save()
+
+    assert BuildManifest.load(tmp_path, "config").is_current(
+        destination, {"source": "abc"}
+    )
+    assert not BuildManifest.load(tmp_path, "config").is_current(
+        destination, {"source": "def"}
+    )
+    assert not BuildManifest.load(tmp_path, "other").is_current(
+        destination, {"source": "abc"}
+    )
+
+
+def test_write_chunks_replaces_atomically(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a failure while streaming leaves the previous output in place
+    """
+    destination = tmp_path / "page.html"
+    write_chunks(destination, [b"previous"], None)
+
+    def _failing() -> Iterator[bytes]:
+        yield b"partial"
+        raise ValueError("render failed")
+
+    with pytest.raises(ValueError):
+        write_chunks(destination, _failing(), None)
+
+    assert destination.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [destination]
+
+
+def test_processed_outputs_stand_in_for_content(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a post-processed output is current, and is kept when rebuilding
+    produces the content it was processed from
+    """
+    destination = tmp_path / "page.html"
+    manifest = BuildManifest(tmp_path, "config")
+    _write(manifest, destination, b"<p>  raw  </p>", {"source": "abc"})
+    destination.write_bytes(b"<p> raw </p>")
+    manifest.record_processed(destination, digest_bytes(b"<p> raw </p>"), [])
+    manifest.save()
+
+    assert BuildManifest.load(tmp_path, "config").is_current(
+        destination, {"source": "abc"}
+    )
+
+    rebuilt = BuildManifest.load(tmp_path, "config")
+    _write(rebuilt, destination, b"<p>  raw  </p>", {"source": "def"})
+
+    assert destination.read_bytes() == b"<p> raw </p>"
+    assert not rebuilt.unprocessed()
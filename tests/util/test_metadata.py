@@ -2,7 +2,13 @@
 Tests for metadata extraction from content
 """
 
+import io
+
+import pytest
+from stencil.util.exceptions import StencilException
+from stencil.util.metadata import FrontMatter
 from stencil.util.metadata import get_embedded_metadata
+from stencil.util.metadata import read_front_matter
 
 
 def test_get_metadata_normal_case() -> None:
@@ -48,3 +54,53 @@ def test_get_no_content() -> None:
     actual_metadata, actual_content = retval
     assert actual_content == expected_content
     assert actual_metadata == expected_metadata
+
+
+def test_get_metadata_only_at_start() -> None:
+    """
+    Test that fences after the first line are part of the body
+    """
+
+    string = "\n".join(["content", "---", '{"key": 123}', "---"])
+    assert get_embedded_metadata(string) is None
+
+
+def test_read_front_matter_stops_at_body() -> None:
+    """
+    Test that reading the header leaves the file at the offset of the body
+    """
+
+    data = "\n".join(["---", '{"title": "é"}', "---", "body"]).encode("utf-8")
+    f = io.BytesIO(data)
+
+    front_matter = read_front_matter(f)
+    assert front_matter == FrontMatter({"title": "é"}, data.index(b"body"))
+    assert f.read() == b"body"
+
+
+def test_read_front_matter_formats() -> None:
+    """
+    Test that YAML and TOML headers are parsed alongside JSON
+    """
+
+    yaml = read_front_matter(io.BytesIO(b"---\ntitle: yaml\ntags: [a, b]\n---\n"))
+    assert yaml.metadata == {"title": "yaml", "tags": ["a", "b"]}
+
+    toml = read_front_matter(io.BytesIO(b'+++\ntitle = "toml"\n+++\nbody'))
+    assert toml.metadata == {"title": "toml"}
+
+
+def test_read_front_matter_malformed() -> None:
+    """
+    Test that malformed headers are reported, and unclosed fences are body
+    """
+
+    with pytest.raises(StencilException, match="JSON"):
+        read_front_matter(io.BytesIO(b'---\n{"key": \n---\n'))
+
+    with pytest.raises(StencilException, match="mapping"):
+        read_front_matter(io.BytesIO(b"---\n- item\n---\n"))
+
+    f = io.BytesIO(b"---\nnever closed\n")
+    assert read_front_matter(f) == FrontMatter({}, 0)
+    assert f.tell() == 0
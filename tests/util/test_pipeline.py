@@ -0,0 +1,67 @@
+"""
+Tests for running items through pipelines of threaded stages
+"""
+
+import time
+
+import pytest
+from stencil.util.pipeline import run_pipeline
+from stencil.util.pipeline import Stage
+
+
+def _slow_double(value: int) -> int:
+    # Later items finish first, so results arrive out of order
+    time.sleep(0.001 * (10 - value % 10))
+    return value * 2
+
+
+def test_pipeline_keeps_item_order() -> None:
+    """
+    Test that results are returned in item order with each stage's items counted
+    """
+    results, stats = run_pipeline(
+        [Stage("double", _slow_double, threads=4), Stage("increment", lambda x: x + 1)],
+        range(50),
+        depth=2,
+    )
+
+    assert results == [value * 2 + 1 for value in range(50)]
+    assert [elt.items for elt in stats.stages] == [50, 50]
+    assert all(elt.peak_depth <= 2 for elt in stats.stages)
+
+
+def test_pipeline_reports_blocked_stages() -> None:
+    """
+    Test that a stage waiting on a slower stage after it is reported as blocked
+    """
+
+    def _slow(value: int) -> int:
+        time.sleep(0.01)
+        return value
+
+    _, stats = run_pipeline(
+        [Stage("fast", lambda x: x), Stage("slow", _slow)], range(20), depth=1
+    )
+
+    fast, slow = stats.stages[0], stats.stages[1]
+    assert fast.blocked > slow.busy / 2
+    assert slow.blocked == 0
+    assert "queue peak 1/1" in stats.summary()
+
+
+def test_pipeline_raises_stage_errors() -> None:
+    """
+    Test that an error raised by a stage is raised once the pipeline drains
+    """
+
+    def _fail(value: int) -> int:
+        if value == 7:
+            raise ValueError("seven")
+        return value
+
+    with pytest.raises(ValueError, match="seven"):
+        run_pipeline(
+            [Stage("fail", _fail, threads=2), Stage("pass", lambda x: x)],
+            range(100),
+            depth=1,
+        )
@@ -0,0 +1,60 @@
+"""
+Tests for recording where a build spends its time
+"""
+
+import json
+import pathlib
+from typing import Generator
+
+import pytest
+from stencil.impl.build import build_from_config
+from stencil.util import profile
+from stencil.util.config import StencilConfig
+
+# Mocks inject based on name
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def profiler() -> Generator[profile.Profiler, None, None]:
+    """
+    Yields an enabled profiler, disabling it afterwards
+    """
+    yield profile.enable()
+    profile.disable()
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_build_records_phases_per_artefact(
+    site: StencilConfig,
+    tmp_path: pathlib.Path,
+    profiler: profile.Profiler,
+    jobs: int,
+) -> None:
+    """
+    Test that each phase of building a page is recorded, including in workers
+    """
+    build_from_config(site, tmp_path / "output", jobs=jobs)
+
+    page = str(site.content[0].source_directory / "page-0.md")
+    phases = {span.phase for span in profiler.spans if span.artefact == page}
+    assert phases == {"read", "parse", "markdown", "render", "write"}
+    renders = [span for span in profiler.spans if span.phase == "render"]
+    assert len(renders) == len(list(site.content[0].source_directory.iterdir()))
+    reads = [span for span in profiler.spans if span.phase == "read"]
+    assert len(reads) == len(list(site.content[0].source_directory.iterdir()))
+    assert "page-0.md" in profiler.summary()
+
+
+def test_write_trace(tmp_path: pathlib.Path, profiler: profile.Profiler) -> None:
+    """
+    Test that spans are written in the chrome trace event format
+    """
+    with profile.span("render", "pages", "page.md"):
+        pass
+    profiler.write_trace(tmp_path / "trace.json")
+
+    with open(tmp_path / "trace.json", encoding="utf-8") as f:
+        (event,) = json.load(f)["traceEvents"]
+    assert event["name"] == "render"
+    assert event["args"] == {"artefact": "page.md"}
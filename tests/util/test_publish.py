@@ -0,0 +1,61 @@
+"""
+Tests for publishing static assets
+"""
+
+import os
+import pathlib
+
+import pytest
+from stencil.util.publish import is_published
+from stencil.util.publish import MODES
+from stencil.util.publish import publish
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_publish_modes(tmp_path: pathlib.Path, mode: str) -> None:
+    """
+    Test that each mode publishes the asset and recognises it once published
+    """
+    source = tmp_path / "asset.bin"
+    source.write_bytes(b"asset" * 1024)
+    destination = tmp_path / "output" / "asset.bin"
+    stat = os.stat(source)
+
+    assert not is_published(source, destination, mode, stat)
+    publish(source, destination, mode)
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert destination.is_symlink() == (mode == "symlink")
+    assert is_published(source, destination, mode, stat)
+
+
+def test_modified_asset_not_published(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a copy is stale once its source changes
+    """
+    source = tmp_path / "asset.bin"
+    source.write_bytes(b"before")
+    destination = tmp_path / "copy.bin"
+    publish(source, destination, "copy")
+
+    source.write_bytes(b"after!")
+    os.utime(source, ns=(0, 0))
+
+    assert not is_published(source, destination, "copy", os.stat(source))
+
+
+def test_published_asset_matches_mode(tmp_path: pathlib.Path) -> None:
+    """
+    Test that copies aren't taken for hardlinks, nor hardlinks for copies
+    """
+    source = tmp_path / "asset.bin"
+    source.write_bytes(b"asset")
+    stat = os.stat(source)
+    copy = tmp_path / "copy.bin"
+    link = tmp_path / "link.bin"
+    publish(source, copy, "copy")
+    publish(source, link, "hardlink")
+
+    assert not is_published(source, copy, "hardlink", stat)
+    assert not is_published(source, link, "copy", stat)
+    assert not is_published(source, link, "reflink", stat)
@@ -0,0 +1,60 @@
+"""
+Tests for caching parsed source files
+"""
+
+import os
+import pathlib
+
+from stencil.util.source import SourceCache
+
+
+def _write(path: pathlib.Path, body: str) -> None:
+    path.write_text(f'---\n{{"title": "{path.stem}"}}\n---\n{body}', encoding="utf-8")
+
+
+def test_load_rereads_changed_files(tmp_path: pathlib.Path) -> None:
+    """
+    Test that sources are re-read only once they have changed on disk
+    """
+    path = tmp_path / "page.md"
+    _write(path, "first")
+    cache = SourceCache()
+
+    source = cache.load(path)
+    assert cache.load(path) is source
+
+    _write(path, "second body")
+    os.utime(path, ns=(0, 0))
+    assert cache.get(path) == ({"title": "page"}, "first")
+    assert cache.load(path).body == "second body"
+
+
+def test_evicted_bodies_are_reloaded(tmp_path: pathlib.Path) -> None:
+    """
+    Test that bodies evicted under the memory cap are read again on demand
+    """
+    cache = SourceCache(max_body_bytes=10)
+    for name in ("a", "b"):
+        _write(tmp_path / f"{name}.md", name * 8)
+        cache.load(tmp_path / f"{name}.md")
+
+    assert cache.cached(tmp_path / "a.md").body is None
+    assert cache.get(tmp_path / "a.md") == ({"title": "a"}, "a" * 8)
+
+
+def test_large_bodies_are_read_on_demand(tmp_path: pathlib.Path) -> None:
+    """
+    Test that only the header of large sources is read until the body is needed
+    """
+    path = tmp_path / "page.md"
+    _write(path, "large body")
+    cache = SourceCache(inline_body_bytes=4)
+
+    source = cache.load(path)
+    assert source.body is None
+    assert source.metadata == {"title": "page"}
+    assert cache.get(path) == ({"title": "page"}, "large body")
+
+    _write(path, "changed body")
+    assert cache.get(path) == ({"title": "page"}, "large body")
+    assert cache.load(path).body is None
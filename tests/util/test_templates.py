@@ -0,0 +1,37 @@
+"""
+Tests for loading jinja2 templates
+"""
+
+import pathlib
+
+from jinja2 import Template
+from stencil.util.templates import create_environment
+from stencil.util.templates import DependencyLoader
+from stencil.util.templates import is_fixed_point
+
+
+def test_fixed_point_matches_rendering() -> None:
+    """
+    Test that sources reported as fixed points render to themselves
+    """
+    sources = ["<p>text</p>", "<p>text</p>\n", "a\r\nb", "{{ 1 }}", "{# c #}", "{"]
+    for source in sources:
+        if is_fixed_point(source):
+            assert Template(source).render() == source
+
+
+def test_dependencies_follow_references(tmp_path: pathlib.Path) -> None:
+    """
+    Test that a template depends on the templates it extends and includes
+    """
+    (tmp_path / "base.html").write_text("{% include 'nav.html' %}", encoding="utf-8")
+    (tmp_path / "nav.html").write_text("nav", encoding="utf-8")
+    (tmp_path / "page.html").write_text("{% extends 'base.html' %}", encoding="utf-8")
+    (tmp_path / "other.html").write_text("other", encoding="utf-8")
+    loader = DependencyLoader([tmp_path])
+
+    dependencies = loader.dependencies(create_environment(loader), "page.html")
+
+    assert dependencies == {
+        str(tmp_path / name) for name in ("page.html", "base.html", "nav.html")
+    }